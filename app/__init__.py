@@ -8,6 +8,7 @@ from .models import db, User
 from .api.user_routes import user_routes
 from .api.auth_routes import auth_routes
 from .seeds import seed_commands
+from .commands import search_commands, perf_commands, product_commands, review_commands, analytics_commands, idempotency_commands, jobs_commands, storage_commands
 from .config import Config
 from .api.store_routes import store_routes
 from .api.product_routes import product_routes
@@ -16,9 +17,22 @@ from .api.order_routes import order_routes
 from flask import send_from_directory
 from .api.image_routes import image_routes
 from .api.review_routes import review_routes
+from .api.analytics_routes import analytics_routes
 from .models import db 
+from .services.cache import init_cache
+from .services.identity import load_identity
+from .services.storage import init_storage, get_storage
+from .services.pool import init_pool
+from .services.query_log import init_query_log
+from .api.internal_routes import internal_routes
+from .api.metrics_routes import metrics_routes
+from .services.metrics import init_metrics
+from .services.csrf import csrf_cookie_needed
+from .services.uploads import LimitedRequest
 
 app = Flask(__name__, static_folder='../react-vite/dist', static_url_path='/')
+# Request bodies are capped at MAX_CONTENT_LENGTH, or a view's own @body_limit
+app.request_class = LimitedRequest
 
 # This print statement is for debugging purposes and mainly to confirm the flask app is running
 print("Dunder Name:", __name__)
@@ -30,13 +44,36 @@ login.login_view = 'auth.unauthorized'
 
 @login.user_loader
 def load_user(id):
-    return User.query.get(int(id))
+    # This loads the user and their store together, from the identity cache when possible
+    return load_identity(int(id))
 
 
 # Tell flask about our seed commands
 app.cli.add_command(seed_commands)
+# Tell flask about our search index commands
+app.cli.add_command(search_commands)
+# Tell flask about our query-plan check commands
+app.cli.add_command(perf_commands)
+# Tell flask about our bulk product import/export commands
+app.cli.add_command(product_commands)
+# Tell flask about our review summary commands
+app.cli.add_command(review_commands)
+# Tell flask about our sales rollup commands
+app.cli.add_command(analytics_commands)
+# Tell flask about our idempotency key commands
+app.cli.add_command(idempotency_commands)
+# Tell flask about our background job commands
+app.cli.add_command(jobs_commands)
+# Tell flask about our upload storage commands
+app.cli.add_command(storage_commands)
 
 app.config.from_object(Config)
+# This will time every request; it goes first so its timer starts before the other hooks
+init_metrics(app)
+# This will set up the cache backend used by the public storefront
+init_cache(app)
+# This will set up the storage backend uploads are written to and served from
+init_storage(app)
 # This will register the user routes for user management
 app.register_blueprint(user_routes, url_prefix='/api/users')
 # This will register the auth routes for login, logout, and signup
@@ -53,8 +90,18 @@ app.register_blueprint(order_routes, url_prefix='/api/orders')
 app.register_blueprint(image_routes, url_prefix='/api/images')
 # This will register the review routes for product reviews
 app.register_blueprint(review_routes, url_prefix='/api/reviews')
+# This will register the analytics routes for seller sales reports
+app.register_blueprint(analytics_routes, url_prefix='/api/analytics')
+# This will register the internal routes for operational metrics
+app.register_blueprint(internal_routes, url_prefix='/api/internal')
+# This will register the Prometheus metrics endpoint
+app.register_blueprint(metrics_routes)
+# This will size the database connection pool from the DB_POOL_* settings
+init_pool(app)
 # This will protect the app with CSRF protection
 db.init_app(app)
+# This will log sampled and slow queries when QUERY_LOG is on
+init_query_log(app)
 
 Migrate(app, db)
 
@@ -78,6 +125,10 @@ def https_redirect():
 
 @app.after_request
 def inject_csrf_token(response):
+    # The token is only issued when missing or rotated, and never on static files or
+    # uploads, so those responses stay cookie-free and cacheable
+    if not csrf_cookie_needed(response):
+        return response
     response.set_cookie(
         'csrf_token',
         generate_csrf(),
@@ -116,9 +167,16 @@ def react_root(path):
 def uploaded_file(filename):
     """Serve uploaded files from the uploads directory."""
 
-    return send_from_directory(app.config['UPLOAD_FOLDER'], filename)
+    # The storage backend sends a local file or redirects to the bucket
+    return get_storage().serve(filename)
 
 
 @app.errorhandler(404)
 def not_found(e):
     return app.send_static_file('index.html')
+
+
+# This answers bodies over the request size limit in the API's error format
+@app.errorhandler(413)
+def request_too_large(e):
+    return {'errors': {'message': 'The request body is too large.'}}, 413
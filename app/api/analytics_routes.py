@@ -0,0 +1,37 @@
+# app/api/analytics_routes.py
+
+from flask import Blueprint, request
+from flask_login import login_required
+from ..services.analytics import AnalyticsError, parse_day, sales_report
+from ..services.identity import with_store
+
+# This is the blueprint for seller analytics routes
+analytics_routes = Blueprint('analytics', __name__)
+
+
+# This route reports the sales of the current user's store
+@analytics_routes.route('/sales', methods=['GET'])
+@login_required
+@with_store
+def get_sales(store):
+    """
+    Sales for the current user's store: revenue, order count, average order value,
+    pending vs fulfilled counts and top products, in ?interval=day|week|month buckets
+    between ?start= and ?end= (YYYY-MM-DD, defaulting to the last 30 days / 12 weeks / 12 months).
+    Use ?top= for the number of top products (default 5).
+    """
+    # If the store is not found, it will return an error
+    if not store:
+        return {'errors': {'message': 'Store not found.'}}, 404
+
+    # This will read the report parameters
+    top = request.args.get('top', 5, type=int)
+    if not 0 <= top <= 50:
+        return {'errors': {'message': 'top must be a number from 0 to 50.'}}, 400
+    try:
+        start = parse_day(request.args.get('start'), 'start')
+        end = parse_day(request.args.get('end'), 'end')
+        # This will build the report from the daily rollups instead of the orders
+        return sales_report(store.id, request.args.get('interval', 'day'), start, end, top)
+    except AnalyticsError as e:
+        return {'errors': {'message': str(e)}}, 400
@@ -1,22 +1,70 @@
 # app/api/image_routes.py
 
-import os
+from concurrent.futures import TimeoutError
+from concurrent.futures.process import BrokenProcessPool
 from flask import Blueprint, request, current_app
-from werkzeug.utils import secure_filename
-from datetime import datetime
+from flask_login import login_required, current_user
+from flask_wtf.csrf import validate_csrf
+from wtforms.validators import ValidationError
+import uuid
+from ..services.images import ImageError, render_variants, save_variants
+from ..services.storage import get_storage
+from ..services.uploads import (
+    UploadError, start_upload, load_upload, append_chunk, finish_upload, abort_upload, sweep_uploads
+)
 
 # Thsi is the blueprint for image-related routes
 image_routes = Blueprint('images', __name__)
 
+# These are the content types direct uploads must be sent with, by file extension
+UPLOAD_CONTENT_TYPES = {'png': 'image/png', 'jpg': 'image/jpeg', 'jpeg': 'image/jpeg', 'gif': 'image/gif', 'webp': 'image/webp'}
+
 # This is a helper function to check allowed file extensions
 def allowed_file(filename):
-    allowed = current_app.config.get('ALLOWED_EXTENSIONS', {'png', 'jpg', 'jpeg', 'gif'})
+    allowed = current_app.config.get('ALLOWED_EXTENSIONS', {'png', 'jpg', 'jpeg', 'gif', 'webp'})
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in allowed
 
+# This is a helper function to turn uploaded bytes into stored variants and their URLs
+def publish_image(data):
+    # This will check the real image content and build the thumbnail, card and full variants
+    try:
+        variants = render_variants(data)
+    except ImageError as error:
+        return {'errors': {'message': str(error)}}, 400
+    except TimeoutError:
+        return {'errors': {'message': 'Image processing timed out.'}}, 503
+    except BrokenProcessPool:
+        # A pool process died mid-upload; the pool is replaced, so the client can try again
+        return {'errors': {'message': 'Image processing is unavailable, please try again.'}}, 503
+    # This will store the variants by content hash, reusing files identical uploads already wrote
+    urls = save_variants(variants, get_storage())
+    # The full-size WebP stays in 'url' for clients that only read one address
+    return {'url': urls['full']['webp'], 'variants': urls}
+
+# This is a helper function to check the CSRF token sent with raw-body requests
+def csrf_error():
+    try:
+        validate_csrf(request.cookies.get('csrf_token', ''))
+    except ValidationError:
+        return {'errors': {'message': 'The CSRF token is missing or invalid.'}}, 400
+    return None
+
+# This is a helper function to return the public state of a resumable upload
+def upload_status(state, **extra):
+    return dict({'upload_id': state['upload_id'], 'offset': state['offset'], 'size': state['size']}, **extra)
+
 # This route handles image uploads
 @image_routes.route('/upload', methods=['POST'])
 def upload_image():
-    """Upload an image for a product/store and return the file URL."""
+    """Upload an image for a product/store and return the URLs of its resized variants."""
+
+    # This will refuse an oversized body before Werkzeug reads any of it; a chunked body
+    # has no length to check (and MAX_CONTENT_LENGTH does not apply to it), so it is refused too
+    max_bytes = current_app.config['IMAGE_MAX_UPLOAD_BYTES']
+    if request.content_length is None:
+        return {'errors': {'message': 'Content-Length is required.'}}, 411
+    if request.content_length > max_bytes + 64 * 1024:
+        return {'errors': {'message': f'Uploads are limited to {max_bytes} bytes.'}}, 413
 
     # This will check if the request has a file part
     if 'image' not in request.files:
@@ -27,13 +75,179 @@ def upload_image():
         return {'errors': {'message': 'No selected file.'}}, 400
     # This will check if the file is allowed
     if file and allowed_file(file.filename):
-        ext = file.filename.rsplit('.', 1)[1].lower()
-        timestamp = datetime.utcnow().strftime("%Y%m%d%H%M%S%f")
-        filename = secure_filename(f"{timestamp}.{ext}")
-        upload_folder = current_app.config['UPLOAD_FOLDER']
-        os.makedirs(upload_folder, exist_ok=True)
-        file.save(os.path.join(upload_folder, filename))
-        url = f"/uploads/{filename}"
-        return {'url': url}
+        data = file.read(max_bytes + 1)
+        if len(data) > max_bytes:
+            return {'errors': {'message': f'Uploads are limited to {max_bytes} bytes.'}}, 413
+        return publish_image(data)
     else:
         return {'errors': {'message': 'File type not allowed.'}}, 400
+
+# This route opens a resumable upload
+@image_routes.route('/uploads', methods=['POST'])
+@login_required
+def create_upload():
+    """Open a chunked upload from a JSON body with filename and size; returns the upload ID and chunk size."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    # This will check the declared file name and size before any bytes are sent
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '')
+    if not allowed_file(filename):
+        return {'errors': {'message': 'File type not allowed.'}}, 400
+
+    config = current_app.config
+    # This will send clients to the direct-to-bucket flow when the upload parts would not be
+    # shared between replicas
+    if not config['RESUMABLE_UPLOADS']:
+        return {'errors': {'message': 'Resumable uploads are off with this storage backend; use /api/images/direct.'}}, 400
+    # This will drop uploads that were abandoned long ago
+    sweep_uploads(config['UPLOAD_TMP_FOLDER'], config['UPLOAD_EXPIRY'])
+    try:
+        state = start_upload(config['UPLOAD_TMP_FOLDER'], current_user.id, filename,
+                             data.get('size'), config['IMAGE_MAX_UPLOAD_BYTES'])
+    except UploadError as error:
+        return {'errors': {'message': str(error)}}, error.status
+    return upload_status(state, chunk_size=config['UPLOAD_CHUNK_BYTES']), 201
+
+# This route reports how much of an upload has arrived, so a client can resume it
+@image_routes.route('/uploads/<upload_id>', methods=['GET'])
+@login_required
+def get_upload(upload_id):
+    """Get the offset a chunked upload should resume from."""
+
+    try:
+        state = load_upload(current_app.config['UPLOAD_TMP_FOLDER'], upload_id, current_user.id)
+    except UploadError as error:
+        return {'errors': {'message': str(error)}}, error.status
+    return upload_status(state)
+
+# This route appends one chunk to an upload
+@image_routes.route('/uploads/<upload_id>', methods=['PATCH'])
+@login_required
+def upload_chunk(upload_id):
+    """Append the raw request body at the offset given in the Upload-Offset header."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    offset = request.headers.get('Upload-Offset', type=int)
+    if offset is None or offset < 0:
+        return {'errors': {'message': 'Upload-Offset header is required.'}}, 400
+
+    config = current_app.config
+    try:
+        state = load_upload(config['UPLOAD_TMP_FOLDER'], upload_id, current_user.id)
+        # This will stream the body into the partial file without buffering it
+        state['offset'] = append_chunk(config['UPLOAD_TMP_FOLDER'], state, offset, request.stream,
+                                       request.content_length, config['UPLOAD_CHUNK_BYTES'])
+    except UploadError as error:
+        return {'errors': {'message': str(error)}}, error.status
+    return upload_status(state)
+
+# This route finishes an upload and processes the image
+@image_routes.route('/uploads/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_upload(upload_id):
+    """Finish a chunked upload once every byte arrived and return the URLs of its resized variants."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    config = current_app.config
+    try:
+        state = load_upload(config['UPLOAD_TMP_FOLDER'], upload_id, current_user.id)
+        data = finish_upload(config['UPLOAD_TMP_FOLDER'], state)
+    except UploadError as error:
+        return {'errors': {'message': str(error)}}, error.status
+    return publish_image(data)
+
+# This route throws away an unfinished upload
+@image_routes.route('/uploads/<upload_id>', methods=['DELETE'])
+@login_required
+def delete_upload(upload_id):
+    """Abort a chunked upload."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    config = current_app.config
+    try:
+        state = load_upload(config['UPLOAD_TMP_FOLDER'], upload_id, current_user.id)
+    except UploadError as error:
+        return {'errors': {'message': str(error)}}, error.status
+    abort_upload(config['UPLOAD_TMP_FOLDER'], state)
+    return {'message': 'Upload deleted.'}
+
+# This route hands out a presigned form for uploading straight to the storage bucket
+@image_routes.route('/direct', methods=['POST'])
+@login_required
+def create_direct_upload():
+    """Presign a direct-to-storage upload from a JSON body with filename and size; returns the form to POST the file with."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    # This will check the declared file name and size before anything is signed
+    data = request.get_json(silent=True) or {}
+    filename = str(data.get('filename') or '')
+    if not allowed_file(filename):
+        return {'errors': {'message': 'File type not allowed.'}}, 400
+    ext = filename.rsplit('.', 1)[1].lower()
+    if ext not in UPLOAD_CONTENT_TYPES:
+        return {'errors': {'message': 'File type not allowed.'}}, 400
+    max_bytes = current_app.config['IMAGE_MAX_UPLOAD_BYTES']
+    size = data.get('size')
+    if not isinstance(size, int) or size <= 0:
+        return {'errors': {'message': 'size must be a positive number of bytes.'}}, 400
+    if size > max_bytes:
+        return {'errors': {'message': f'Uploads are limited to {max_bytes} bytes.'}}, 413
+
+    # This will sign a form the bucket only accepts for this key, type and at most the declared size
+    # Objects left under incoming/ are expected to be expired by a bucket lifecycle rule
+    upload_id = f'{uuid.uuid4().hex}.{ext}'
+    form = get_storage().presign_upload(
+        f'incoming/{current_user.id}/{upload_id}', UPLOAD_CONTENT_TYPES[ext],
+        size, current_app.config['STORAGE_PRESIGN_EXPIRY']
+    )
+    if form is None:
+        return {'errors': {'message': 'Direct uploads need the s3 storage backend; use /api/images/uploads.'}}, 400
+    return {'upload_id': upload_id, 'url': form['url'], 'fields': form['fields']}, 201
+
+# This route processes an image the client uploaded straight to the storage bucket
+@image_routes.route('/direct/<upload_id>/complete', methods=['POST'])
+@login_required
+def complete_direct_upload(upload_id):
+    """Finish a direct-to-storage upload and return the URLs of its resized variants."""
+
+    # This will check the CSRF token from the request cookies
+    error = csrf_error()
+    if error:
+        return error
+
+    # The key is rebuilt from the signed-in user, so nobody can finish someone else's upload
+    stem, _, ext = upload_id.partition('.')
+    if len(stem) != 32 or ext not in UPLOAD_CONTENT_TYPES or not all(char in '0123456789abcdef' for char in stem):
+        return {'errors': {'message': 'Upload not found.'}}, 404
+    key = f'incoming/{current_user.id}/{upload_id}'
+    storage = get_storage()
+    if not storage.exists(key):
+        return {'errors': {'message': 'Upload not found.'}}, 404
+
+    # This will take the original out of the bucket, then store its variants by content hash
+    data = storage.get(key)
+    storage.delete(key)
+    if len(data) > current_app.config['IMAGE_MAX_UPLOAD_BYTES']:
+        return {'errors': {'message': 'Upload is too large.'}}, 413
+    return publish_image(data)
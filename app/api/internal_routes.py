@@ -0,0 +1,63 @@
+# app/api/internal_routes.py
+
+import hmac
+from flask import Blueprint, current_app, request
+from ..services.pool import pool_report
+from ..services.jobs import STATUSES, list_jobs, queue_stats
+
+# This is the blueprint for internal operational routes
+internal_routes = Blueprint('internal', __name__)
+
+# These are the addresses treated as this host when no internal token is configured
+LOOPBACK_ADDRESSES = {'127.0.0.1', '::1'}
+
+
+# This will hide the internal routes from anyone without the internal token,
+# sent as X-Internal-Token or as a bearer token (which is what Prometheus scrapers send)
+# Without a token configured only direct requests from this host get through;
+# a request relayed by a proxy carries X-Forwarded-For and is refused
+@internal_routes.before_request
+def require_internal_access():
+    token = current_app.config.get('INTERNAL_API_TOKEN')
+    if token:
+        sent = request.headers.get('X-Internal-Token', '')
+        authorization = request.headers.get('Authorization', '')
+        if not sent and authorization.startswith('Bearer '):
+            sent = authorization[len('Bearer '):]
+        allowed = hmac.compare_digest(sent, token)
+    else:
+        allowed = request.remote_addr in LOOPBACK_ADDRESSES and 'X-Forwarded-For' not in request.headers
+    if not allowed:
+        return {'errors': {'message': 'Not found'}}, 404
+
+
+# This route reports the database connection pools of the worker that answers it
+@internal_routes.route('/pool')
+def pool():
+    """Connection pool sizes, checkouts, overflow and wait times for this worker process."""
+
+    return pool_report(current_app)
+
+
+# This route lists the query fingerprints that took the most database time in this worker
+@internal_routes.route('/queries')
+def queries():
+    """Hot queries by total time for this worker process (needs QUERY_LOG), e.g. ?limit=20"""
+
+    query_log = current_app.extensions.get('query_log')
+    if query_log is None:
+        return {'errors': {'message': 'Query logging is off. Set QUERY_LOG=true to collect query stats.'}}, 409
+    limit = request.args.get('limit', 20, type=int)
+    return {'queries': query_log.stats.top(max(1, min(limit, 500)))}
+
+
+# This route reports the background job queue, shared by every worker
+@internal_routes.route('/jobs')
+def jobs():
+    """Job counts by status and queue lag, with the latest jobs, e.g. ?status=failed&limit=20"""
+
+    status = request.args.get('status')
+    if status and status not in STATUSES:
+        return {'errors': {'message': f"status must be one of: {', '.join(STATUSES)}."}}, 400
+    limit = request.args.get('limit', 20, type=int)
+    return dict(queue_stats(), jobs=[job.to_dict() for job in list_jobs(status, max(1, min(limit, 200)))])
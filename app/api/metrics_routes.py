@@ -0,0 +1,18 @@
+# app/api/metrics_routes.py
+
+from flask import Blueprint
+from .internal_routes import require_internal_access
+from ..services.metrics import metrics_response
+
+# This is the blueprint for the Prometheus scrape endpoint
+# It sits at /metrics, where scrapers look by default, behind the internal route guard
+metrics_routes = Blueprint('metrics', __name__)
+metrics_routes.before_request(require_internal_access)
+
+
+# This route serves the request metrics of every worker in the Prometheus text format
+@metrics_routes.route('/metrics')
+def metrics():
+    """Request counts and timing histograms by blueprint and endpoint, in the Prometheus text format."""
+
+    return metrics_response()
@@ -1,11 +1,16 @@
 # app/api/order_routes.py
 
 from flask import Blueprint, request
-from flask_login import login_required, current_user
-from ..models import db, Store, Order, Product
+from flask_login import login_required
+from ..models import db, Order, Product
 from ..forms.order_form import OrderForm
 # from ..forms.order_create_form import OrderCreateForm
 from ..forms.order_update_form import OrderUpdateForm
+from ..services.serializers import with_order_graph
+from ..services.pagination import list_response
+from ..services.identity import with_store
+from ..services.analytics import queue_order_removal, queue_order_rollup
+from ..services.webhooks import notify_order
 
 # This is the blueprint for order-related routes
 order_routes = Blueprint('orders', __name__)
@@ -13,17 +18,15 @@ order_routes = Blueprint('orders', __name__)
 # This route gets all orders for the current user's store
 @order_routes.route('', methods=['GET'])
 @login_required
-def get_orders():
+@with_store
+def get_orders(store):
     """Query for all orders for the current user's store."""
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
     # If the store is not found, it will return an empty list
     if not store:
         return {'orders': []}, 200
-    # This will query all orders for the store
-    orders = Order.query.filter_by(store_id=store.id).all()
-    # This will return the orders in a list of dictionaries
-    return {'orders': [order.to_dict() for order in orders]}
+    # This will query the orders for the store with their products and tags batched
+    # And it will return them as a list of dictionaries, a page at a time if ?limit= is given
+    return list_response('orders', with_order_graph(Order.query.filter_by(store_id=store.id)), Order.id)
 
 # Commented out to avoid confusion with public order creation
 # @order_routes.route('', methods=['POST'])
@@ -66,11 +69,10 @@ def get_orders():
 # This route gets an order by its ID for the current user's store
 @order_routes.route('/<int:id>', methods=['GET'])
 @login_required
-def get_order(id):
+@with_store
+def get_order(id, store):
     """Query for an order by id for the current user's store."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
     # This will get the order by its ID
     order = Order.query.get(id)
 
@@ -83,11 +85,10 @@ def get_order(id):
 # This route  will update an order's status for the current user's store
 @order_routes.route('/<int:id>', methods=['PUT'])
 @login_required
-def update_order(id):
+@with_store
+def update_order(id, store):
     """Update an order's status for the current user's store."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
     # This will get the order by its ID
     order = Order.query.get(id)
     # If the order is not found or does not belong to the store, it will return an error
@@ -101,9 +102,16 @@ def update_order(id):
 
     # This is for if the form is valid, it will update the order's status
     if form.validate_on_submit():
+        old_status = order.status
         order.status = form.data['status']
+        order_dict = order.to_dict()
+        # This queues the order's side effects, which run in `flask jobs work` once the change is committed:
+        # moving it between the status counts of the sales rollups and the webhook
+        if order.status != old_status:
+            queue_order_rollup(order.id)
+            notify_order('order.status_changed', order_dict)
         db.session.commit()
-        return {'orders': order.to_dict()}
+        return {'orders': order_dict}
     
     # And if the form is not valid, it will return the errors
     return {'errors': form.errors}, 400
@@ -111,17 +119,20 @@ def update_order(id):
 # This route deletes an order for the current user's store
 @order_routes.route('/<int:id>', methods=['DELETE'])
 @login_required
-def delete_order(id):
+@with_store
+def delete_order(id, store):
     """Delete an order for the current user's store."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
     # This will get the order by its ID
     order = Order.query.get(id)
 
     # This is for if the order is not found and/or does not belong to the store, it will return an error
     if not order or not store or order.store_id != store.id:
         return {'errors': {'message': 'Order not found.'}}, 404
+    # This queues taking the order out of the sales rollups
+    queue_order_removal(order)
+    # This queues the order's side effects, with the order as it was before it was deleted
+    notify_order('order.deleted', order)
     # This will delete the order from the database
     db.session.delete(order)
     # This will commit the changes to the database
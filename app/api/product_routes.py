@@ -1,9 +1,21 @@
 # app/api/product_routes.py
 
-from flask import Blueprint, request
-from flask_login import login_required, current_user
-from ..models import db, Store, Product, Tag
+import io
+from flask import Blueprint, Response, request, stream_with_context
+from flask_wtf.csrf import validate_csrf
+from wtforms.validators import ValidationError
+from flask_login import login_required
+from ..models import db, Product, OrderLine
 from ..forms.product_form import ProductForm
+from ..services.serializers import with_product_graph
+from ..services.pagination import list_response
+from ..services.cache import invalidate_storefront
+from ..services.search import index_product, remove_product
+from ..services.identity import with_store
+from ..services.catalog import import_products, export_products, read_rows
+from ..services.analytics import forget_product
+from ..services.tags import set_product_tags
+from ..services.uploads import body_limit
 
 # This is the blueprint for product-related routes
 product_routes = Blueprint('products', __name__)
@@ -11,25 +23,25 @@ product_routes = Blueprint('products', __name__)
 # This route gets all products for the current user's store
 @product_routes.route('', methods=['GET'])
 @login_required
-def get_products():
+@with_store
+def get_products(store):
     """Query for all products for the current user's store and returns them in a list of product dictionaries."""
 
-    # This will get the store for the current user
-    # And if the store is not found, it will return an empty list
-    store = Store.query.filter_by(user_id=current_user.id).first()
+    # If the store is not found, it will return an empty list
     if not store:
         return {'products': []}, 200
 
-    # This will query all products for the store
-    # And it will return the products in a list of dictionaries
-    products = Product.query.filter_by(store_id=store.id).all()
-    return {'products': [product.to_dict() for product in products]}
+    # This will query the products for the store with their tags batched
+    # And it will return them as a list of dictionaries, a page at a time if ?limit= is given
+    return list_response('products', with_product_graph(Product.query.filter_by(store_id=store.id)), Product.id,
+                         serialize=Product.to_seller_dict)
 
 
 # This route creates a new product for the current user's store
 @product_routes.route('', methods=['POST'])
 @login_required
-def create_product():
+@with_store
+def create_product(store):
     """Create a new product for the current user's store."""
 
     # This will validate the form data for creating a product
@@ -37,9 +49,7 @@ def create_product():
     form = ProductForm()
     form['csrf_token'].data = request.cookies['csrf_token']
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
-    # And if the store is not found, it will return an error
+    # If the store is not found, it will return an error
     if not store:
         return {'errors': {'message': 'Store not found.'}}, 404
 
@@ -51,55 +61,52 @@ def create_product():
             title=form.data['title'],
             price=form.data['price'],
             description=form.data.get('description'),
-            image_url=form.data.get('image_url')
+            image_url=form.data.get('image_url'),
+            stock_quantity=form.data.get('stock_quantity')
         )
 
-        # This will add the product to the database
-        # And it will handle tags if provided
-        tags_list = [tag.strip() for tag in (form.data.get('tags') or '').split(',') if tag.strip()]
-        # This will ensure that tags are created or fetched from the database
-        for tag_name in tags_list:
-            tag = Tag.query.filter_by(name=tag_name).first()
-            # If the tag does not exist, it will create a new one
-            if not tag:
-                tag = Tag(name=tag_name)
-                db.session.add(tag)
-            # This will append the tag to the product's tags
-            product.tags.append(tag)
-        # This will add the product to the session and commit it to the database
+        # This will add the product to the session
+        # And it will flush the product so it has an id
         db.session.add(product)
+        db.session.flush()
+        # This will link the tags if provided, creating missing ones in one batch
+        tag_names = set_product_tags(product, form.data.get('tags'), current_ids=())
+        # This will index the product for search
+        index_product(product, tag_names)
+        # This is the name the store's storefront pages are cached under
+        store_name = store.name
         # This will commit the changes to the database
         db.session.commit()
+        # This will drop the cached storefront pages for the store
+        invalidate_storefront(store_name)
         # This will return the product in a dictionary format
-        return {'products': product.to_dict()}
+        return {'products': product.to_seller_dict()}
     # If the form is not valid, it will return the errors
     return {'errors': form.errors}, 400
 
 # This route gets a product by its ID for the current user's store
 @product_routes.route('/<int:id>', methods=['GET'])
 @login_required
-def get_product(id):
+@with_store
+def get_product(id, store):
     """Query for a product by id and returns that product in a dictionary."""
 
-    # This will get the store for the current user
-    # And it will get the product by its ID
-    store = Store.query.filter_by(user_id=current_user.id).first()
+    # This will get the product by its ID
     product = Product.query.get(id)
     # If the product is not found or does not belong to the store, it will return an error
     if not product or not store or product.store_id != store.id:
         return {'errors': {'message': 'Product not found.'}}, 404
     # This will return the product in a dictionary format
-    return {'products': product.to_dict()}
+    return {'products': product.to_seller_dict()}
 
 # This route updates a product by its ID for the current user's store
 @product_routes.route('/<int:id>', methods=['PUT'])
 @login_required
-def update_product(id):
+@with_store
+def update_product(id, store):
     """Update a product by id for the current user's store."""
 
-    # This will get the store for the current user
-    # And it will get the product by its ID
-    store = Store.query.filter_by(user_id=current_user.id).first()
+    # This will get the product by its ID
     product = Product.query.get(id)
     # If the product is not found or does not belong to the store, it will return an error
     if not product or not store or product.store_id != store.id:
@@ -116,48 +123,129 @@ def update_product(id):
         product.price = form.data['price']
         product.description = form.data.get('description')
         product.image_url = form.data.get('image_url')
+        # This sets the stock count only when one was sent (null stops tracking stock)
+        if form.stock_quantity.raw_data:
+            product.stock_quantity = form.data.get('stock_quantity')
 
         # This will handle tags if provided
+        # Only the tags that were added or removed touch product_tags
+        tag_names = None
         if form.data.get('tags') is not None:
-            product.tags = []
-            tags_list = [tag.strip() for tag in (form.data.get('tags') or '').split(',') if tag.strip()]
-            # This will ensure that tags are created or fetched from the database
-            for tag_name in tags_list:
-                # This will query the tag by its name
-                tag = Tag.query.filter_by(name=tag_name).first()
-                # If the tag does not exist, it will create a new one
-                if not tag:
-                    # This will create a new tag
-                    tag = Tag(name=tag_name)
-                    # This will add the tag to the session
-                    db.session.add(tag)
-                # This will append the tag to the product's tags
-                product.tags.append(tag)
+            tag_names = set_product_tags(product, form.data.get('tags'))
 
+        # This will rewrite the product's search index row in the same transaction
+        index_product(product, tag_names)
+        # This is the name the store's storefront pages are cached under
+        store_name = store.name
         # This will commit the changes to the database
         db.session.commit()
+        # This will drop the cached storefront pages for the store
+        invalidate_storefront(store_name)
         # This will return the updated product in a dictionary format
-        return {'products': product.to_dict()}
+        return {'products': product.to_seller_dict()}
     # If the form is not valid, it will return the errors
     return {'errors': form.errors}, 400
 
 # This route deletes a product by its ID for the current user's store
 @product_routes.route('/<int:id>', methods=['DELETE'])
 @login_required
-def delete_product(id):
+@with_store
+def delete_product(id, store):
     """Delete a product by id for the current user's store."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
     # This will get the product by its ID
     product = Product.query.get(id)
     # If the product is not found or does not belong to the store, it will return an error
     if not product or not store or product.store_id != store.id:
         return {'errors': {'message': 'Product not found.'}}, 404
 
-    # This will delete the product from the database
+    # This will delete the product and its search index row from the database
+    remove_product(product.id)
+    # Order lines keep their title and price, but no longer point at the product
+    # (the foreign key does this too, where the database enforces it)
+    OrderLine.query.filter_by(product_id=product.id).update({'product_id': None}, synchronize_session=False)
+    forget_product(product.id)
     db.session.delete(product)
     # This will commit the changes to the database
     db.session.commit()
+    # This will drop the cached storefront pages for the store
+    invalidate_storefront(store.name)
     # And this will return a success message
     return {'message': 'Product Deleted.'}
+
+# This will get a binary stream TextIOWrapper can read from an uploaded file
+# Werkzeug spools large uploads into a SpooledTemporaryFile, which before Python 3.11
+# has no readable(), so the file it spools into (in memory or on disk) is read instead
+def _upload_stream(upload):
+    return getattr(upload.stream, '_file', upload.stream)
+
+# This will work out whether an import/export body is CSV or NDJSON
+def _catalog_format(filename=None):
+    fmt = request.args.get('format')
+    if fmt:
+        return fmt.lower()
+    if filename and filename.lower().endswith(('.ndjson', '.jsonl')):
+        return 'ndjson'
+    if filename and filename.lower().endswith('.csv'):
+        return 'csv'
+    if request.mimetype in ('application/x-ndjson', 'application/jsonl'):
+        return 'ndjson'
+    return 'csv'
+
+# This route imports products in bulk for the current user's store
+@product_routes.route('/import', methods=['POST'])
+@body_limit('CATALOG_IMPORT_MAX_BYTES')
+@login_required
+@with_store
+def bulk_import_products(store):
+    """Import products in bulk from a CSV or NDJSON body (or an uploaded file) and report errors per row."""
+
+    # This will check the CSRF token from the request cookies, like the product form does
+    try:
+        validate_csrf(request.cookies.get('csrf_token', ''))
+    except ValidationError:
+        return {'errors': {'message': 'The CSRF token is missing or invalid.'}}, 400
+
+    # If the store is not found, it will return an error
+    if not store:
+        return {'errors': {'message': 'Store not found.'}}, 404
+
+    # This will read from an uploaded file if there is one, or from the raw body otherwise
+    upload = request.files.get('file')
+    fmt = _catalog_format(upload.filename if upload else None)
+    if fmt not in ('csv', 'ndjson'):
+        return {'errors': {'message': 'format must be csv or ndjson.'}}, 400
+    stream = io.TextIOWrapper(_upload_stream(upload) if upload else request.stream, encoding='utf-8-sig', newline='')
+
+    # This will parse and insert the rows a batch at a time
+    store_name = store.name
+    try:
+        report = import_products(store, read_rows(stream, fmt))
+    finally:
+        # This will drop the cached storefront pages for the store, also when a later
+        # batch failed after earlier ones were committed
+        invalidate_storefront(store_name)
+    return report
+
+# This route exports the products of the current user's store
+@product_routes.route('/export', methods=['GET'])
+@login_required
+@with_store
+def bulk_export_products(store):
+    """Export all products of the current user's store as CSV (default) or NDJSON (?format=ndjson)."""
+
+    # If the store is not found, it will return an error
+    if not store:
+        return {'errors': {'message': 'Store not found.'}}, 404
+
+    fmt = _catalog_format()
+    if fmt not in ('csv', 'ndjson'):
+        return {'errors': {'message': 'format must be csv or ndjson.'}}, 400
+    mimetype = 'text/csv' if fmt == 'csv' else 'application/x-ndjson'
+
+    # This will stream the file from a server-side cursor
+    return Response(
+        stream_with_context(export_products(store, fmt)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=products.{fmt}'}
+    )
@@ -1,43 +1,107 @@
 # app/api/product_routes.py
 
 from flask import Blueprint, request
-from ..models import db, Store, Tag, Product, Order
+from sqlalchemy import select, update
+from ..models import db, Store, Tag, Product, Order, OrderLine, normalize_title, order_total
+from ..services.serializers import with_order_graph, with_product_graph
+from ..services.pagination import list_response
+from ..services.cache import cached_storefront, invalidate_storefront
+from ..services.search import search_products
+from ..services.async_db import async_list_response, async_session, cached_storefront_async
+from ..services.analytics import queue_order_rollup
+from ..services.inventory import reserve_stock
+from ..services.webhooks import notify_order
+from ..services.idempotency import IdempotencyError, claim_idempotency_key, replay_response, save_response
 
 # This is the blueprint name for product-related routes
 public_routes = Blueprint('public', __name__)
 
-# This is the route to get all products for a public store
-@public_routes.route('/stores/<string:store_name>', methods=['GET'])
-def public_storefront(store_name):
-    """Get public store and products. Supports filtering by tag (?tag=...) and/or search by product name (?q=...)."""
-    # This is the public route to get products for a store by its name
-    store = Store.query.filter_by(name=store_name).first()
-    if not store:
-        return {'errors': {'message': 'Store not found.'}}, 404
-
+# This is the query for a public store's products, with the optional ?tag= and ?q= filters
+# It only builds the query, so the sync and async storefront views both use it
+def storefront_query(store_id):
     # This is the optional query parameters for filtering products
     tag_filter = request.args.get('tag')
     q_filter = request.args.get('q')
     # This is the query to get products for the store, with optional filtering
-    query = Product.query.filter_by(store_id=store.id)
+    query = Product.query.filter_by(store_id=store_id)
     # Apply filters if provided
+    # The search uses the full-text index and ranks the best matches first
+    ranked = False
     if q_filter:
-        query = query.filter(Product.title.ilike(f"%{q_filter}%"))
+        query, ranked = search_products(query, store_id, q_filter)
 
     if tag_filter:
         query = query.join(Product.tags).filter(Tag.name == tag_filter)
-    # This will execute the query and get the products
-    products = query.all()
+    # The products are executed with their tags batched in one extra query
+    return with_product_graph(query), ranked
+
+# This is the route to get all products for a public store
+@public_routes.route('/stores/<string:store_name>', methods=['GET'])
+@cached_storefront
+def public_storefront(store_name):
+    """Get public store and products. Supports filtering by tag (?tag=...) and/or search by product name (?q=...), and paging with ?limit=&after= or ?stream=1."""
+    # This is the public route to get products for a store by its name
+    store = Store.query.filter_by(name=store_name).first()
+    if not store:
+        return {'errors': {'message': 'Store not found.'}}, 404
+
+    query, ranked = storefront_query(store.id)
     # Returns the store and its products in a dictionary format
-    return {
-        'store': store.to_dict(),
-        'products': [p.to_dict() for p in products]
-    }
+    return list_response('products', query, Product.id, extra={'store': store.to_dict()}, ranked=ranked)
+
+# This is the async version of public_storefront, served natively by app.asgi
+@cached_storefront_async
+async def public_storefront_async(store_name):
+    """Get public store and products (async serving mode)."""
+    async with async_session() as session:
+        # This is the public route to get products for a store by its name
+        store = (await session.execute(select(Store).filter_by(name=store_name))).scalars().first()
+        if not store:
+            return {'errors': {'message': 'Store not found.'}}, 404
+
+        query, ranked = storefront_query(store.id)
+        # Returns the store and its products in a dictionary format
+        return await async_list_response(session, 'products', query, Product.id, extra={'store': store.to_dict()}, ranked=ranked)
+
+# This is the largest quantity of one product a single order may ask for
+MAX_LINE_QUANTITY = 1000
+
+# This will read the requested quantity of each product from an order body, keyed by normalized title
+# Products are given as product_names (a name listed twice is a quantity of 2)
+# or as items: [{"product_name": ..., "quantity": ...}]
+def order_quantities(data):
+    quantities = {}
+    items = data.get('items')
+    if items is not None:
+        if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+            return None, 'items must be a list of {"product_name", "quantity"} objects.'
+        for item in items:
+            name, quantity = item.get('product_name'), item.get('quantity', 1)
+            if not isinstance(name, str) or not isinstance(quantity, int) or isinstance(quantity, bool) or quantity < 1:
+                return None, 'Each item needs a product_name and a positive whole quantity.'
+            key = normalize_title(name)
+            quantities[key] = quantities.get(key, 0) + quantity
+    else:
+        product_names = data.get('product_names')
+        # To ensure product_names is a list of strings
+        if not isinstance(product_names, list) or not all(isinstance(name, str) for name in product_names):
+            return None, 'product_names must be a list of strings.'
+        # Normalize input names (lowercase + strip spaces)
+        for name in product_names:
+            key = normalize_title(name)
+            quantities[key] = quantities.get(key, 0) + 1
+
+    if any(quantity > MAX_LINE_QUANTITY for quantity in quantities.values()):
+        return None, f'An order may include at most {MAX_LINE_QUANTITY} of each product.'
+    return quantities, None
 
 # This is the route to create an order for a public store
 @public_routes.route('/stores/<string:store_name>/orders', methods=['POST'])
 def public_create_order(store_name):
-    """Public: Create a new order for a store using store name and product names."""
+    """
+    Public: Create a new order for a store using store name and product names (or items with quantities).
+    Send an Idempotency-Key header to make retries safe: a repeated key gets the first response back.
+    """
     # This is the public route to create an order for a store by its name
     store = Store.query.filter_by(name=store_name).first()
     if not store:
@@ -47,51 +111,92 @@ def public_create_order(store_name):
     data = request.get_json() or {}
     buyer_name = data.get('buyer_name')
     buyer_email = data.get('buyer_email')
-    product_names = data.get('product_names')
+
+    # This will claim the request's Idempotency-Key, waiting for a concurrent request with the same key
+    # An error response below is never stored: the transaction, and the claim with it, is rolled back
+    try:
+        claimed = claim_idempotency_key(f'orders:{store.id}', data)
+    except IdempotencyError as e:
+        return {'errors': {'message': str(e)}}, e.status
+    # If the key was used before, this returns that request's response
+    if claimed is not None and claimed.status_code is not None:
+        return replay_response(claimed)
 
     # This will validate required fields
-    if not buyer_name or not buyer_email or not product_names:
+    if not buyer_name or not buyer_email or not (data.get('product_names') or data.get('items')):
         return {
             'errors': {
-                'message': 'buyer_name, buyer_email, and product_names are required.'
+                'message': 'buyer_name, buyer_email, and product_names (or items) are required.'
             }
         }, 400
 
-    # To ensure product_names is a list of strings
-    if not isinstance(product_names, list) or not all(isinstance(name, str) for name in product_names):
-        return {'errors': {'message': 'product_names must be a list of strings.'}}, 400
-
-    # Normalize input names (lowercase + strip spaces)
-    normalized_names = [name.strip().lower() for name in product_names]
-
-    # Fetch all products for this store
-    all_products = Product.query.filter_by(store_id=store.id).all()
+    # This will count how many of each product were asked for
+    quantities, error = order_quantities(data)
+    if error:
+        return {'errors': {'message': error}}, 400
 
-    # Match products by case-insensitive comparison
-    matched_products = [
-        p for p in all_products
-        if p.title.strip().lower() in normalized_names
-    ]
+    # Match products by their stored normalized title with one indexed query
+    matched = db.session.query(Product.id, Product.title, Product.price, Product.title_normalized, Product.stock_quantity).filter(
+        Product.store_id == store.id,
+        Product.title_normalized.in_(quantities)
+    ).all()
 
     # If some requested products are not found, return error
-    if len(matched_products) != len(normalized_names):
+    if len(matched) != len(quantities):
         return {'errors': {'message': 'Some products not found for this store.'}}, 400
 
-    # This calculates total price
-    total_price = sum(p.price for p in matched_products)
+    # This turns away orders for stock that is already gone before writing anything
+    # The real check is the conditional decrement below, which concurrent orders cannot race
+    short = [row.title for row in matched if row.stock_quantity is not None and row.stock_quantity < quantities[row.title_normalized]]
+    if short:
+        return {'errors': {'message': f"Not enough stock for: {', '.join(short)}."}}, 409
 
-    # This creates the order
+    # This creates the order; its total is filled in from the lines below
     order = Order(
         store_id=store.id,
         buyer_name=buyer_name,
         buyer_email=buyer_email,
-        total_price=total_price,
+        total_price=0,
         # Always defaults to pending
         status='pending'
     )
-    # This associates products with the order
-    order.products = matched_products
     db.session.add(order)
+    # This flushes the order so it has an id
+    db.session.flush()
+    # This writes the order lines in one batched insert, with each product's current price and title
+    lines = [{
+        'order_id': order.id,
+        'product_id': row.id,
+        'quantity': quantities[row.title_normalized],
+        'unit_price': row.price,
+        'title': row.title
+    } for row in matched]
+    db.session.execute(OrderLine.__table__.insert(), lines)
+    # This sets the total to the sum of the lines, computed by the database
+    db.session.execute(update(Order.__table__).where(Order.__table__.c.id == order.id).values(total_price=order_total(order.id)))
+    db.session.expire(order, ['total_price'])
+    # This reloads the order with its lines for the response
+    order = with_order_graph(Order.query).filter_by(id=order.id).one()
+    body = {'order': order.to_dict()}
+    # This stores the response on the key, so it is committed together with the order
+    if claimed is not None:
+        save_response(claimed, body, 201)
+    # This queues the order's side effects, which run in `flask jobs work` once the order is committed:
+    # adding it to the store's sales rollups (kept out of checkout, so orders never wait on
+    # the store's rollup row) and the webhook
+    queue_order_rollup(order.id)
+    notify_order('order.placed', body['order'])
+    # This takes the stock for every line right before the commit; the product rows stay
+    # locked until then, so nothing else runs while checkouts of a hot product wait on them
+    short, sold_out = reserve_stock({line['product_id']: line['quantity'] for line in lines})
+    if short:
+        db.session.rollback()
+        titles = [row.title for row in matched if row.id in short]
+        return {'errors': {'message': f"Not enough stock for: {', '.join(titles)}."}}, 409
     db.session.commit()
+    # This will drop the cached storefront pages once a product sells out, since they show
+    # in_stock; the stock count itself is not on public pages, so other sales leave them alone
+    if sold_out:
+        invalidate_storefront(store.name)
     # This returns the created order in a dictionary format
-    return {'order': order.to_dict()}, 201
\ No newline at end of file
+    return body, 201
\ No newline at end of file
@@ -1,13 +1,25 @@
 # app/api/review_routes.py
 
 from flask import Blueprint, request
+from sqlalchemy import select
 from flask_login import login_required, current_user
-from ..models import db, Review, Product
+from ..models import db, Review, Product, Store
 from ..forms.review_form import ReviewForm
+from ..services.pagination import list_response
+from ..services.async_db import async_list_response, async_session
+from ..services.cache import invalidate_storefront
+from ..services.ratings import apply_rating_change, rating_summary
 
 # This is the blueprint for review-related routes
 review_routes = Blueprint('reviews', __name__)
 
+# This will drop the cached storefront of the store selling a product,
+# since storefront listings include each product's rating summary
+def _invalidate_product_store(product_id):
+    store_name = db.session.query(Store.name).join(Product, Product.store_id == Store.id).filter(Product.id == product_id).scalar()
+    if store_name:
+        invalidate_storefront(store_name)
+
 # This route creates a new review for a product by the current user
 @review_routes.route('', methods=['POST'])
 @login_required
@@ -40,8 +52,12 @@ def create_review():
         )
         # This will add the review to the database
         db.session.add(review)
+        # This will count the review in the product's rating summary, in the same transaction
+        apply_rating_change(product.id, new=review.rating)
         # This will commit the changes to the database
         db.session.commit()
+        # This will refresh the store's cached storefront
+        _invalidate_product_store(product.id)
         # This will return the created review in a dictionary format
         return {'review': review.to_dict()}, 201
     # If the form is not valid, it will return the errors
@@ -50,7 +66,7 @@ def create_review():
 # This route gets all reviews for a product
 @review_routes.route('/product/<int:product_id>', methods=['GET'])
 def get_reviews(product_id):
-    """Get all reviews for a product."""
+    """Get all reviews for a product. Supports paging with ?limit=&after= or ?stream=1."""
 
     # This will query the product by its ID
     product = Product.query.get(product_id)
@@ -59,10 +75,32 @@ def get_reviews(product_id):
     if not product:
         return {'errors': {'message': 'Product not found.'}}, 404
 
-    # This will query all reviews for the product
-    reviews = Review.query.filter_by(product_id=product_id).all()
-    # This will return the reviews in a list of dictionaries
-    return {'reviews': [review.to_dict() for review in reviews]}, 200
+    # This will query the reviews for the product
+    # And it will return them as a list of dictionaries, a page at a time if ?limit= is given
+    return list_response('reviews', Review.query.filter_by(product_id=product_id), Review.id)
+
+# This is the async version of get_reviews, served natively by app.asgi
+async def get_reviews_async(product_id):
+    """Get all reviews for a product (async serving mode)."""
+    async with async_session() as session:
+        # If the product is not found, it will return an error
+        if not await session.scalar(select(Product.id).filter_by(id=product_id)):
+            return {'errors': {'message': 'Product not found.'}}, 404
+
+        # This will page through the reviews for the product on the async session
+        return await async_list_response(session, 'reviews', Review.query.filter_by(product_id=product_id), Review.id)
+
+# This route gets the rating summary for a product
+@review_routes.route('/product/<int:product_id>/summary', methods=['GET'])
+def get_rating_summary(product_id):
+    """Get the average rating, review count and star histogram for a product."""
+
+    # If the product is not found, it will return an error
+    if not db.session.query(Product.id).filter_by(id=product_id).scalar():
+        return {'errors': {'message': 'Product not found.'}}, 404
+
+    # This will return the precomputed summary, without reading any reviews
+    return {'rating': rating_summary(product_id)}
 
 # This route updates a review by its ID (only by the author)
 @review_routes.route('/<int:id>', methods=['PUT'])
@@ -84,9 +122,13 @@ def update_review(id):
 
     # If the form is valid, it will update the review's rating and comment
     if form.validate_on_submit():
+        # This will move the review from its old star count to its new one
+        apply_rating_change(review.product_id, old=review.rating, new=form.data['rating'])
         review.rating = form.data['rating']
         review.comment = form.data.get('comment')
         db.session.commit()
+        # This will refresh the store's cached storefront
+        _invalidate_product_store(review.product_id)
         # This will return the updated review in a dictionary format
         return {'review': review.to_dict()}
     # If the form is not valid, it will return the errors
@@ -106,9 +148,15 @@ def delete_review(id):
         
         return {'errors': {'message': 'Review not found or forbidden.'}}, 404
 
+    # This will keep the product ID for after the review is gone
+    product_id = review.product_id
+    # This will take the review out of the product's rating summary
+    apply_rating_change(product_id, old=review.rating)
     # This will delete the review from the database
     db.session.delete(review)
     # This will commit the changes to the database
     db.session.commit()
+    # This will refresh the store's cached storefront
+    _invalidate_product_store(product_id)
     # This will return the success message
     return {'message': 'Review deleted.'}
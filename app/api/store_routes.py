@@ -2,6 +2,8 @@ from flask import Blueprint, request
 from flask_login import login_required, current_user
 from ..models import db, Store
 from ..forms.store_form import StoreForm
+from ..services.cache import invalidate_storefront
+from ..services.identity import with_store, forget_identity
 
 # This is the blueprint for store-related routes
 store_routes = Blueprint('stores', __name__)
@@ -9,12 +11,10 @@ store_routes = Blueprint('stores', __name__)
 # This route gets the store for the current user
 @store_routes.route('/me', methods=['GET'])
 @login_required
-def get_user_store():
+@with_store
+def get_user_store(store):
     """Get the store for the current user."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
-
     # If the store is found, it will return the store in a dictionary format
     if store:
         return {'store': store.to_dict()}
@@ -24,17 +24,22 @@ def get_user_store():
 # This route creates a new store for the current user
 @store_routes.route('/', methods=['POST'])
 @login_required
-def create_store():
+@with_store
+def create_store(store):
     """Create a new store for the current user."""
 
     # This will get the JSON data from the request
     data = request.get_json()
 
     # This will check if the user already has a store
-    if Store.query.filter_by(user_id=current_user.id).first():
+    if store:
         # If the user already has a store, it will return an error
         return {'errors': {'message': 'Store already exists for this user.'}}, 400
 
+    # This will check the store name is free, since storefronts are looked up by name
+    if Store.query.filter_by(name=data.get('name')).first():
+        return {'errors': {'message': 'Store name is already taken.'}}, 400
+
     # This will create a new store with the provided JSON data
     store = Store(
         user_id=current_user.id,
@@ -49,6 +54,10 @@ def create_store():
         db.session.add(store)
         # This will commit the changes to the database
         db.session.commit()
+        # This will drop any cached storefront pages under the new name
+        # And the cached identity that still says the user has no store
+        invalidate_storefront(store.name)
+        forget_identity(current_user.id)
         # This will return the created store in a dictionary format
         return {'store': store.to_dict()}, 201
     except Exception as e:
@@ -59,14 +68,20 @@ def create_store():
 # This route updates the store for the current user
 @store_routes.route('/me', methods=['PUT'])
 @login_required
-def update_my_store():
+@with_store
+def update_my_store(store):
     """Update the store for the current user, or create it if none exists."""
 
     # This will get the JSON data from the request
     data = request.get_json()
 
-    # This will attempt to get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
+    # This is the name the store is cached under before the update
+    old_name = store.name if store else None
+
+    # This will check the new name is not used by another store
+    taken = Store.query.filter_by(name=data.get('name')).first()
+    if taken and taken is not store:
+        return {'errors': {'message': 'Store name is already taken.'}}, 400
 
     if store:
         # If the store exists, update its details
@@ -88,6 +103,10 @@ def update_my_store():
     try:
         # This will commit either the updates or the new store to the database
         db.session.commit()
+        # This will drop the cached storefront pages under the old and new names
+        # And the cached identity holding the old store details
+        invalidate_storefront(old_name, store.name)
+        forget_identity(current_user.id)
         # This will return the updated or newly created store in a dictionary format
         return {'store': store.to_dict()}
     except Exception as e:
@@ -98,21 +117,26 @@ def update_my_store():
 # This route deletes the store for the current user (hard delete)
 @store_routes.route('/me', methods=['DELETE'])
 @login_required
-def delete_my_store():
+@with_store
+def delete_my_store(store):
     """Permanently delete the store for the current user."""
 
-    # This will get the store for the current user
-    store = Store.query.filter_by(user_id=current_user.id).first()
-
     # If the store is not found, it will return an error
     if not store:
         return {'errors': {'message': 'Store not found.'}}, 404
 
+    # This is the name the store is cached under
+    store_name = store.name
+
     try:
         # This will permanently delete the store from the database
         db.session.delete(store)
         # This will commit the changes to the database
         db.session.commit()
+        # This will drop the cached storefront pages for the deleted store
+        # And the cached identity that still points at it
+        invalidate_storefront(store_name)
+        forget_identity(current_user.id)
         # This will return a consistent success response
         return {'message': 'Store permanently deleted.', 'store': None}, 200
     except Exception as e:
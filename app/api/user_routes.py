@@ -1,6 +1,7 @@
 from flask import Blueprint, jsonify
 from flask_login import login_required
 from app.models import User
+from app.services.pagination import list_response
 
 user_routes = Blueprint('users', __name__)
 
@@ -9,10 +10,10 @@ user_routes = Blueprint('users', __name__)
 @login_required
 def users():
     """
-    Query for all users and returns them in a list of user dictionaries
+    Query for all users and returns them in a list of user dictionaries.
+    Supports paging with ?limit=&after= or ?stream=1
     """
-    users = User.query.all()
-    return {'users': [user.to_dict() for user in users]}
+    return list_response('users', User.query, User.id)
 
 
 @user_routes.route('/<int:id>')
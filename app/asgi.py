@@ -0,0 +1,116 @@
+# app/asgi.py
+"""
+ASGI entry point for the async serving mode:
+
+    gunicorn -k uvicorn.workers.UvicornWorker app.asgi:application
+
+The public storefront and the review list are served natively on an async
+SQLAlchemy session (asyncpg / aiosqlite), so a worker keeps serving while they
+wait on the database. Every other route runs the existing Flask app in a thread
+pool, so all the blueprints keep working unchanged.
+
+Checkout (public.public_create_order) deliberately stays sync. It claims the
+Idempotency-Key, decrements stock with conditional updates, and queues the
+analytics and webhook jobs, all in one transaction on the Flask-SQLAlchemy
+session, which those helpers are written against. An async copy would have to
+duplicate that race-sensitive code. Checkout is also a short write, not the
+slow read the async views are for, so it runs in the thread pool like any
+other route.
+"""
+
+import io
+from asgiref.sync import sync_to_async
+from asgiref.wsgi import WsgiToAsgiInstance
+from flask import Response, request
+from . import app
+from .api.public_routes import public_storefront_async
+from .api.review_routes import get_reviews_async
+from .services.async_db import AsyncStream, dispose_async_db, init_async_db
+
+# These are the Flask endpoints answered by async views instead of their sync ones
+ASYNC_VIEWS = {
+    'public.public_storefront': public_storefront_async,
+    'reviews.get_reviews': get_reviews_async
+}
+
+
+# asgiref runs every WSGI request on one shared thread by default;
+# the Flask app is thread-safe, so it gets the whole thread pool instead
+class _ThreadedWsgiInstance(WsgiToAsgiInstance):
+    run_wsgi_app = sync_to_async(WsgiToAsgiInstance.__dict__['run_wsgi_app'].func, thread_sensitive=False)
+
+
+# This serves the Flask app itself over ASGI
+async def wsgi_application(scope, receive, send):
+    await _ThreadedWsgiInstance(app)(scope, receive, send)
+
+
+# This turns the ASGI scope of a bodiless GET/HEAD request into a WSGI environ,
+# so Flask can match the route and run its hooks for the async views too
+def _build_environ(scope):
+    bridge = WsgiToAsgiInstance(app)
+    bridge.scope = scope
+    return bridge.build_environ(scope, io.BytesIO())
+
+
+async def application(scope, receive, send):
+    if scope['type'] == 'lifespan':
+        return await _lifespan(receive, send)
+    if scope['type'] == 'http' and scope['method'] in ('GET', 'HEAD'):
+        environ = _build_environ(scope)
+        ctx = app.request_context(environ)
+        ctx.push()
+        try:
+            view = ASYNC_VIEWS.get(request.endpoint) if request.url_rule else None
+            if view is not None:
+                return await _dispatch(view, scope, send)
+        finally:
+            ctx.pop()
+    return await wsgi_application(scope, receive, send)
+
+
+# This runs an async view the way Flask runs a sync one: the before_request hooks
+# (like the https redirect), the view, then the after_request hooks (CORS, CSRF cookie)
+async def _dispatch(view, scope, send):
+    chunks = None
+    try:
+        try:
+            rv = app.preprocess_request()
+            if rv is None:
+                rv = await view(**request.view_args)
+                if isinstance(rv, AsyncStream):
+                    chunks, rv = rv.chunks, Response(mimetype=rv.mimetype)
+        except Exception as e:
+            rv = app.handle_user_exception(e)
+        response = app.process_response(app.make_response(rv))
+    except Exception as e:
+        chunks = None
+        response = app.handle_exception(e)
+
+    await send({
+        'type': 'http.response.start',
+        'status': response.status_code,
+        'headers': [(name.lower().encode('latin1'), value.encode('latin1')) for name, value in response.headers.items()]
+    })
+    if scope['method'] == 'HEAD':
+        await send({'type': 'http.response.body', 'body': b''})
+    elif chunks is not None:
+        # The request context stays pushed while streaming, since the chunks read from it
+        async for chunk in chunks:
+            await send({'type': 'http.response.body', 'body': chunk.encode(), 'more_body': True})
+        await send({'type': 'http.response.body', 'body': b''})
+    else:
+        await send({'type': 'http.response.body', 'body': response.get_data()})
+
+
+# This opens the async engine when a worker starts and closes its pool when it stops
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message['type'] == 'lifespan.startup':
+            init_async_db(app)
+            await send({'type': 'lifespan.startup.complete'})
+        elif message['type'] == 'lifespan.shutdown':
+            await dispose_async_db(app)
+            await send({'type': 'lifespan.shutdown.complete'})
+            return
@@ -0,0 +1,8 @@
+from .search import search_commands
+from .perf import perf_commands
+from .products import product_commands
+from .reviews import review_commands
+from .analytics import analytics_commands
+from .idempotency import idempotency_commands
+from .jobs import jobs_commands
+from .storage import storage_commands
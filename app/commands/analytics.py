@@ -0,0 +1,19 @@
+# app/commands/analytics.py
+
+import click
+from flask.cli import AppGroup
+from app.models import db
+from app.services.analytics import rebuild_sales_rollups
+
+# Creates an analytics group to hold our commands
+# So we can type `flask analytics --help`
+analytics_commands = AppGroup('analytics')
+
+
+# Creates the `flask analytics rebuild` command
+@analytics_commands.command('rebuild')
+def rebuild():
+    """Recompute every store's daily sales rollups from its orders (backfill or repair)."""
+    rebuild_sales_rollups()
+    db.session.commit()
+    click.echo('Sales rollups rebuilt.')
@@ -0,0 +1,22 @@
+# app/commands/idempotency.py
+
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from app.services.idempotency import sweep_idempotency_keys
+
+# Creates an idempotency group to hold our commands
+# So we can type `flask idempotency --help`
+idempotency_commands = AppGroup('idempotency')
+
+
+# Creates the `flask idempotency sweep` command, meant to run from cron
+@idempotency_commands.command('sweep')
+@click.option('--ttl', type=int, default=None, help='Age in seconds past which keys are deleted (default IDEMPOTENCY_KEY_TTL).')
+@click.option('--batch-size', type=int, default=1000, show_default=True, help='Keys deleted per transaction.')
+def sweep(ttl, batch_size):
+    """Delete Idempotency-Key records older than their TTL."""
+    if ttl is None:
+        ttl = current_app.config['IDEMPOTENCY_KEY_TTL']
+    deleted = sweep_idempotency_keys(ttl, batch_size)
+    click.echo(f'Deleted {deleted} expired idempotency keys.')
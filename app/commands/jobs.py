@@ -0,0 +1,77 @@
+# app/commands/jobs.py
+
+import logging
+import signal
+import threading
+import click
+from flask.cli import AppGroup
+from app.services.jobs import STATUSES, list_jobs, logger, purge_jobs, queue_stats, retry_jobs, work
+
+# Creates a jobs group to hold our commands
+# So we can type `flask jobs --help`
+jobs_commands = AppGroup('jobs')
+
+
+# Creates the `flask jobs work` command
+@jobs_commands.command('work')
+@click.option('--batch-size', default=10, show_default=True, help='Jobs claimed at a time.')
+@click.option('--poll-interval', type=float, default=None, help='Seconds to wait when no job is due (default JOBS_POLL_INTERVAL).')
+@click.option('--once', is_flag=True, help='Run the jobs that are due now, then exit.')
+def work_command(batch_size, poll_interval, once):
+    """Run background jobs until stopped; SIGTERM or Ctrl-C lets the current job finish first."""
+    # Job runs are logged as JSON lines of their own
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    stop = threading.Event()
+
+    def request_stop(signum, frame):
+        stop.set()
+
+    signal.signal(signal.SIGTERM, request_stop)
+    signal.signal(signal.SIGINT, request_stop)
+    click.echo('Working on jobs' + (' that are due.' if once else ' (stop with Ctrl-C).'))
+    ran = work(stop, batch_size=batch_size, poll_interval=poll_interval, once=once)
+    click.echo(f'Ran {ran} jobs.')
+
+
+# Creates the `flask jobs status` command
+@jobs_commands.command('status')
+def status():
+    """Show how many jobs are queued, running, done and failed, and how far behind the queue is."""
+    stats = queue_stats()
+    for name, count in stats['counts'].items():
+        click.echo(f'{name:8} {count}')
+    click.echo(f"due now  {stats['due']} (oldest waiting {stats['oldest_due_seconds']:.0f}s)")
+
+
+# Creates the `flask jobs list` command
+@jobs_commands.command('list')
+@click.option('--status', 'job_status', type=click.Choice(STATUSES), default=None, help='Only jobs in this status.')
+@click.option('--limit', default=20, show_default=True)
+def list_command(job_status, limit):
+    """List the most recent jobs, with the last error of each."""
+    for job in list_jobs(job_status, limit):
+        click.echo(f'{job.id:>8} {job.status:8} {job.name} attempts={job.attempts}/{job.max_attempts} run_at={job.run_at.isoformat()}')
+        if job.last_error:
+            click.echo('         ' + job.last_error.strip().splitlines()[-1])
+
+
+# Creates the `flask jobs retry` command
+@jobs_commands.command('retry')
+@click.argument('job_ids', nargs=-1, type=int)
+def retry(job_ids):
+    """Queue failed jobs again (the given ids, or every failed job)."""
+    click.echo(f'Queued {retry_jobs(job_ids)} failed jobs again.')
+
+
+# Creates the `flask jobs purge` command
+@jobs_commands.command('purge')
+@click.option('--older-than', default=7 * 24 * 60 * 60, show_default=True, help='Age in seconds of the done jobs to delete.')
+def purge(older_than):
+    """Delete finished jobs, keeping the failed ones for inspection."""
+    click.echo(f'Deleted {purge_jobs(older_than)} done jobs.')
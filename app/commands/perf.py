@@ -0,0 +1,255 @@
+# app/commands/perf.py
+
+import json
+import re
+import threading
+import time
+import uuid
+import click
+from flask import current_app
+from flask.cli import AppGroup
+from sqlalchemy import event, func
+from app.models import db, User, Store, Product, Order, OrderLine, Review, Tag
+from app.services.cache import NullCache, invalidate_storefront
+from app.services.analytics import forget_product, queue_order_removal
+from app.services.search import index_product, remove_product
+
+# Creates a perf group to hold our commands
+# So we can type `flask perf --help`
+perf_commands = AppGroup('perf')
+
+# This matches a SQLite plan step that reads a whole table without an index
+SQLITE_FULL_SCAN = re.compile(r'^SCAN (\w+)$')
+
+
+# This will find the store with the most products
+def _busiest_store():
+    return (
+        db.session.query(Store)
+        .join(Product, Product.store_id == Store.id)
+        .group_by(Store.id)
+        .order_by(func.count(Product.id).desc())
+        .first()
+    )
+
+
+# This will list the GET routes to check, using the busiest store in the database
+def _routes():
+    store = _busiest_store()
+    if not store:
+        return None, []
+    product = Product.query.filter_by(store_id=store.id).order_by(Product.id.desc()).first()
+    order = Order.query.filter_by(store_id=store.id).order_by(Order.id.desc()).first()
+    tag = product.tags[0].name if product.tags else 'tag'
+    word = product.title.split()[0]
+
+    routes = [
+        '/api/stores/me',
+        '/api/orders?limit=50',
+        '/api/products?limit=50',
+        f'/api/products/{product.id}',
+        f'/api/public/stores/{store.name}?limit=50',
+        f'/api/public/stores/{store.name}?q={word}&limit=50',
+        f'/api/public/stores/{store.name}?tag={tag}&limit=50',
+        f'/api/reviews/product/{product.id}?limit=50',
+        '/api/users/?limit=50',
+    ]
+    if order:
+        routes.append(f'/api/orders/{order.id}')
+    return store, routes
+
+
+# This will find the full table scans in a Postgres JSON plan
+def _postgres_scans(node, found):
+    if node.get('Node Type') == 'Seq Scan':
+        found.append(node.get('Relation Name'))
+    for child in node.get('Plans', []):
+        _postgres_scans(child, found)
+    return found
+
+
+# This will EXPLAIN one captured statement and return the tables it fully scans
+def _full_scans(connection, dialect, statement, parameters):
+    cursor = connection.cursor()
+    try:
+        if dialect == 'postgresql':
+            cursor.execute('EXPLAIN (FORMAT JSON) ' + statement, parameters)
+            plan = cursor.fetchone()[0]
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return _postgres_scans(plan[0]['Plan'], [])
+        cursor.execute('EXPLAIN QUERY PLAN ' + statement, parameters)
+        scans = []
+        for row in cursor.fetchall():
+            match = SQLITE_FULL_SCAN.match(row[-1])
+            if match:
+                scans.append(match.group(1))
+        return scans
+    finally:
+        cursor.close()
+
+
+# Creates the `flask perf explain` command
+@perf_commands.command('explain')
+@click.option('--min-rows', default=1000, show_default=True,
+              help='Tables smaller than this may be scanned without failing.')
+def explain(min_rows):
+    """
+    EXPLAIN every query issued by the main GET routes and fail if a query on a
+    large table falls back to a sequential scan. Run `flask seed perf` first.
+    """
+    store, routes = _routes()
+    if not store:
+        raise click.ClickException('No products found. Run `flask seed perf` first.')
+
+    # Query counts per table decide which scans are acceptable
+    row_counts = {}
+    for model in (User, Store, Product, Order, Review, Tag):
+        row_counts[model.__tablename__] = db.session.query(func.count(model.id)).scalar()
+
+    # The cache is bypassed so every route really reaches the database
+    current_app.extensions['cache'] = NullCache()
+    engine = db.engine
+    dialect = engine.dialect.name
+    captured = []
+
+    def capture(conn, cursor, statement, parameters, context, executemany):
+        if statement.lstrip().upper().startswith('SELECT') and not executemany:
+            captured.append((statement, parameters))
+
+    client = current_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(store.user_id)
+        session['_fresh'] = True
+
+    failures = 0
+    connection = engine.raw_connection()
+    try:
+        for route in routes:
+            captured.clear()
+            event.listen(engine, 'before_cursor_execute', capture)
+            try:
+                response = client.get(route)
+            finally:
+                event.remove(engine, 'before_cursor_execute', capture)
+
+            problems = []
+            for statement, parameters in captured:
+                for table in _full_scans(connection, dialect, statement, parameters):
+                    if row_counts.get(table, min_rows) >= min_rows:
+                        problems.append((table, statement))
+
+            status = 'FAIL' if problems else 'ok'
+            click.echo(f'{status:4} {response.status_code} {route} ({len(captured)} queries)')
+            for table, statement in problems:
+                failures += 1
+                click.echo(f'     sequential scan on {table}:')
+                click.echo('     ' + ' '.join(statement.split()))
+    finally:
+        connection.close()
+
+    if failures:
+        raise click.ClickException(f'{failures} queries fall back to a sequential scan.')
+    click.echo('All route queries use an index.')
+
+
+# This will read a percentile from a sorted list of timings
+def _percentile(timings, fraction):
+    if not timings:
+        return 0.0
+    return timings[min(len(timings) - 1, int(len(timings) * fraction))]
+
+
+# Creates the `flask perf stock` command
+@perf_commands.command('stock')
+@click.option('--threads', default=8, show_default=True,
+              help='Concurrent buyers (keep it within the connection pool: DB_POOL_SIZE + DB_MAX_OVERFLOW).')
+@click.option('--attempts', default=400, show_default=True, help='Orders tried in total.')
+@click.option('--stock', default=100, show_default=True, help='Units of the hot product on sale.')
+@click.option('--quantity', default=1, show_default=True, help='Units per order.')
+@click.option('--keep', is_flag=True, help='Keep the benchmark product and its orders afterwards.')
+def stock(threads, attempts, stock, quantity, keep):
+    """
+    Flash sale benchmark: many threads check out one hot product through the
+    public order route at once. Fails if more units were sold than were in stock,
+    or if the orders and the remaining stock do not add up.
+    """
+    store = _busiest_store()
+    if not store:
+        raise click.ClickException('No products found. Run `flask seed all` or `flask seed perf` first.')
+
+    # The hot product is created for the run, so real stock is never touched
+    product = Product(
+        store_id=store.id,
+        title=f'Stock benchmark {uuid.uuid4().hex[:8]}',
+        price=1.0,
+        stock_quantity=stock
+    )
+    db.session.add(product)
+    db.session.flush()
+    # It is indexed for search like a product created through the API, and removed the same way below
+    index_product(product, ())
+    db.session.commit()
+    product_id, store_name, url = product.id, store.name, f'/api/public/stores/{store.name}/orders'
+    body = {
+        'buyer_name': 'Benchmark',
+        'buyer_email': 'benchmark@example.com',
+        'items': [{'product_name': product.title, 'quantity': quantity}]
+    }
+
+    # The buyers run outside this app context, so they are handed the app itself
+    app = current_app._get_current_object()
+    lock = threading.Lock()
+    remaining = [attempts]
+    statuses, timings = {}, []
+
+    def buyer():
+        client = app.test_client()
+        while True:
+            with lock:
+                if not remaining[0]:
+                    return
+                remaining[0] -= 1
+            started = time.perf_counter()
+            try:
+                status = client.post(url, json=body).status_code
+            except Exception as e:
+                status = type(e).__name__
+            elapsed = (time.perf_counter() - started) * 1000
+            with lock:
+                statuses[status] = statuses.get(status, 0) + 1
+                timings.append(elapsed)
+
+    click.echo(f'{threads} threads, {attempts} orders of {quantity} for {stock} units in "{store_name}"')
+    workers = [threading.Thread(target=buyer) for _ in range(threads)]
+    started = time.perf_counter()
+    for worker in workers:
+        worker.start()
+    for worker in workers:
+        worker.join()
+    wall = time.perf_counter() - started
+
+    db.session.expire_all()
+    left = db.session.query(Product.stock_quantity).filter_by(id=product_id).scalar()
+    sold = db.session.query(func.coalesce(func.sum(OrderLine.quantity), 0)).filter_by(product_id=product_id).scalar()
+    timings.sort()
+    click.echo(f'  statuses:    {", ".join(f"{status}={count}" for status, count in sorted(statuses.items(), key=str))}')
+    click.echo(f'  throughput:  {attempts / wall:.1f} orders/s over {wall:.2f}s')
+    click.echo(f'  latency ms:  p50={_percentile(timings, 0.5):.1f} p95={_percentile(timings, 0.95):.1f} max={_percentile(timings, 1):.1f}')
+    click.echo(f'  units sold:  {sold} of {stock}, {left} left')
+
+    if not keep:
+        # This queues taking the benchmark orders back out of the rollups before deleting them
+        orders = Order.query.join(OrderLine, OrderLine.order_id == Order.id).filter(OrderLine.product_id == product_id).all()
+        for order in orders:
+            queue_order_removal(order)
+            db.session.delete(order)
+        remove_product(product_id)
+        forget_product(product_id)
+        db.session.delete(Product.query.get(product_id))
+        db.session.commit()
+        invalidate_storefront(store_name)
+
+    if left is None or left < 0 or sold + left != stock or sold != statuses.get(201, 0) * quantity:
+        raise click.ClickException('Stock was oversold or lost.')
+    click.echo('No overselling.')
@@ -0,0 +1,57 @@
+# app/commands/products.py
+
+import click
+from flask.cli import AppGroup
+from app.models import Store
+from app.services.cache import invalidate_storefront
+from app.services.catalog import import_products, export_products, read_rows
+
+# Creates a products group to hold our commands
+# So we can type `flask products --help`
+product_commands = AppGroup('products')
+
+
+# This will look up a store by name or fail the command
+def _get_store(store_name):
+    store = Store.query.filter_by(name=store_name).first()
+    if not store:
+        raise click.ClickException(f'Store {store_name!r} not found.')
+    return store
+
+
+# This will guess the file format from its name
+def _file_format(path, fmt):
+    if fmt:
+        return fmt
+    return 'ndjson' if path.lower().endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+# Creates the `flask products import` command
+@product_commands.command('import')
+@click.argument('store_name')
+@click.argument('path', type=click.Path(exists=True, dir_okay=False))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+def import_command(store_name, path, fmt):
+    """Import products for STORE_NAME from a CSV or NDJSON file."""
+    store = _get_store(store_name)
+    with open(path, encoding='utf-8-sig', newline='') as stream:
+        report = import_products(store, read_rows(stream, _file_format(path, fmt)))
+    invalidate_storefront(store.name)
+
+    click.echo(f"Imported {report['imported']} products, {report['error_count']} rows rejected.")
+    for error in report['errors']:
+        click.echo(f"  row {error['row']}: {error['message']}")
+
+
+# Creates the `flask products export` command
+@product_commands.command('export')
+@click.argument('store_name')
+@click.argument('path', type=click.Path(dir_okay=False, writable=True))
+@click.option('--format', 'fmt', type=click.Choice(['csv', 'ndjson']), help='Defaults to the file extension.')
+def export_command(store_name, path, fmt):
+    """Export the products of STORE_NAME to a CSV or NDJSON file."""
+    store = _get_store(store_name)
+    with open(path, 'w', encoding='utf-8', newline='') as out:
+        for chunk in export_products(store, _file_format(path, fmt)):
+            out.write(chunk)
+    click.echo(f'Exported products to {path}.')
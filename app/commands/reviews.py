@@ -0,0 +1,19 @@
+# app/commands/reviews.py
+
+import click
+from flask.cli import AppGroup
+from app.models import db
+from app.services.ratings import rebuild_ratings
+
+# Creates a reviews group to hold our commands
+# So we can type `flask reviews --help`
+review_commands = AppGroup('reviews')
+
+
+# Creates the `flask reviews backfill` command
+@review_commands.command('backfill')
+def backfill():
+    """Recompute every product's rating summary from its reviews."""
+    rebuild_ratings()
+    db.session.commit()
+    click.echo('Product rating summaries rebuilt.')
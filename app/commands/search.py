@@ -0,0 +1,19 @@
+# app/commands/search.py
+
+import click
+from flask.cli import AppGroup
+from app.models import db
+from app.services.search import rebuild_index
+
+# Creates a search group to hold our commands
+# So we can type `flask search --help`
+search_commands = AppGroup('search')
+
+
+# Creates the `flask search reindex` command
+@search_commands.command('reindex')
+def reindex():
+    """Rebuild the product full-text search index."""
+    rebuild_index()
+    db.session.commit()
+    click.echo('Product search index rebuilt.')
@@ -0,0 +1,38 @@
+# app/commands/storage.py
+
+import uuid
+import click
+from flask.cli import AppGroup
+from app.services.storage import S3Storage, get_storage
+
+# Creates a storage group to hold our commands
+# So we can type `flask storage --help`
+storage_commands = AppGroup('storage')
+
+
+# Creates the `flask storage check` command
+@storage_commands.command('check')
+@click.option('--create-bucket', is_flag=True, help='Create the S3 bucket first if it does not exist (e.g. on a fresh MinIO).')
+def check(create_bucket):
+    """Write, read, presign and delete a test file on the configured storage backend."""
+    storage = get_storage()
+    if create_bucket:
+        if not isinstance(storage, S3Storage):
+            raise click.ClickException('--create-bucket needs STORAGE_BACKEND=s3.')
+        storage.create_bucket()
+
+    key = f'checks/{uuid.uuid4().hex}.txt'
+    data = b'StoreDash storage check'
+    storage.put(key, data, content_type='text/plain')
+    try:
+        if not storage.exists(key) or storage.get(key) != data:
+            raise click.ClickException(f'{key} did not read back as written.')
+        click.echo(f'{type(storage).__name__}: wrote and read back {key}')
+        click.echo(f'  served from: {storage.url(key)}')
+        form = storage.presign_upload(key, 'text/plain', len(data), 60)
+        click.echo(f"  presigned uploads: {'yes, to ' + form['url'] if form else 'no'}")
+    finally:
+        storage.delete(key)
+    if storage.exists(key):
+        raise click.ClickException(f'{key} was not deleted.')
+    click.echo('Storage works.')
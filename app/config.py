@@ -11,10 +11,106 @@ class Config:
     # so the connection uri must be updated here (for production)
     SQLALCHEMY_DATABASE_URI = os.environ.get(
         'DATABASE_URL').replace('postgres://', 'postgresql://')
-    SQLALCHEMY_ECHO = True
+    # Echo prints every statement and its parameters; it is for local debugging only
+    SQLALCHEMY_ECHO = os.environ.get('SQLALCHEMY_ECHO', 'false').lower() in ('1', 'true', 'yes', 'on')
+    # Structured query logging (app/services/query_log.py), off by default:
+    # queries slower than QUERY_LOG_SLOW_MS are always logged, the rest at QUERY_LOG_SAMPLE_RATE,
+    # and every request that queried the database logs its query count and time
+    QUERY_LOG = os.environ.get('QUERY_LOG', 'false').lower() in ('1', 'true', 'yes', 'on')
+    QUERY_LOG_SAMPLE_RATE = float(os.environ.get('QUERY_LOG_SAMPLE_RATE', 0.01))
+    QUERY_LOG_SLOW_MS = int(os.environ.get('QUERY_LOG_SLOW_MS', 200))
+    QUERY_LOG_MAX_FINGERPRINTS = int(os.environ.get('QUERY_LOG_MAX_FINGERPRINTS', 500))
 
     UPLOAD_FOLDER = os.path.join(os.path.abspath(os.path.dirname(__file__)), 'uploads')
-    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
+    ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif', 'webp'}
+    # Uploaded images are resized in this many pool processes (0 processes them in the request)
+    IMAGE_WORKERS = int(os.environ.get('IMAGE_WORKERS', 2))
+    # Seconds an upload may spend in the pool, and the largest width * height decoded
+    IMAGE_PROCESS_TIMEOUT = int(os.environ.get('IMAGE_PROCESS_TIMEOUT', 30))
+    IMAGE_MAX_PIXELS = int(os.environ.get('IMAGE_MAX_PIXELS', 40_000_000))
+    # Largest image upload accepted, and the largest chunk of a resumable upload
+    IMAGE_MAX_UPLOAD_BYTES = int(os.environ.get('IMAGE_MAX_UPLOAD_BYTES', 20 * 1024 * 1024))
+    UPLOAD_CHUNK_BYTES = int(os.environ.get('UPLOAD_CHUNK_BYTES', 4 * 1024 * 1024))
+    # Largest request body Werkzeug parses (413 beyond it): an image or a chunk plus the multipart
+    # form around it, checked before the body is read; the bulk product import has its own limit
+    MAX_CONTENT_LENGTH = max(IMAGE_MAX_UPLOAD_BYTES, UPLOAD_CHUNK_BYTES) + 64 * 1024
+    CATALOG_IMPORT_MAX_BYTES = int(os.environ.get('CATALOG_IMPORT_MAX_BYTES', 200 * 1024 * 1024))
+    # Resumable uploads are assembled here, and dropped if unfinished after UPLOAD_EXPIRY seconds;
+    # every replica must see the same folder (see RESUMABLE_UPLOADS below)
+    UPLOAD_TMP_FOLDER = os.environ.get('UPLOAD_TMP_FOLDER', os.path.join(os.path.abspath(os.path.dirname(__file__)), 'uploads_tmp'))
+    UPLOAD_EXPIRY = int(os.environ.get('UPLOAD_EXPIRY', 24 * 60 * 60))
+
+    # Where uploads are stored: 'local' (UPLOAD_FOLDER) or 's3' (any S3-compatible bucket, e.g. MinIO)
+    # (.env.example sets up a local MinIO; `flask storage check` tests the configured backend)
+    STORAGE_BACKEND = os.environ.get('STORAGE_BACKEND', 'local')
+    STORAGE_S3_BUCKET = os.environ.get('STORAGE_S3_BUCKET')
+    STORAGE_S3_PREFIX = os.environ.get('STORAGE_S3_PREFIX', 'uploads/')
+    STORAGE_S3_ENDPOINT_URL = os.environ.get('STORAGE_S3_ENDPOINT_URL')
+    STORAGE_S3_REGION = os.environ.get('STORAGE_S3_REGION')
+    STORAGE_S3_ACCESS_KEY = os.environ.get('STORAGE_S3_ACCESS_KEY')
+    STORAGE_S3_SECRET_KEY = os.environ.get('STORAGE_S3_SECRET_KEY')
+    # Public bucket or CDN address; without it reads go through a presigned redirect
+    STORAGE_PUBLIC_URL = os.environ.get('STORAGE_PUBLIC_URL')
+    # Seconds presigned upload forms and download links stay valid
+    STORAGE_PRESIGN_EXPIRY = int(os.environ.get('STORAGE_PRESIGN_EXPIRY', 60 * 60))
+    # Resumable uploads keep their parts in UPLOAD_TMP_FOLDER, so with s3 (usually several replicas)
+    # they are off and clients use the presigned /api/images/direct flow; only turn them back on
+    # when UPLOAD_TMP_FOLDER is a volume shared by every replica
+    RESUMABLE_UPLOADS = os.environ.get(
+        'RESUMABLE_UPLOADS', 'false' if STORAGE_BACKEND == 's3' else 'true'
+    ).lower() in ('1', 'true', 'yes', 'on')
+
+    # Request timing: Prometheus histograms on /metrics, and a Server-Timing header on each response
+    METRICS = os.environ.get('METRICS', 'true').lower() in ('1', 'true', 'yes', 'on')
+    SERVER_TIMING = os.environ.get('SERVER_TIMING', 'true').lower() in ('1', 'true', 'yes', 'on')
+
+    # Connection pool of the app's database engine, per worker process (SQLite keeps the default pool)
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 5))
+    DB_MAX_OVERFLOW = int(os.environ.get('DB_MAX_OVERFLOW', 10))
+    DB_POOL_TIMEOUT = int(os.environ.get('DB_POOL_TIMEOUT', 10))
+    # Seconds before a connection is replaced, and whether it is tested before each checkout
+    DB_POOL_RECYCLE = int(os.environ.get('DB_POOL_RECYCLE', 30 * 60))
+    DB_POOL_PRE_PING = os.environ.get('DB_POOL_PRE_PING', 'true').lower() in ('1', 'true', 'yes', 'on')
+    # Set when connecting through PgBouncer in transaction mode, which cannot keep prepared statements
+    DB_PGBOUNCER = os.environ.get('DB_PGBOUNCER', 'false').lower() in ('1', 'true', 'yes', 'on')
+    # Token for the /api/internal endpoints; without one they only answer requests from this host
+    INTERNAL_API_TOKEN = os.environ.get('INTERNAL_API_TOKEN')
+
+    # Connection pool of the async engine used by the ASGI serving mode (app.asgi), per worker
+    ASYNC_DB_POOL_SIZE = int(os.environ.get('ASYNC_DB_POOL_SIZE', 10))
+    ASYNC_DB_MAX_OVERFLOW = int(os.environ.get('ASYNC_DB_MAX_OVERFLOW', 10))
+    ASYNC_DB_POOL_TIMEOUT = int(os.environ.get('ASYNC_DB_POOL_TIMEOUT', 10))
+
+    # Cache for the public storefront: 'memory' (per-process LRU + TTL), 'redis' (shared) or 'null'
+    # A memory cache belongs to one gunicorn worker, so a write only invalidates the pages of
+    # the worker that served it and the others serve theirs until CACHE_DEFAULT_TIMEOUT runs out;
+    # setting CACHE_REDIS_URL makes the shared redis cache the default
+    CACHE_BACKEND = os.environ.get('CACHE_BACKEND', 'redis' if os.environ.get('CACHE_REDIS_URL') else 'memory')
+    CACHE_REDIS_URL = os.environ.get('CACHE_REDIS_URL', 'redis://localhost:6379/0')
+    CACHE_DEFAULT_TIMEOUT = int(os.environ.get('CACHE_DEFAULT_TIMEOUT', 60))
+    CACHE_MAX_ENTRIES = int(os.environ.get('CACHE_MAX_ENTRIES', 1024))
+    # Seconds a signed-in user and their store are reused without a query (0 turns it off);
+    # they are kept in CACHE_BACKEND, so with redis a store change is seen by every worker at once
+    IDENTITY_CACHE_TIMEOUT = int(os.environ.get('IDENTITY_CACHE_TIMEOUT', 10))
+
+    # Seconds an Idempotency-Key and its stored response are kept (`flask idempotency sweep` deletes older ones)
+    IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', 24 * 60 * 60))
+
+    # Background jobs, run by `flask jobs work`: attempts before a job is failed, and the retry backoff
+    # (JOBS_BACKOFF_BASE seconds, doubling each attempt up to JOBS_BACKOFF_MAX)
+    JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', 5))
+    JOBS_BACKOFF_BASE = float(os.environ.get('JOBS_BACKOFF_BASE', 10))
+    JOBS_BACKOFF_MAX = float(os.environ.get('JOBS_BACKOFF_MAX', 60 * 60))
+    # Seconds a running job may take before another worker assumes its worker was lost and runs it again
+    JOBS_LOCK_TIMEOUT = int(os.environ.get('JOBS_LOCK_TIMEOUT', 5 * 60))
+    # Seconds an idle worker waits before looking for due jobs again
+    JOBS_POLL_INTERVAL = float(os.environ.get('JOBS_POLL_INTERVAL', 1))
+
+    # Where order events are POSTed (placed, status changed, deleted); unset sends nothing
+    ORDER_WEBHOOK_URL = os.environ.get('ORDER_WEBHOOK_URL')
+    # Secret the X-StoreDash-Signature header (HMAC-SHA256 of the body) is made with
+    ORDER_WEBHOOK_SECRET = os.environ.get('ORDER_WEBHOOK_SECRET')
+    ORDER_WEBHOOK_TIMEOUT = float(os.environ.get('ORDER_WEBHOOK_TIMEOUT', 5))
 
 BASE_DIR = os.path.abspath(os.path.dirname(__file__))
 # UPLOAD_FOLDER = os.path.join(BASE_DIR, 'uploads')
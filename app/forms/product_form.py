@@ -1,9 +1,17 @@
 # app/forms/product_form.py
 
 from flask_wtf import FlaskForm
-from wtforms import StringField, DecimalField
+from wtforms import StringField, DecimalField, IntegerField
 from wtforms.validators import DataRequired, Length, Optional, URL, NumberRange
 
+# This is an IntegerField that reads a JSON null as a blank value instead of failing on it
+class NullableIntegerField(IntegerField):
+    def process_formdata(self, valuelist):
+        if valuelist and valuelist[0] is None:
+            self.raw_data = ['']
+            return
+        super().process_formdata(valuelist)
+
 # This form is used for creating and updating products
 class ProductForm(FlaskForm):
     # This field is for the product title with a max length of 255 characters
@@ -18,4 +26,7 @@ class ProductForm(FlaskForm):
     image_url = StringField('Image URL', validators=[Optional(), URL(), Length(max=255)])
     # This field is for the product tags, which can be a comma-separated list of tags
     # It is also an optional field and has a max length of 255 characters
-    tags = StringField('Tags', validators=[Optional(), Length(max=255)])
\ No newline at end of file
+    tags = StringField('Tags', validators=[Optional(), Length(max=255)])
+    # This field is for how many of the product are left to sell, which must not be negative
+    # It is optional: without it (or with null) stock is not tracked and in_stock is left as it is
+    stock_quantity = NullableIntegerField('Stock Quantity', validators=[Optional(), NumberRange(min=0)])
\ No newline at end of file
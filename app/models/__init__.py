@@ -2,6 +2,10 @@ from .db import db
 from .user import User
 from .db import environment, SCHEMA
 from .store import Store
-from .product import Product, Tag
-from .order import Order
+from .product import Product, Tag, normalize_title
+from .order import Order, OrderLine, order_total
 from .review import Review
+from .product_rating import ProductRating
+from .sales_rollup import SalesRollup, ProductSalesRollup
+from .idempotency_key import IdempotencyKey
+from .job import Job
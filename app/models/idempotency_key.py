@@ -0,0 +1,27 @@
+# app/models/idempotency_key.py
+
+from datetime import datetime
+from .db import db, environment, SCHEMA
+
+# This is the IdempotencyKey model
+# It remembers the response to a request sent with an Idempotency-Key header,
+# so a retry of the same request gets that response back instead of running again
+# A row is only ever committed together with its response, in the request's own transaction
+class IdempotencyKey(db.Model):
+    # This is the name of the table
+    __tablename__ = 'idempotency_keys'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the idempotency_keys table
+    # The scope is what the key belongs to (e.g. one store's orders), so clients cannot collide across stores
+    scope = db.Column(db.String(100), primary_key=True)
+    key = db.Column(db.String(255), primary_key=True)
+    # This is a hash of the request body, so a key cannot be reused for a different request
+    request_hash = db.Column(db.String(64), nullable=False)
+    status_code = db.Column(db.Integer, nullable=True)
+    response = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow, index=True)
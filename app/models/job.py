@@ -0,0 +1,53 @@
+# app/models/job.py
+
+from datetime import datetime
+from .db import db, environment, SCHEMA
+
+# This is the Job model
+# One row is one piece of background work: the name of its handler, its JSON payload,
+# and where it is in its life: queued -> running -> done, or back to queued with a
+# later run_at after a failure, until it runs out of attempts and is failed
+# Jobs are added in the same transaction as the change that causes them,
+# so a job exists exactly when that change was committed
+class Job(db.Model):
+    # This is the name of the table
+    __tablename__ = 'jobs'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the jobs table
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    payload = db.Column(db.Text, nullable=False, default='{}')
+    status = db.Column(db.String(20), nullable=False, default='queued')
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+    max_attempts = db.Column(db.Integer, nullable=False, default=5)
+    # This is when the job may next run; retries push it back
+    run_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    # These say which worker is running the job, and since when
+    locked_by = db.Column(db.String(100), nullable=True)
+    locked_at = db.Column(db.DateTime, nullable=True)
+    last_error = db.Column(db.Text, nullable=True)
+    created_at = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    # This is the method to convert the job to a dictionary format
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'name': self.name,
+            'status': self.status,
+            'attempts': self.attempts,
+            'max_attempts': self.max_attempts,
+            'run_at': self.run_at.isoformat(),
+            'locked_by': self.locked_by,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat(),
+            'finished_at': self.finished_at.isoformat() if self.finished_at else None
+        }
+
+# This index lets workers find the next jobs due without scanning finished ones
+db.Index('ix_jobs_status_run_at', Job.status, Job.run_at)
@@ -1,21 +1,45 @@
 # app/models/order.py
 
 from datetime import datetime
+from sqlalchemy import func, select
 from .db import db, environment, SCHEMA, add_prefix_for_prod
 
-# This is the many-to-many relationship table for orders and products
-# This is so it allows an order to have multiple products and a product to be part of multiple orders
-order_products = db.Table(
+# This is the OrderLine model
+# One line is one product in an order, with its quantity and the product's price and
+# title as they were when the order was placed, so an order never changes afterwards
+# and is rendered from its lines alone, without reading the products table
+class OrderLine(db.Model):
     # This is the name of the table
-    'order_products',
-    db.Model.metadata,
-    # This is the foreign key to the orders table
-    db.Column('order_id', db.Integer, db.ForeignKey(add_prefix_for_prod('orders.id')), primary_key=True),
-    # This is the foreign key to the products table
-    db.Column('product_id', db.Integer, db.ForeignKey(add_prefix_for_prod('products.id')), primary_key=True),
-    # This will ensure the table goes into the correct schema in production
-    schema=SCHEMA if environment == "production" else None
-)
+    __tablename__ = 'order_lines'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the order_lines table
+    id = db.Column(db.Integer, primary_key=True)
+    order_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('orders.id')), nullable=False)
+    # This is cleared when the product is deleted; the snapshot keeps the line readable
+    product_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('products.id'), ondelete='SET NULL'), nullable=True, index=True)
+    quantity = db.Column(db.Integer, nullable=False, default=1)
+    unit_price = db.Column(db.Float, nullable=False)
+    title = db.Column(db.String(255), nullable=False)
+
+    # This will build the line for a product, copying its current price and title
+    @classmethod
+    def for_product(cls, product, quantity=1):
+        return cls(product_id=product.id, quantity=quantity, unit_price=product.price, title=product.title)
+
+    # This is the method to convert the line to a dictionary format
+    def to_dict(self):
+        return {
+            'product_id': self.product_id,
+            'title': self.title,
+            'unit_price': self.unit_price,
+            'quantity': self.quantity,
+            'line_total': round(self.unit_price * self.quantity, 2)
+        }
 
 # This is the Order model
 class Order(db.Model):
@@ -35,13 +59,16 @@ class Order(db.Model):
     buyer_email = db.Column(db.String(255), nullable=False)  
     total_price = db.Column(db.Float, nullable=False)
     status = db.Column(db.String(32), nullable=False, default='pending')
+    # This is the status the sales rollups count the order under, set by the rollup job
+    # (NULL while the order is not counted yet), so they catch up without counting twice
+    rollup_status = db.Column(db.String(32), nullable=True)
     created_at = db.Column(db.DateTime, default=datetime.utcnow)
     updated_at = db.Column(db.DateTime, default=datetime.utcnow, onupdate=datetime.utcnow)
 
     # These three are the relationships for the order model
     user = db.relationship('User', backref=db.backref('orders', lazy=True))
     store = db.relationship('Store', backref=db.backref('orders', lazy=True))
-    products = db.relationship('Product', secondary=order_products, back_populates='orders')
+    lines = db.relationship('OrderLine', order_by='OrderLine.id', cascade='all, delete-orphan')
 
     # This is the method to convert the order to a dictionary format
     # This is useful for returning the order data in API responses
@@ -55,5 +82,18 @@ class Order(db.Model):
             'total_price': self.total_price,
             'status': self.status,
             'created_at': self.created_at.isoformat(),
-            'products': [product.to_dict() for product in self.products]
+            'lines': [line.to_dict() for line in self.lines]
         }
+
+
+# This is the SQL for the total of an order: the sum of quantity * unit price over its lines
+def order_total(order_id):
+    return select(func.coalesce(func.sum(OrderLine.quantity * OrderLine.unit_price), 0)).where(
+        OrderLine.order_id == order_id
+    ).scalar_subquery()
+
+# These are the indexes for listing a store's orders by id (keyset paging) and by date
+db.Index('ix_orders_store_id_id', Order.store_id, Order.id)
+db.Index('ix_orders_store_id_created_at', Order.store_id, Order.created_at)
+# This is the index for loading the lines of a page of orders, and it keeps one line per product
+db.Index('ix_order_lines_order_id_product_id', OrderLine.order_id, OrderLine.product_id, unique=True)
@@ -1,7 +1,21 @@
 # app/modesl/product.py
 
+from sqlalchemy.orm import validates
 from .db import db, environment, SCHEMA, add_prefix_for_prod
-from .order import order_products 
+from .product_rating import ProductRating
+
+# This will normalize a product title for case-insensitive lookups (lowercase + strip spaces)
+def normalize_title(title):
+    return (title or '').strip().lower()
+
+# This is the column default for title_normalized on Core inserts (bulk loads, seeds)
+def _default_title_normalized(context):
+    return normalize_title(context.get_current_parameters().get('title'))
+
+# This is the column default for in_stock on Core inserts: derived from the stock count when there is one
+def _default_in_stock(context):
+    quantity = context.get_current_parameters().get('stock_quantity')
+    return quantity is None or quantity > 0
 
 # This is the many-to-many relationship table for products and tags
 # This allows a product to have multiple tags and a tag to be associated with multiple products
@@ -10,7 +24,7 @@ product_tags = db.Table(
     'product_tags',
     db.Model.metadata,
     db.Column('product_id', db.Integer, db.ForeignKey(add_prefix_for_prod('products.id')), primary_key=True),
-    db.Column('tag_id', db.Integer, db.ForeignKey(add_prefix_for_prod('tags.id')), primary_key=True),
+    db.Column('tag_id', db.Integer, db.ForeignKey(add_prefix_for_prod('tags.id')), primary_key=True, index=True),
     # This will ensure the table goes into the correct schema in production
     schema=SCHEMA if environment == "production" else None
 )
@@ -29,14 +43,32 @@ class Product(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     store_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('stores.id')), nullable=False)
     title = db.Column(db.String(255), nullable=False)
+    # This is the stored lowercase/stripped title, so checkout can match names with an index
+    title_normalized = db.Column(db.String(255), default=_default_title_normalized)
     price = db.Column(db.Float, nullable=False)
     description = db.Column(db.String(500))
     image_url = db.Column(db.String(255))
-    in_stock = db.Column(db.Boolean, default=True, nullable=False)
+    in_stock = db.Column(db.Boolean, default=_default_in_stock, nullable=False)
+    # This is how many are left to sell; None means stock is not tracked and in_stock is set by hand
+    # Checkout takes stock with conditional UPDATEs (services/inventory.py), never by reading and writing it back
+    stock_quantity = db.Column(db.Integer, nullable=True)
 
     # These are the relationships for the product model
     tags = db.relationship('Tag', secondary=product_tags, back_populates='products')
-    orders = db.relationship('Order', secondary=order_products, back_populates='products')
+    rating = db.relationship('ProductRating', uselist=False, cascade='all, delete-orphan')
+
+    # This keeps the normalized title in step whenever the title is set through the ORM
+    @validates('title')
+    def _set_title_normalized(self, key, title):
+        self.title_normalized = normalize_title(title)
+        return title
+
+    # This keeps in_stock derived from the stock count whenever the count is set through the ORM
+    @validates('stock_quantity')
+    def _set_in_stock(self, key, quantity):
+        if quantity is not None:
+            self.in_stock = quantity > 0
+        return quantity
 
     # This is the method to convert the product to a dictionary format
     # This is useful for returning the product data in API responses
@@ -49,9 +81,16 @@ class Product(db.Model):
             'description': self.description,
             'image_url': self.image_url,
             'in_stock': self.in_stock,
-            'tags': [tag.name for tag in self.tags]
+            'tags': [tag.name for tag in self.tags],
+            'rating': self.rating.to_dict() if self.rating else ProductRating.empty_dict()
         }
 
+    # This is the product as its seller sees it: the public dictionary plus the stock count
+    # The count stays out of to_dict, which the cached public storefront is built from,
+    # so every sale does not have to invalidate the store's cached pages
+    def to_seller_dict(self):
+        return dict(self.to_dict(), stock_quantity=self.stock_quantity)
+
 # This is the Tag model
 class Tag(db.Model):
     # This is the name of the table
@@ -66,3 +105,8 @@ class Tag(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     name = db.Column(db.String(50), nullable=False, unique=True)
     products = db.relationship('Product', secondary=product_tags, back_populates='tags')
+
+# This is the index for listing a store's products by id (keyset paging)
+db.Index('ix_products_store_id_id', Product.store_id, Product.id)
+# This is the index for matching checkout product names within a store
+db.Index('ix_products_store_id_title_normalized', Product.store_id, Product.title_normalized)
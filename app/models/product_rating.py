@@ -0,0 +1,43 @@
+# app/models/product_rating.py
+
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+
+# This is the ProductRating model
+# It keeps the review count, rating sum and star histogram for one product,
+# updated in the same transaction as every review write
+class ProductRating(db.Model):
+    # This is the name of the table
+    __tablename__ = 'product_ratings'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the product_ratings table
+    product_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('products.id')), primary_key=True)
+    review_count = db.Column(db.Integer, nullable=False, default=0)
+    rating_sum = db.Column(db.Integer, nullable=False, default=0)
+    stars_1 = db.Column(db.Integer, nullable=False, default=0)
+    stars_2 = db.Column(db.Integer, nullable=False, default=0)
+    stars_3 = db.Column(db.Integer, nullable=False, default=0)
+    stars_4 = db.Column(db.Integer, nullable=False, default=0)
+    stars_5 = db.Column(db.Integer, nullable=False, default=0)
+
+    # This is the summary for a product with no reviews yet
+    @staticmethod
+    def empty_dict():
+        return {
+            'average': None,
+            'count': 0,
+            'histogram': {str(star): 0 for star in range(1, 6)}
+        }
+
+    # This is the method to convert the rating to a dictionary format
+    # This is useful for returning the rating data in API responses
+    def to_dict(self):
+        return {
+            'average': round(self.rating_sum / self.review_count, 2) if self.review_count else None,
+            'count': self.review_count,
+            'histogram': {str(star): getattr(self, f'stars_{star}') for star in range(1, 6)}
+        }
@@ -38,3 +38,6 @@ class Review(db.Model):
             'created_at': self.created_at.isoformat(),
             'updated_at': self.updated_at.isoformat()
         }
+
+# This is the index for listing a product's reviews by id (keyset paging)
+db.Index('ix_reviews_product_id_id', Review.product_id, Review.id)
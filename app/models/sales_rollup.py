@@ -0,0 +1,47 @@
+# app/models/sales_rollup.py
+
+from .db import db, environment, SCHEMA, add_prefix_for_prod
+
+# This is the SalesRollup model
+# It keeps one store's order count, revenue and status counts for one day (UTC),
+# updated by the analytics.order_changed job after every order write (so a report
+# may trail the orders by the job queue's delay), and sales reports read one row
+# per day instead of every order
+class SalesRollup(db.Model):
+    # This is the name of the table
+    __tablename__ = 'sales_rollups'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the sales_rollups table
+    store_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('stores.id')), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
+    pending_count = db.Column(db.Integer, nullable=False, default=0)
+    fulfilled_count = db.Column(db.Integer, nullable=False, default=0)
+
+
+# This is the ProductSalesRollup model
+# It keeps, for one store and day, how many orders included each product,
+# the units sold and the revenue from its order lines
+# The product id has no foreign key, so sales history outlives a deleted product
+class ProductSalesRollup(db.Model):
+    # This is the name of the table
+    __tablename__ = 'product_sales_rollups'
+
+    # This is for production environment to add schema
+    if environment == "production":
+        # This is the schema for the table
+        __table_args__ = {'schema': SCHEMA}
+
+    # These are the columns in the product_sales_rollups table
+    store_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('stores.id')), primary_key=True)
+    day = db.Column(db.Date, primary_key=True)
+    product_id = db.Column(db.Integer, primary_key=True)
+    order_count = db.Column(db.Integer, nullable=False, default=0)
+    units = db.Column(db.Integer, nullable=False, default=0)
+    revenue = db.Column(db.Float, nullable=False, default=0)
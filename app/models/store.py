@@ -14,8 +14,9 @@ class Store(db.Model):
 
     # These are the columns in the stores table
     id = db.Column(db.Integer, primary_key=True)
-    user_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('users.id')), nullable=False)
-    name = db.Column(db.String(255), nullable=False)
+    user_id = db.Column(db.Integer, db.ForeignKey(add_prefix_for_prod('users.id')), nullable=False, index=True)
+    # The name is unique because the public storefront is looked up by it
+    name = db.Column(db.String(255), nullable=False, unique=True, index=True)
     logo_url = db.Column(db.String(255))
     theme_color = db.Column(db.String(50))
     description = db.Column(db.String(500))
@@ -4,6 +4,8 @@ from .stores import seed_stores, undo_stores
 from .products import seed_products, undo_products
 from .orders import seed_orders, undo_orders
 from .reviews import seed_reviews, undo_reviews
+from .perf import seed_perf
+import click
 
 from app.models.db import db, environment, SCHEMA
 
@@ -40,4 +42,17 @@ def undo():
     undo_orders()
     undo_products()
     undo_stores()
-    undo_users()
\ No newline at end of file
+    undo_users()
+
+
+# Creates the `flask seed perf` command
+# This adds a large synthetic dataset on top of whatever is already there,
+# for checking query plans with `flask perf explain`
+@seed_commands.command('perf')
+@click.option('--stores', default=20, show_default=True)
+@click.option('--products', 'products_per_store', default=1000, show_default=True)
+@click.option('--orders', 'orders_per_store', default=1000, show_default=True)
+def perf(stores, products_per_store, orders_per_store):
+    if environment == 'production':
+        raise click.ClickException('Refusing to seed synthetic data in production.')
+    seed_perf(stores, products_per_store, orders_per_store)
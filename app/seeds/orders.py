@@ -1,6 +1,7 @@
 # app/seeds/orders.py
 
-from app.models import db, Order, Product, environment, SCHEMA
+from app.models import db, Order, OrderLine, Product, environment, SCHEMA
+from app.services.analytics import rebuild_sales_rollups
 from sqlalchemy.sql import text
 from datetime import datetime
 
@@ -20,7 +21,7 @@ def seed_orders():
         total_price=summer_tee.price,
         created_at=datetime.utcnow()
     )
-    order1.products.append(summer_tee)
+    order1.lines.append(OrderLine.for_product(summer_tee))
 
     order2 = Order(
         user_id=None, 
@@ -30,8 +31,7 @@ def seed_orders():
         total_price=coffee_mug.price * 2,
         created_at=datetime.utcnow()
     )
-    order2.products.append(coffee_mug)
-    # order2.products.append(coffee_mug)  # This will be a quantity of 2
+    order2.lines.append(OrderLine.for_product(coffee_mug, quantity=2))
 
     order3 = Order(
         user_id=2,
@@ -41,29 +41,37 @@ def seed_orders():
         total_price=graphic_tee.price + summer_tee.price,
         created_at=datetime.utcnow()
     )
-    order3.products.append(graphic_tee)
-    order3.products.append(summer_tee)
+    order3.lines.append(OrderLine.for_product(graphic_tee))
+    order3.lines.append(OrderLine.for_product(summer_tee))
 
     db.session.add_all([order1, order2, order3])
+    db.session.flush()
+    # This will build the sales rollups for the seeded orders
+    rebuild_sales_rollups()
     db.session.commit()
 
-# This will undo the orders by truncating the order_products table and orders table
+# This will undo the orders by truncating the order_lines table and orders table
 def undo_orders():
     if environment == "production":
         db.session.execute(f"CREATE SCHEMA IF NOT EXISTS {SCHEMA};")
         exists = db.session.execute(
             text("SELECT to_regclass(:qname)"),
-            {"qname": f"{SCHEMA}.order_products"}
+            {"qname": f"{SCHEMA}.order_lines"}
         ).scalar()
         if exists:
-            db.session.execute(f"TRUNCATE table {SCHEMA}.order_products RESTART IDENTITY CASCADE;")
+            db.session.execute(f"TRUNCATE table {SCHEMA}.order_lines RESTART IDENTITY CASCADE;")
         exists = db.session.execute(
             text("SELECT to_regclass(:qname)"),
             {"qname": f"{SCHEMA}.orders"}
         ).scalar()
         if exists:
             db.session.execute(f"TRUNCATE table {SCHEMA}.orders RESTART IDENTITY CASCADE;")
+            db.session.execute(f"TRUNCATE table {SCHEMA}.sales_rollups, {SCHEMA}.product_sales_rollups, {SCHEMA}.idempotency_keys;")
     else:
-        db.session.execute(text("DELETE FROM order_products"))
+        db.session.execute(text("DELETE FROM product_sales_rollups"))
+        db.session.execute(text("DELETE FROM sales_rollups"))
+        # Stored order responses would replay orders that no longer exist
+        db.session.execute(text("DELETE FROM idempotency_keys"))
+        db.session.execute(text("DELETE FROM order_lines"))
         db.session.execute(text("DELETE FROM orders"))
     db.session.commit()
@@ -0,0 +1,103 @@
+# app/seeds/perf.py
+
+import random
+from datetime import datetime, timedelta
+from werkzeug.security import generate_password_hash
+from app.models import db, User, Store, Product, Tag, Order, OrderLine, Review
+from app.models.product import product_tags
+from app.services.search import rebuild_index
+from app.services.ratings import rebuild_ratings
+from app.services.analytics import rebuild_sales_rollups
+from sqlalchemy.sql import text
+
+# These are the words the synthetic product titles are built from
+ADJECTIVES = ['Classic', 'Vintage', 'Cozy', 'Graphic', 'Summer', 'Ceramic', 'Organic', 'Handmade']
+NOUNS = ['Tee', 'Mug', 'Hoodie', 'Poster', 'Candle', 'Tote', 'Cap', 'Notebook']
+
+
+# This function will seed a large synthetic dataset for query-plan checks
+# Rows are inserted with executemany so a big dataset only takes a few seconds
+def seed_perf(stores=20, products_per_store=1000, orders_per_store=1000, rng=None):
+    rng = rng or random.Random(0)
+    password = generate_password_hash('password123')
+    now = datetime.utcnow()
+
+    # This will create one seller per store
+    db.session.execute(User.__table__.insert(), [
+        {'email': f'perf-{i}@example.com', 'hashed_password': password} for i in range(stores)
+    ])
+    users = [row.id for row in db.session.query(User.id).filter(User.email.like('perf-%')).order_by(User.id)]
+
+    db.session.execute(Store.__table__.insert(), [
+        {'user_id': user_id, 'name': f'Perf Store {i}', 'description': 'Synthetic store.'}
+        for i, user_id in enumerate(users)
+    ])
+    store_ids = [store.id for store in Store.query.filter(Store.user_id.in_(users)).order_by(Store.id)]
+
+    # This will create the tags, reusing any that already exist
+    tag_names = [noun.lower() for noun in NOUNS] + [adjective.lower() for adjective in ADJECTIVES]
+    existing = {tag.name for tag in Tag.query.filter(Tag.name.in_(tag_names))}
+    missing = [{'name': name} for name in tag_names if name not in existing]
+    if missing:
+        db.session.execute(Tag.__table__.insert(), missing)
+    tag_ids = [tag.id for tag in Tag.query.filter(Tag.name.in_(tag_names))]
+
+    for store_id in store_ids:
+        db.session.execute(Product.__table__.insert(), [{
+            'store_id': store_id,
+            'title': f'{rng.choice(ADJECTIVES)} {rng.choice(NOUNS)} {n}',
+            'price': round(rng.uniform(5, 80), 2),
+            'description': 'Synthetic product for query-plan checks.',
+            'in_stock': True,
+        } for n in range(products_per_store)])
+        products = db.session.query(Product.id, Product.price, Product.title).filter_by(store_id=store_id).all()
+        product_ids = [row.id for row in products]
+        catalog = {row.id: row for row in products}
+
+        db.session.execute(product_tags.insert(), [
+            {'product_id': product_id, 'tag_id': tag_id}
+            for product_id in product_ids
+            for tag_id in rng.sample(tag_ids, 2)
+        ])
+
+        # This will create the orders, each with one to three products in quantities of one to three
+        lines = [
+            [(product_id, rng.randint(1, 3)) for product_id in rng.sample(product_ids, rng.randint(1, 3))]
+            for _ in range(orders_per_store)
+        ]
+        db.session.execute(Order.__table__.insert(), [{
+            'store_id': store_id,
+            'buyer_name': f'Buyer {n}',
+            'buyer_email': f'buyer{n}@example.com',
+            'total_price': sum(catalog[product_id].price * quantity for product_id, quantity in line),
+            'status': rng.choice(['pending', 'fulfilled']),
+            'created_at': now - timedelta(minutes=orders_per_store - n),
+            'updated_at': now,
+        } for n, line in enumerate(lines)])
+        order_ids = [row.id for row in db.session.query(Order.id).filter_by(store_id=store_id).order_by(Order.id)][-orders_per_store:]
+        db.session.execute(OrderLine.__table__.insert(), [{
+            'order_id': order_id,
+            'product_id': product_id,
+            'quantity': quantity,
+            'unit_price': catalog[product_id].price,
+            'title': catalog[product_id].title
+        } for order_id, line in zip(order_ids, lines) for product_id, quantity in line])
+
+        # This will review a slice of the catalog
+        db.session.execute(Review.__table__.insert(), [{
+            'user_id': rng.choice(users),
+            'product_id': product_id,
+            'rating': rng.randint(1, 5),
+            'comment': 'Synthetic review.',
+            'created_at': now,
+            'updated_at': now,
+        } for product_id in product_ids[::4]])
+
+    db.session.commit()
+    # This will index the new products, summarize their reviews and orders and refresh the planner statistics
+    rebuild_index()
+    rebuild_ratings()
+    rebuild_sales_rollups()
+    db.session.commit()
+    db.session.execute(text('ANALYZE'))
+    db.session.commit()
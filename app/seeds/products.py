@@ -2,6 +2,8 @@
 
 from app.models import db, Product, Tag, environment, SCHEMA
 from sqlalchemy.sql import text
+from app.services.search import rebuild_index
+from app.services.tags import clear_tag_cache
 
 # This function will seed the products
 def seed_products():
@@ -50,6 +52,9 @@ def seed_products():
     # And then it will commit the changes to the database
     db.session.add_all([product1, product2, product3])
     db.session.commit()
+    # This will build the search index for the seeded products
+    rebuild_index()
+    db.session.commit()
 
 # This function will undo the products
 def undo_products():
@@ -65,7 +70,10 @@ def undo_products():
         if exists:
             db.session.execute(f"TRUNCATE table {SCHEMA}.tags RESTART IDENTITY CASCADE;")
     else:
+        db.session.execute(text("DELETE FROM product_search"))
         db.session.execute(text("DELETE FROM product_tags"))
         db.session.execute(text("DELETE FROM products"))
         db.session.execute(text("DELETE FROM tags"))
     db.session.commit()
+    # This will forget the tag ids cached by this process
+    clear_tag_cache()
@@ -1,6 +1,7 @@
 # app/seeds/reviews.py
 
 from app.models import db, Review, Product, environment, SCHEMA
+from app.services.ratings import rebuild_ratings
 from sqlalchemy.sql import text
 from datetime import datetime
 
@@ -40,6 +41,9 @@ def seed_reviews():
 
     db.session.add_all([review1, review2, review3])
     db.session.commit()
+    # This will build the rating summaries for the seeded reviews
+    rebuild_ratings()
+    db.session.commit()
 
 # This function will undo the reviews
 def undo_reviews():
@@ -52,6 +56,8 @@ def undo_reviews():
         ).scalar()
         if exists:
             db.session.execute(f"TRUNCATE table {SCHEMA}.reviews RESTART IDENTITY CASCADE;")
+            db.session.execute(f"TRUNCATE table {SCHEMA}.product_ratings;")
     else:
         db.session.execute(text("DELETE FROM reviews"))
+        db.session.execute(text("DELETE FROM product_ratings"))
     db.session.commit()
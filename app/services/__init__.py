@@ -0,0 +1,16 @@
+from .serializers import serialize_orders, serialize_products, with_order_graph, with_product_graph
+from .pagination import list_response
+from .cache import init_cache, get_cache, invalidate_storefront, cached_storefront
+from .identity import load_identity, forget_identity, current_store, with_store
+from .tags import parse_tags, resolve_tags, set_product_tags
+from .catalog import import_products, export_products
+from .ratings import apply_rating_change, rating_summary, rebuild_ratings
+from .images import ImageError, render_variants, save_variants
+from .uploads import store_content, content_etag
+from .storage import init_storage, get_storage
+from .async_db import init_async_db, async_session, async_list_response
+from .pool import init_pool, pool_report
+from .query_log import init_query_log, fingerprint
+from .metrics import init_metrics, metrics_response, timed_serialization
+from .csrf import csrf_cookie_needed
+from .analytics import apply_order_change, apply_status_change, queue_order_rollup, queue_order_removal, rebuild_sales_rollups, sales_report
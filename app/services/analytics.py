@@ -0,0 +1,343 @@
+# app/services/analytics.py
+
+from datetime import date, datetime, timedelta
+from sqlalchemy import bindparam, case, func, select
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models import db, Job, Order, OrderLine, Product, SalesRollup, ProductSalesRollup
+from .jobs import enqueue, job_handler
+
+# These are the order statuses with a counter of their own in the rollups
+STATUS_COLUMNS = {'pending': 'pending_count', 'fulfilled': 'fulfilled_count'}
+
+# These are the report intervals and how many buckets each shows by default
+INTERVALS = {'day': 30, 'week': 12, 'month': 12}
+
+# This is the most buckets one report may cover
+MAX_BUCKETS = 400
+
+
+class AnalyticsError(ValueError):
+    pass
+
+
+# This will create the rollup rows that do not exist yet,
+# without failing when another request creates them first
+def _ensure_rows(table, rows):
+    keys = [column.name for column in table.primary_key.columns]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(postgresql.insert(table).on_conflict_do_nothing(index_elements=keys), rows)
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(table).on_conflict_do_nothing(index_elements=keys), rows)
+    else:
+        for row in rows:
+            if not db.session.execute(select(table).filter_by(**row)).first():
+                db.session.execute(table.insert(), row)
+
+
+# This will list the (product_id, quantity, unit_price) of an order's lines, without loading them
+def order_line_values(order_id):
+    return [tuple(row) for row in db.session.execute(
+        select(OrderLine.product_id, OrderLine.quantity, OrderLine.unit_price).where(OrderLine.order_id == order_id)
+    )]
+
+
+def apply_order_change(order, lines, sign=1):
+    """
+    Add an order to its store's daily rollups (sign=1), or take it out again
+    (sign=-1). lines are the order's (product_id, quantity, unit_price) values.
+    The counters are bumped with UPDATE ... SET col = col + delta in the caller's
+    transaction, so concurrent writers never overwrite each other's counts.
+    """
+    _apply_order(order.store_id, order.created_at.date(), order.total_price, order.status, lines, sign)
+
+
+# This will bump the counters of one store's day by an order's values
+def _apply_order(store_id, day, total_price, status, lines, sign):
+    table = SalesRollup.__table__
+    values = {
+        'order_count': table.c.order_count + sign,
+        'revenue': table.c.revenue + sign * total_price
+    }
+    status_column = STATUS_COLUMNS.get(status)
+    if status_column:
+        values[status_column] = table.c[status_column] + sign
+
+    _ensure_rows(table, [{'store_id': store_id, 'day': day}])
+    db.session.execute(
+        table.update().where(table.c.store_id == store_id, table.c.day == day).values(**values)
+    )
+
+    # Lines of deleted products have no product to count towards
+    lines = [line for line in lines if line[0] is not None]
+    if lines:
+        products = ProductSalesRollup.__table__
+        _ensure_rows(products, [{'store_id': store_id, 'day': day, 'product_id': line[0]} for line in lines])
+        # Every product gets its own deltas, so this is one UPDATE run with executemany
+        db.session.execute(
+            products.update()
+            .where(
+                products.c.store_id == store_id,
+                products.c.day == day,
+                products.c.product_id == bindparam('line_product_id')
+            )
+            .values(
+                order_count=products.c.order_count + sign,
+                units=products.c.units + bindparam('line_units'),
+                revenue=products.c.revenue + bindparam('line_revenue')
+            ),
+            [{
+                'line_product_id': product_id,
+                'line_units': sign * quantity,
+                'line_revenue': sign * quantity * unit_price
+            } for product_id, quantity, unit_price in lines]
+        )
+
+
+def apply_status_change(order, old_status, new_status):
+    """Move an order between the status counters of its day's rollup."""
+    if old_status == new_status:
+        return
+
+    table = SalesRollup.__table__
+    day = order.created_at.date()
+    values = {}
+    if old_status in STATUS_COLUMNS:
+        values[STATUS_COLUMNS[old_status]] = table.c[STATUS_COLUMNS[old_status]] - 1
+    if new_status in STATUS_COLUMNS:
+        values[STATUS_COLUMNS[new_status]] = table.c[STATUS_COLUMNS[new_status]] + 1
+    if not values:
+        return
+
+    _ensure_rows(table, [{'store_id': order.store_id, 'day': day}])
+    db.session.execute(
+        table.update().where(table.c.store_id == order.store_id, table.c.day == day).values(**values)
+    )
+
+
+# This will drop a deleted product from the product rollups; its orders stay in the
+# store totals, but lines without a product are not counted towards any product
+def forget_product(product_id):
+    db.session.execute(ProductSalesRollup.__table__.delete().where(ProductSalesRollup.product_id == product_id))
+
+
+# This will set which status an order is counted under in the rollups (None: not counted),
+# but only if it is still seen, so two writers can never both count the same change.
+# updated_at is kept as it is, since the order itself did not change
+def _swap_rollup_status(order_id, seen, counted, status=None):
+    orders = Order.__table__
+    condition = [orders.c.id == order_id, orders.c.rollup_status.is_not_distinct_from(seen)]
+    if status is not None:
+        condition.append(orders.c.status == status)
+    result = db.session.execute(
+        orders.update().where(*condition).values(rollup_status=counted, updated_at=orders.c.updated_at)
+    )
+    return result.rowcount == 1
+
+
+# This will queue the job that brings the rollups up to date with an order that was
+# placed or changed; it runs in `flask jobs work` once the caller commits
+def queue_order_rollup(order_id):
+    return enqueue('analytics.order_changed', {'order_id': order_id})
+
+
+def queue_order_removal(order):
+    """
+    Call before deleting an order: mark it as no longer counted and, if its
+    rollup job had already counted it, queue a job that takes it out again,
+    with the values it was counted under (the order row will be gone by then).
+    """
+    seen = order.rollup_status
+    while not _swap_rollup_status(order.id, seen, None):
+        # A rollup job counted the order in the meantime, so this reads what it counted
+        row = db.session.execute(select(Order.rollup_status).where(Order.id == order.id)).first()
+        # Or the order was deleted by another request, which queued its removal
+        if row is None:
+            return None
+        seen = row.rollup_status
+    if seen is None:
+        return None
+    return enqueue('analytics.order_changed', {'order_id': order.id, 'removed': {
+        'store_id': order.store_id,
+        'day': order.created_at.date().isoformat(),
+        'total_price': order.total_price,
+        'status': seen,
+        'lines': order_line_values(order.id)
+    }})
+
+
+# This is the job that applies an order's change to the rollups. The order's
+# rollup_status says what the rollups count it as, so the job works out the delta
+# from the order as it is now: any number of jobs for one order count it once
+@job_handler('analytics.order_changed')
+def update_order_rollups(order_id, removed=None):
+    if removed is not None:
+        _apply_order(removed['store_id'], date.fromisoformat(removed['day']), removed['total_price'],
+                     removed['status'], removed['lines'], -1)
+        return
+
+    orders = Order.__table__
+    order = db.session.execute(
+        select(orders.c.store_id, orders.c.created_at, orders.c.total_price, orders.c.status, orders.c.rollup_status)
+        .where(orders.c.id == order_id)
+    ).first()
+    # A deleted order was taken out (if it was ever counted) by its removal job
+    if order is None or order.rollup_status == order.status:
+        return
+    if not _swap_rollup_status(order_id, order.rollup_status, order.status, status=order.status):
+        raise RuntimeError(f'Order {order_id} changed while its rollups were updated.')
+    if order.rollup_status is None:
+        apply_order_change(order, order_line_values(order_id))
+    else:
+        apply_status_change(order, order.rollup_status, order.status)
+
+
+def rebuild_sales_rollups():
+    """
+    Recompute every store's daily rollups from the orders table in one pass.
+    Every order is then counted as it is now, so the rollup jobs still queued
+    (or failed) are dropped as done.
+    """
+    orders = Order.__table__
+    day = func.date(orders.c.created_at)
+    status_counts = [
+        func.sum(case((orders.c.status == status, 1), else_=0)) for status in STATUS_COLUMNS
+    ]
+
+    db.session.execute(SalesRollup.__table__.delete())
+    db.session.execute(ProductSalesRollup.__table__.delete())
+    db.session.execute(SalesRollup.__table__.insert().from_select(
+        ['store_id', 'day', 'order_count', 'revenue', *STATUS_COLUMNS.values()],
+        select(orders.c.store_id, day, func.count(), func.sum(orders.c.total_price), *status_counts)
+        .group_by(orders.c.store_id, day)
+    ))
+    lines = OrderLine.__table__
+    db.session.execute(ProductSalesRollup.__table__.insert().from_select(
+        ['store_id', 'day', 'product_id', 'order_count', 'units', 'revenue'],
+        select(
+            orders.c.store_id, day, lines.c.product_id, func.count(),
+            func.sum(lines.c.quantity), func.sum(lines.c.quantity * lines.c.unit_price)
+        )
+        .select_from(lines.join(orders, orders.c.id == lines.c.order_id))
+        .where(lines.c.product_id.isnot(None))
+        .group_by(orders.c.store_id, day, lines.c.product_id)
+    ))
+    db.session.execute(orders.update().values(rollup_status=orders.c.status, updated_at=orders.c.updated_at))
+    jobs = Job.__table__
+    db.session.execute(
+        jobs.update()
+        .where(jobs.c.name == 'analytics.order_changed', jobs.c.status.in_(('queued', 'failed')))
+        .values(status='done', finished_at=datetime.utcnow())
+    )
+    db.session.expire_all()
+
+
+# This will find the first day of the bucket a day falls in
+def bucket_start(day, interval):
+    if interval == 'week':
+        return day - timedelta(days=day.weekday())
+    if interval == 'month':
+        return day.replace(day=1)
+    return day
+
+
+# This will find the first day of the bucket after the one starting on start
+def _next_bucket(start, interval):
+    if interval == 'week':
+        return start + timedelta(days=7)
+    if interval == 'month':
+        return (start.replace(day=28) + timedelta(days=4)).replace(day=1)
+    return start + timedelta(days=1)
+
+
+# This will add the derived figures to a bucket's counters
+def _summary(counts):
+    return {
+        'order_count': counts['order_count'],
+        'revenue': round(counts['revenue'], 2),
+        'average_order_value': round(counts['revenue'] / counts['order_count'], 2) if counts['order_count'] else 0.0,
+        'pending_count': counts['pending_count'],
+        'fulfilled_count': counts['fulfilled_count']
+    }
+
+
+def sales_report(store_id, interval='day', start=None, end=None, top=5):
+    """
+    Build a store's sales report from the daily rollups: totals, one bucket per
+    day/week/month between start and end (empty buckets included), and the
+    products with the most revenue. The work depends on the length of the range,
+    not on how many orders the store has ever taken.
+    """
+    if interval not in INTERVALS:
+        raise AnalyticsError(f"interval must be one of: {', '.join(INTERVALS)}.")
+
+    end = end or datetime.utcnow().date()
+    if start is None:
+        start = bucket_start(end, interval)
+        for _ in range(INTERVALS[interval] - 1):
+            start = bucket_start(start - timedelta(days=1), interval)
+    start = bucket_start(start, interval)
+    if start > end:
+        raise AnalyticsError('start must not be after end.')
+
+    buckets = {}
+    current = start
+    while current <= end:
+        if len(buckets) == MAX_BUCKETS:
+            raise AnalyticsError(f'A report covers at most {MAX_BUCKETS} {interval} buckets.')
+        buckets[current] = {'order_count': 0, 'revenue': 0.0, 'pending_count': 0, 'fulfilled_count': 0}
+        current = _next_bucket(current, interval)
+
+    rows = SalesRollup.query.filter(
+        SalesRollup.store_id == store_id, SalesRollup.day >= start, SalesRollup.day <= end
+    ).all()
+    totals = {'order_count': 0, 'revenue': 0.0, 'pending_count': 0, 'fulfilled_count': 0}
+    for row in rows:
+        bucket = buckets[bucket_start(row.day, interval)]
+        for key in totals:
+            bucket[key] += getattr(row, key)
+            totals[key] += getattr(row, key)
+
+    orders = func.sum(ProductSalesRollup.order_count).label('orders')
+    units = func.sum(ProductSalesRollup.units).label('units')
+    revenue = func.sum(ProductSalesRollup.revenue).label('revenue')
+    top_rows = (
+        db.session.query(ProductSalesRollup.product_id, orders, units, revenue)
+        .filter(ProductSalesRollup.store_id == store_id, ProductSalesRollup.day >= start, ProductSalesRollup.day <= end)
+        .group_by(ProductSalesRollup.product_id)
+        .having(orders > 0)
+        .order_by(revenue.desc(), ProductSalesRollup.product_id)
+        .limit(top)
+        .all()
+    )
+    titles = dict(
+        db.session.query(Product.id, Product.title).filter(Product.id.in_([row.product_id for row in top_rows]))
+    ) if top_rows else {}
+
+    return {
+        'interval': interval,
+        'start': start.isoformat(),
+        'end': end.isoformat(),
+        'totals': _summary(totals),
+        'buckets': [dict(_summary(counts), start=day.isoformat()) for day, counts in buckets.items()],
+        'top_products': [
+            {
+                'product_id': row.product_id,
+                'title': titles.get(row.product_id),
+                'order_count': row.orders,
+                'units': row.units,
+                'revenue': round(row.revenue, 2)
+            }
+            for row in top_rows
+        ]
+    }
+
+
+# This will read an optional YYYY-MM-DD date parameter
+def parse_day(value, name):
+    if not value:
+        return None
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        raise AnalyticsError(f'{name} must be a date like 2024-01-31.')
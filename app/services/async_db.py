@@ -0,0 +1,152 @@
+# app/services/async_db.py
+
+from functools import wraps
+from flask import Response, current_app
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
+from sqlalchemy.orm import sessionmaker
+from ..models import db
+from .cache import get_cache, storefront_key
+from .pool import InstrumentedAsyncQueuePool
+from .pagination import (
+    PaginationError, STREAM_BATCH_SIZE, encode_cursor, page_body, page_params, page_query, stream_head, stream_tail
+)
+
+# These are the async drivers used for each database the app runs on
+ASYNC_DRIVERS = {'postgresql': 'postgresql+asyncpg', 'sqlite': 'sqlite+aiosqlite'}
+
+
+# This will point the app's database URL at the async driver for the same database
+def async_database_url(url):
+    url = make_url(url)
+    backend = url.get_backend_name()
+    if backend not in ASYNC_DRIVERS:
+        raise ValueError(f'No async driver for {backend!r} databases.')
+    connect_args = {}
+    # asyncpg takes ssl as a connect argument instead of libpq's sslmode
+    if 'sslmode' in url.query:
+        sslmode = url.query['sslmode']
+        url = url.difference_update_query(['sslmode'])
+        if sslmode != 'disable':
+            connect_args['ssl'] = sslmode
+    return url.set(drivername=ASYNC_DRIVERS[backend]), connect_args
+
+
+# This will keep asyncpg from preparing statements, which PgBouncer in transaction mode
+# cannot support: a statement prepared on one server connection is gone on the next transaction
+def pgbouncer_url(url, connect_args):
+    connect_args = dict(connect_args, statement_cache_size=0)
+    return url.update_query_dict({'prepared_statement_cache_size': '0'}), connect_args
+
+
+def init_async_db(app):
+    """Create the async engine and session factory for the app's database."""
+    # This is the sync engine's URL, as Flask-SQLAlchemy resolved it
+    # (a relative SQLite path points into the instance folder, not the working directory)
+    with app.app_context():
+        database_url = db.engine.url
+    url, connect_args = async_database_url(database_url)
+    if app.config.get('DB_PGBOUNCER') and url.get_backend_name() == 'postgresql':
+        url, connect_args = pgbouncer_url(url, connect_args)
+    # The pool bounds how many connections one worker holds, however many requests it has in flight;
+    # extra requests wait up to ASYNC_DB_POOL_TIMEOUT seconds for a free connection
+    # (aiosqlite would otherwise open a new connection and thread for every request)
+    engine = create_async_engine(
+        url,
+        connect_args=connect_args,
+        poolclass=InstrumentedAsyncQueuePool,
+        pool_size=app.config['ASYNC_DB_POOL_SIZE'],
+        max_overflow=app.config['ASYNC_DB_MAX_OVERFLOW'],
+        pool_timeout=app.config['ASYNC_DB_POOL_TIMEOUT'],
+        pool_pre_ping=True
+    )
+    app.extensions['async_db'] = sessionmaker(engine, class_=AsyncSession, expire_on_commit=False)
+    return engine
+
+
+# This will open an async session for the current app, creating the engine on first use
+def async_session():
+    factory = current_app.extensions.get('async_db')
+    if factory is None:
+        init_async_db(current_app)
+        factory = current_app.extensions['async_db']
+    return factory()
+
+
+async def dispose_async_db(app):
+    """Close every pooled connection of the app's async engine."""
+    factory = app.extensions.pop('async_db', None)
+    if factory is not None:
+        await factory.kw['bind'].dispose()
+
+
+# This is a streamed response body produced by an async generator
+class AsyncStream:
+    def __init__(self, chunks, mimetype='application/json'):
+        self.chunks = chunks
+        self.mimetype = mimetype
+
+
+async def _stream_chunks(key, statement, column, limit, extra, ranked):
+    dumps = current_app.json.dumps
+    yield stream_head(key, extra)
+
+    next_cursor = None
+    last = None
+    count = 0
+    # The stream owns its session, since it outlives the view that created it;
+    # yield_per keeps only one batch of rows in memory at a time
+    async with async_session() as session:
+        result = await session.stream(statement.execution_options(yield_per=STREAM_BATCH_SIZE))
+        async for item in result.scalars():
+            if limit is not None and count == limit:
+                if not ranked:
+                    next_cursor = encode_cursor(getattr(last, column.key))
+                break
+            yield (', ' if count else '') + dumps(item.to_dict())
+            last = item
+            count += 1
+
+    yield stream_tail(next_cursor)
+
+
+async def async_list_response(session, key, query, column, extra=None, ranked=False):
+    """
+    The async counterpart of list_response: the same paging, streaming and
+    response body, with the query executed on an async session. The query is
+    built with the usual ORM Query API and only its statement is executed, so
+    loader options like the product graph carry over unchanged.
+    """
+    try:
+        limit, after, stream = page_params(ranked)
+    except PaginationError as e:
+        return {'errors': {'message': str(e)}}, 400
+
+    statement = page_query(query, column, limit, after).statement
+    if stream:
+        return AsyncStream(_stream_chunks(key, statement, column, limit, extra, ranked))
+    items = (await session.execute(statement)).scalars().all()
+    return page_body(key, items, column, limit, after, extra, ranked)
+
+
+def cached_storefront_async(view):
+    """Read-through cache for an async public storefront view taking store_name."""
+    @wraps(view)
+    async def wrapper(store_name, *args, **kwargs):
+        key = storefront_key(store_name)
+        if key is None:
+            return await view(store_name, *args, **kwargs)
+
+        cache = get_cache()
+        body = cache.get(key)
+        if body is not None:
+            return Response(body, mimetype='application/json')
+
+        result = await view(store_name, *args, **kwargs)
+        # Only successful dictionary responses are cached; errors fall through as-is
+        if not isinstance(result, dict):
+            return result
+        body = current_app.json.dumps(result)
+        cache.set(key, body)
+        return Response(body, mimetype='application/json')
+    return wrapper
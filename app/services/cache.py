@@ -0,0 +1,195 @@
+# app/services/cache.py
+
+import threading
+import time
+from collections import OrderedDict
+from functools import wraps
+from urllib.parse import urlencode
+from flask import Response, current_app, request
+
+
+# This is the in-process cache backend (LRU eviction + per-entry TTL)
+# Every gunicorn worker has its own copy, so invalidation only reaches the
+# worker that handled the write; the TTL bounds staleness on the others
+class MemoryCache:
+    def __init__(self, max_entries=1024, default_timeout=60):
+        self.max_entries = max_entries
+        self.default_timeout = default_timeout
+        self._entries = OrderedDict()
+        # Counters are kept apart from the LRU so a generation is never evicted
+        self._counters = {}
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            value, expires_at = entry
+            if expires_at < time.monotonic():
+                del self._entries[key]
+                return None
+            # This marks the entry as most recently used
+            self._entries.move_to_end(key)
+            return value
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        with self._lock:
+            self._entries[key] = (value, time.monotonic() + timeout)
+            self._entries.move_to_end(key)
+            # This evicts the least recently used entries once we are over capacity
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def delete(self, key):
+        with self._lock:
+            self._entries.pop(key, None)
+            self._counters.pop(key, None)
+
+    def get_counter(self, key):
+        with self._lock:
+            return self._counters.get(key, 0)
+
+    def incr(self, key):
+        with self._lock:
+            self._counters[key] = self._counters.get(key, 0) + 1
+            return self._counters[key]
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._counters.clear()
+
+
+# This is the shared cache backend, for anything that speaks the Redis protocol
+# It is shared by every worker and replica, so invalidation is seen everywhere
+class RedisCache:
+    def __init__(self, client, default_timeout=60, prefix='storedash:'):
+        self.client = client
+        self.default_timeout = default_timeout
+        self.prefix = prefix
+
+    @classmethod
+    def from_url(cls, url, **kwargs):
+        # redis is only needed when this backend is configured
+        import redis
+        return cls(redis.Redis.from_url(url), **kwargs)
+
+    def get(self, key):
+        value = self.client.get(self.prefix + key)
+        return value.decode() if value is not None else None
+
+    def set(self, key, value, timeout=None):
+        timeout = self.default_timeout if timeout is None else timeout
+        self.client.set(self.prefix + key, value, ex=timeout)
+
+    def delete(self, key):
+        self.client.delete(self.prefix + key)
+
+    def get_counter(self, key):
+        value = self.client.get(self.prefix + key)
+        return int(value) if value is not None else 0
+
+    def incr(self, key):
+        return self.client.incr(self.prefix + key)
+
+    def clear(self):
+        for key in self.client.scan_iter(self.prefix + '*'):
+            self.client.delete(key)
+
+
+# This is the backend used when caching is turned off
+class NullCache:
+    def get(self, key):
+        return None
+
+    def set(self, key, value, timeout=None):
+        pass
+
+    def delete(self, key):
+        pass
+
+    def get_counter(self, key):
+        return 0
+
+    def incr(self, key):
+        return 0
+
+    def clear(self):
+        pass
+
+
+def init_cache(app):
+    """Create the cache backend named by CACHE_BACKEND and attach it to the app."""
+    backend = app.config.get('CACHE_BACKEND', 'memory')
+    timeout = app.config.get('CACHE_DEFAULT_TIMEOUT', 60)
+
+    if backend == 'redis':
+        cache = RedisCache.from_url(app.config['CACHE_REDIS_URL'], default_timeout=timeout)
+    elif backend == 'memory':
+        cache = MemoryCache(max_entries=app.config.get('CACHE_MAX_ENTRIES', 1024), default_timeout=timeout)
+    elif backend == 'null':
+        cache = NullCache()
+    else:
+        raise ValueError(f'Unknown CACHE_BACKEND {backend!r}.')
+
+    app.extensions['cache'] = cache
+    return cache
+
+
+# This will get the cache backend for the current app
+def get_cache():
+    return current_app.extensions.get('cache') or NullCache()
+
+
+# This is the generation counter for a store's cached storefront pages
+# Bumping it makes every key built with the old value unreachable at once
+def _generation_key(store_name):
+    return f'storefront-gen:{store_name}'
+
+
+# This will build the cache key for a storefront request, or None if it should not be cached
+def storefront_key(store_name):
+    args = request.args
+    # Streaming responses are never cached
+    if args.get('stream'):
+        return None
+    generation = get_cache().get_counter(_generation_key(store_name))
+    # Every part is URL-encoded, so a ':' or '=' inside a store name or search
+    # can never make two different requests share a key
+    return 'storefront:' + urlencode([
+        ('store', store_name), ('gen', generation), ('q', args.get('q', '')), ('tag', args.get('tag', '')),
+        ('limit', args.get('limit', '')), ('after', args.get('after', ''))
+    ])
+
+
+def invalidate_storefront(*store_names):
+    """Drop every cached storefront page for the given store names."""
+    cache = get_cache()
+    for name in set(store_names):
+        if name:
+            cache.incr(_generation_key(name))
+
+
+def cached_storefront(view):
+    """Read-through cache for a public storefront view taking store_name."""
+    @wraps(view)
+    def wrapper(store_name, *args, **kwargs):
+        key = storefront_key(store_name)
+        if key is None:
+            return view(store_name, *args, **kwargs)
+
+        cache = get_cache()
+        body = cache.get(key)
+        if body is not None:
+            return Response(body, mimetype='application/json')
+
+        result = view(store_name, *args, **kwargs)
+        # Only successful dictionary responses are cached; errors fall through as-is
+        if not isinstance(result, dict):
+            return result
+        body = current_app.json.dumps(result)
+        cache.set(key, body)
+        return Response(body, mimetype='application/json')
+    return wrapper
@@ -0,0 +1,246 @@
+# app/services/catalog.py
+
+import csv
+import io
+import json
+from decimal import Decimal, InvalidOperation
+from urllib.parse import urlparse
+from sqlalchemy import text
+from ..models import db, Product
+from ..models.product import product_tags
+from .search import index_rows
+from .serializers import with_product_graph
+from .tags import MAX_TAG_LENGTH, parse_tags, resolve_tags
+
+# These are the columns in an export file, and the ones an import file may use
+EXPORT_COLUMNS = ['id', 'title', 'price', 'description', 'image_url', 'in_stock', 'stock_quantity', 'tags']
+# This is how many rows are validated and inserted together
+IMPORT_BATCH_SIZE = 1000
+# This is how many products are pulled from the server-side cursor at a time when exporting
+EXPORT_BATCH_SIZE = 1000
+# This caps how many row errors are kept for the report
+MAX_REPORTED_ERRORS = 100
+# This is the highest price a product may be imported with
+MAX_PRICE = Decimal('99999999.99')
+
+# This is the largest stock count the integer column holds
+MAX_STOCK = 2147483647
+
+
+# This is the error raised for a row that cannot be imported
+class RowError(ValueError):
+    pass
+
+
+# This will read rows from a CSV or NDJSON text stream one at a time
+def read_rows(stream, fmt):
+    if fmt == 'csv':
+        yield from csv.DictReader(stream)
+    elif fmt == 'ndjson':
+        for line in stream:
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                row = json.loads(line)
+            except ValueError:
+                row = RowError('Invalid JSON.')
+            if not isinstance(row, (dict, RowError)):
+                row = RowError('Each line must be a JSON object.')
+            yield row
+    else:
+        raise ValueError(f'Unknown format {fmt!r}.')
+
+
+# This will read an optional text field; NDJSON rows can hold any JSON type, so anything else is rejected
+def _text(row, name):
+    value = row.get(name)
+    if value is None:
+        return ''
+    if not isinstance(value, str):
+        raise RowError(f'{name} must be text.')
+    return value.strip()
+
+
+# This will check a row the same way ProductForm checks a single product
+def _clean_row(row, store_id):
+    if isinstance(row, RowError):
+        raise row
+
+    title = _text(row, 'title')
+    if not title:
+        raise RowError('title is required.')
+    if len(title) > 255:
+        raise RowError('title must be at most 255 characters.')
+
+    price = row.get('price')
+    if isinstance(price, bool) or not isinstance(price, (str, int, float)):
+        raise RowError('price must be a number.')
+    try:
+        price = Decimal(str(price).strip())
+    except (InvalidOperation, ValueError):
+        raise RowError('price must be a number.')
+    if not price.is_finite():
+        raise RowError('price must be a number.')
+    if price < 0 or price > MAX_PRICE:
+        raise RowError(f'price must be from 0 to {MAX_PRICE}.')
+
+    description = _text(row, 'description') or None
+    if description and len(description) > 500:
+        raise RowError('description must be at most 500 characters.')
+
+    image_url = _text(row, 'image_url') or None
+    if image_url:
+        parsed = urlparse(image_url)
+        if len(image_url) > 255 or parsed.scheme not in ('http', 'https') or not parsed.netloc:
+            raise RowError('image_url must be a valid URL.')
+
+    in_stock = row.get('in_stock', True)
+    if isinstance(in_stock, str):
+        in_stock = in_stock.strip().lower() not in ('0', 'false', 'no', '')
+
+    # A blank stock_quantity leaves stock untracked; a count decides in_stock by itself
+    stock_quantity = row.get('stock_quantity')
+    if isinstance(stock_quantity, str):
+        stock_quantity = stock_quantity.strip() or None
+    if stock_quantity is not None:
+        if isinstance(stock_quantity, bool) or not isinstance(stock_quantity, (str, int)):
+            raise RowError('stock_quantity must be a whole number.')
+        try:
+            stock_quantity = int(stock_quantity)
+        except ValueError:
+            raise RowError('stock_quantity must be a whole number.')
+        if stock_quantity < 0 or stock_quantity > MAX_STOCK:
+            raise RowError(f'stock_quantity must be from 0 to {MAX_STOCK}.')
+        in_stock = stock_quantity > 0
+
+    tags = row.get('tags')
+    if tags is not None and not isinstance(tags, (str, list)):
+        raise RowError('tags must be text or a list.')
+    tags = parse_tags(tags)
+    if any(len(tag) > MAX_TAG_LENGTH for tag in tags):
+        raise RowError(f'tags must be at most {MAX_TAG_LENGTH} characters each.')
+
+    return {
+        'store_id': store_id,
+        'title': title,
+        'price': float(round(price, 2)),
+        'description': description,
+        'image_url': image_url,
+        'in_stock': bool(in_stock),
+        'stock_quantity': stock_quantity,
+    }, tags
+
+
+# This will insert one batch of products and return their new ids in order
+def _insert_products(rows):
+    table = Product.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # One multi-row INSERT ... RETURNING gives the ids in VALUES order
+        return list(db.session.execute(table.insert().values(rows).returning(table.c.id)).scalars())
+    if dialect == 'sqlite':
+        # The write lock is held for the whole transaction, so an executemany
+        # assigns consecutive rowids ending at last_insert_rowid()
+        db.session.execute(table.insert(), rows)
+        last_id = db.session.execute(text('SELECT last_insert_rowid()')).scalar()
+        return list(range(last_id - len(rows) + 1, last_id + 1))
+    products = [Product(**row) for row in rows]
+    db.session.add_all(products)
+    db.session.flush()
+    return [product.id for product in products]
+
+
+# This will write one batch: tags in one upsert, products and their tag links in one executemany each
+def _flush_batch(batch):
+    tag_ids = resolve_tags({tag for _, _, tags in batch for tag in tags})
+    product_ids = _insert_products([row for _, row, _ in batch])
+
+    links = [
+        {'product_id': product_id, 'tag_id': tag_ids[tag]}
+        for product_id, (_, _, tags) in zip(product_ids, batch)
+        for tag in tags
+    ]
+    if links:
+        db.session.execute(product_tags.insert(), links)
+
+    index_rows([{
+        'id': product_id,
+        'store_id': row['store_id'],
+        'title': row['title'],
+        'description': row['description'],
+        'tags': ' '.join(tags),
+    } for product_id, (_, row, tags) in zip(product_ids, batch)])
+    db.session.commit()
+
+
+def import_products(store, rows, batch_size=IMPORT_BATCH_SIZE):
+    """
+    Import product rows (dictionaries) into a store. Rows are validated one at a
+    time and written in batches, each batch committed on its own. Returns a report
+    with the number imported and the errors per row (numbered from 1).
+    """
+    # The store id is read once, since every batch commit expires the store
+    store_id = store.id
+    imported = 0
+    errors = []
+    error_count = 0
+    batch = []
+
+    for number, row in enumerate(rows, start=1):
+        try:
+            clean, tags = _clean_row(row, store_id)
+        except RowError as e:
+            error_count += 1
+            if len(errors) < MAX_REPORTED_ERRORS:
+                errors.append({'row': number, 'message': str(e)})
+            continue
+
+        batch.append((number, clean, tags))
+        if len(batch) >= batch_size:
+            _flush_batch(batch)
+            imported += len(batch)
+            batch = []
+
+    if batch:
+        _flush_batch(batch)
+        imported += len(batch)
+
+    return {'imported': imported, 'error_count': error_count, 'errors': errors}
+
+
+# This will turn a product into an export row
+def _export_row(product):
+    return {
+        'id': product.id,
+        'title': product.title,
+        'price': product.price,
+        'description': product.description or '',
+        'image_url': product.image_url or '',
+        'in_stock': product.in_stock,
+        'stock_quantity': '' if product.stock_quantity is None else product.stock_quantity,
+        'tags': ','.join(tag.name for tag in product.tags),
+    }
+
+
+def export_products(store, fmt):
+    """Yield a store's products as CSV or NDJSON text chunks, reading them from a server-side cursor."""
+    query = with_product_graph(Product.query.filter_by(store_id=store.id).order_by(Product.id))
+    products = query.yield_per(EXPORT_BATCH_SIZE)
+
+    if fmt == 'ndjson':
+        for product in products:
+            yield json.dumps(_export_row(product)) + '\n'
+        return
+
+    buffer = io.StringIO()
+    writer = csv.DictWriter(buffer, fieldnames=EXPORT_COLUMNS)
+    writer.writeheader()
+    for count, product in enumerate(products, start=1):
+        writer.writerow(_export_row(product))
+        # This flushes the buffer every batch so memory stays flat
+        if count % EXPORT_BATCH_SIZE == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
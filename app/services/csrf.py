@@ -0,0 +1,42 @@
+# app/services/csrf.py
+
+import hmac
+import time
+from flask import current_app, request, session
+from itsdangerous import BadData, URLSafeTimedSerializer
+
+# These endpoints serve files that browsers and CDNs cache, so their responses never set cookies
+COOKIE_FREE_ENDPOINTS = {'static', 'uploaded_file'}
+
+# These are the responses the frontend can pick a token up from: API JSON and the React index.html
+TOKEN_MIMETYPES = {'application/json', 'text/html'}
+
+
+def csrf_cookie_needed(response):
+    """
+    Decide whether a response has to carry a new csrf_token cookie: only API and
+    HTML responses do, and only when the request's cookie is missing, invalid,
+    signed for a different session token, or past half of WTF_CSRF_TIME_LIMIT.
+    """
+    if request.endpoint in COOKIE_FREE_ENDPOINTS or response.mimetype not in TOKEN_MIMETYPES:
+        return False
+
+    token = request.cookies.get('csrf_token')
+    raw = session.get(current_app.config.get('WTF_CSRF_FIELD_NAME', 'csrf_token'))
+    if not token or not raw:
+        return True
+
+    # This is the same check flask_wtf.csrf.validate_csrf makes, keeping the signing time
+    secret = current_app.config.get('WTF_CSRF_SECRET_KEY') or current_app.secret_key
+    time_limit = current_app.config.get('WTF_CSRF_TIME_LIMIT', 3600)
+    try:
+        value, signed_at = URLSafeTimedSerializer(secret, salt='wtf-csrf-token').loads(
+            token, max_age=time_limit, return_timestamp=True
+        )
+    except BadData:
+        return True
+    if not isinstance(value, str) or not hmac.compare_digest(value, raw):
+        return True
+
+    # A token is replaced halfway through its lifetime, so an open page always holds a valid one
+    return bool(time_limit) and time.time() - signed_at.timestamp() > time_limit / 2
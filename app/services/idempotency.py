@@ -0,0 +1,111 @@
+# app/services/idempotency.py
+
+import hashlib
+import json
+from datetime import datetime, timedelta
+from flask import current_app, request
+from sqlalchemy import bindparam, select
+from sqlalchemy.dialects import postgresql, sqlite
+from ..models import db, IdempotencyKey
+
+# This is the header clients send a key in, and the one marking a replayed response
+IDEMPOTENCY_HEADER = 'Idempotency-Key'
+REPLAYED_HEADER = 'Idempotent-Replayed'
+
+# This is the longest key accepted (the column size)
+MAX_KEY_LENGTH = 255
+
+
+class IdempotencyError(ValueError):
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+# This will insert the key's row unless it already exists; on Postgres this waits
+# for a concurrent transaction holding the same key to commit or roll back first
+def _insert_key(row):
+    table = IdempotencyKey.__table__
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(postgresql.insert(table).on_conflict_do_nothing(index_elements=['scope', 'key']), row)
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(table).on_conflict_do_nothing(index_elements=['scope', 'key']), row)
+    elif not db.session.execute(select(table.c.key).filter_by(scope=row['scope'], key=row['key'])).first():
+        db.session.execute(table.insert(), row)
+
+
+# This will hash a JSON request body, so equal bodies give equal hashes whatever their key order
+def request_hash(data):
+    return hashlib.sha256(json.dumps(data, sort_keys=True, separators=(',', ':')).encode()).hexdigest()
+
+
+def claim_idempotency_key(scope, data):
+    """
+    Claim the request's Idempotency-Key within scope for the current transaction.
+    Returns None when the request has no key. Otherwise returns the key's row,
+    locked until the transaction ends: a row without a status_code is new and
+    the caller should do the work and save_response before committing; a row
+    with one holds the earlier response to replay. A concurrent request with
+    the same key waits on the row lock and then sees the committed response,
+    so both collapse into one write. Keys past IDEMPOTENCY_KEY_TTL count as new.
+    """
+    key = request.headers.get(IDEMPOTENCY_HEADER)
+    if key is None:
+        return None
+    key = key.strip()
+    if not key or len(key) > MAX_KEY_LENGTH:
+        raise IdempotencyError(f'{IDEMPOTENCY_HEADER} must be 1 to {MAX_KEY_LENGTH} characters.')
+
+    table = IdempotencyKey.__table__
+    now = datetime.utcnow()
+    cutoff = now - timedelta(seconds=current_app.config['IDEMPOTENCY_KEY_TTL'])
+    # An expired key is dropped here rather than waiting for the sweeper
+    db.session.execute(table.delete().where(table.c.scope == scope, table.c.key == key, table.c.created_at < cutoff))
+    digest = request_hash(data)
+    _insert_key({'scope': scope, 'key': key, 'request_hash': digest, 'created_at': now})
+
+    # This locks the row (SELECT ... FOR UPDATE where the database supports it)
+    record = (
+        IdempotencyKey.query.filter_by(scope=scope, key=key)
+        .with_for_update()
+        .populate_existing()
+        .one()
+    )
+    if record.request_hash != digest:
+        raise IdempotencyError(f'This {IDEMPOTENCY_HEADER} was already used for a different request.', 422)
+    return record
+
+
+# This will store the response on a claimed key, to be committed along with the work it describes
+def save_response(record, body, status_code):
+    record.status_code = status_code
+    record.response = json.dumps(body)
+
+
+# This will build the stored response for a repeated key
+def replay_response(record):
+    return json.loads(record.response), record.status_code, {REPLAYED_HEADER: 'true'}
+
+
+def sweep_idempotency_keys(ttl, batch_size=1000):
+    """Delete keys older than ttl seconds, batch_size rows per transaction. Returns how many were deleted."""
+    table = IdempotencyKey.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=ttl)
+    deleted = 0
+    while True:
+        # Deleting in batches keeps each transaction, and its locks, short
+        batch = select(table.c.scope, table.c.key).where(table.c.created_at < cutoff).limit(batch_size)
+        rows = db.session.execute(batch).all()
+        if not rows:
+            return deleted
+        db.session.execute(
+            table.delete().where(
+                table.c.scope == bindparam('expired_scope'),
+                table.c.key == bindparam('expired_key'),
+                table.c.created_at < cutoff
+            ),
+            [{'expired_scope': scope, 'expired_key': key} for scope, key in rows]
+        )
+        db.session.commit()
+        deleted += len(rows)
@@ -0,0 +1,82 @@
+# app/services/identity.py
+
+import json
+from functools import wraps
+from flask import current_app
+from flask_login import current_user
+from sqlalchemy import inspect
+from sqlalchemy.orm import joinedload, make_transient_to_detached
+from sqlalchemy.orm.attributes import set_committed_value
+from sqlalchemy.orm.util import identity_key
+from ..models import db, User, Store
+from .cache import get_cache
+
+# This is the cache key of a signed-in user and their store, kept for a short while in the
+# app's cache backend (shared by every worker with redis) as JSON of their column values
+def _identity_key(user_id):
+    return f'identity:{user_id}'
+
+
+# This will copy the column values of a row into a plain dictionary
+def _snapshot(instance):
+    return {attr.key: getattr(instance, attr.key) for attr in inspect(instance).mapper.column_attrs}
+
+
+# This will rebuild a row from a snapshot and attach it to the session without a query
+def _restore(model, values):
+    key = identity_key(model, values['id'])
+    existing = db.session.identity_map.get(key)
+    if existing is not None:
+        return existing
+    instance = model(**values)
+    make_transient_to_detached(instance)
+    db.session.add(instance)
+    return instance
+
+
+def load_identity(user_id):
+    """
+    Load a user together with their store, for flask-login's user_loader.
+    The user and store come from one joined query, or from the cache when the
+    same user was loaded in the last IDENTITY_CACHE_TIMEOUT seconds; users
+    without a store are always queried.
+    """
+    timeout = current_app.config.get('IDENTITY_CACHE_TIMEOUT', 0)
+    cached = get_cache().get(_identity_key(user_id)) if timeout else None
+
+    if cached is not None:
+        cached = json.loads(cached)
+        user = _restore(User, cached['user'])
+        store = _restore(Store, cached['store'])
+        set_committed_value(user, 'store', store)
+        set_committed_value(store, 'user', user)
+        return user
+
+    user = User.query.options(joinedload(User.store)).get(user_id)
+    # A user without a store is not cached, so a store they just created is seen at once
+    if user is not None and user.store is not None and timeout:
+        get_cache().set(_identity_key(user_id), json.dumps({
+            'user': _snapshot(user),
+            'store': _snapshot(user.store),
+        }), timeout=timeout)
+    return user
+
+
+def forget_identity(user_id):
+    """Drop a user's cached identity after their user or store row changes."""
+    get_cache().delete(_identity_key(user_id))
+
+
+# This will get the current user's store, loaded together with the user
+def current_store():
+    if not current_user.is_authenticated:
+        return None
+    return current_user.store
+
+
+def with_store(view):
+    """Pass the current user's store (or None) to the view as the store keyword argument."""
+    @wraps(view)
+    def wrapper(*args, **kwargs):
+        return view(*args, store=current_store(), **kwargs)
+    return wrapper
@@ -0,0 +1,154 @@
+# app/services/images.py
+
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor, TimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from io import BytesIO
+from flask import current_app
+from PIL import Image, ImageOps, UnidentifiedImageError
+from .uploads import store_content
+
+# These are the sizes every upload is resized to (longest side fits the box)
+VARIANTS = {
+    'thumbnail': (160, 160),
+    'card': (480, 480),
+    'full': (1600, 1600)
+}
+# These are the formats every variant is written in, with their file extensions and content types
+FORMATS = {'webp': 'webp', 'jpeg': 'jpg'}
+CONTENT_TYPES = {'webp': 'image/webp', 'jpeg': 'image/jpeg'}
+# These are the decoded formats accepted, whatever the file name claims
+ACCEPTED_FORMATS = {'PNG', 'JPEG', 'GIF', 'WEBP'}
+# This is the background transparent images are flattened onto for JPEG
+JPEG_BACKGROUND = (255, 255, 255)
+
+
+class ImageError(ValueError):
+    """Raised when an upload is not an image the pipeline accepts."""
+
+
+# This will decode, check and re-encode one upload
+# It runs in a pool process, so it only takes and returns plain bytes and dicts
+def process_image(data, max_pixels):
+    try:
+        with Image.open(BytesIO(data)) as probe:
+            # The header is read lazily, so this rejects oversized images before decoding them
+            if probe.format not in ACCEPTED_FORMATS:
+                raise ImageError('File is not a PNG, JPEG, GIF or WebP image.')
+            if probe.width * probe.height > max_pixels:
+                raise ImageError('Image dimensions are too large.')
+            probe.verify()
+        # verify() leaves the image unusable, so it is opened again to decode it
+        with Image.open(BytesIO(data)) as image:
+            image.seek(0)
+            image = ImageOps.exif_transpose(image)
+            image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError, SyntaxError) as error:
+        raise ImageError('File is not a valid image.') from error
+
+    # Only the pixels are kept; EXIF, GPS, ICC and comments are never written back out
+    has_alpha = image.mode in ('RGBA', 'LA', 'PA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    variants = {}
+    for name, box in VARIANTS.items():
+        resized = image.copy()
+        resized.thumbnail(box, Image.Resampling.LANCZOS)
+        variants[name] = {
+            'width': resized.width,
+            'height': resized.height,
+            'webp': _encode_webp(resized),
+            'jpeg': _encode_jpeg(resized)
+        }
+    return variants
+
+
+def _encode_webp(image):
+    out = BytesIO()
+    image.save(out, 'WEBP', quality=80, method=4)
+    return out.getvalue()
+
+
+def _encode_jpeg(image):
+    if image.mode == 'RGBA':
+        flat = Image.new('RGB', image.size, JPEG_BACKGROUND)
+        flat.paste(image, mask=image.getchannel('A'))
+        image = flat
+    out = BytesIO()
+    image.save(out, 'JPEG', quality=82, optimize=True, progressive=True)
+    return out.getvalue()
+
+
+# This is the per-process pool, remembered with the pid that created it
+# so a forked gunicorn worker never reuses its parent's pool; the lock keeps
+# threaded workers from starting (or resetting) two pools at once
+_pool = None
+_pool_pid = None
+_pool_lock = threading.Lock()
+
+
+def _pool_context():
+    # Pool processes are started from a clean server process (or spawned where there is none)
+    # rather than forked from a request worker that may hold locks in other threads
+    if 'forkserver' in multiprocessing.get_all_start_methods():
+        return multiprocessing.get_context('forkserver')
+    return multiprocessing.get_context('spawn')
+
+
+def _get_pool():
+    global _pool, _pool_pid
+    with _pool_lock:
+        if _pool is None or _pool_pid != os.getpid():
+            _pool = ProcessPoolExecutor(
+                max_workers=current_app.config['IMAGE_WORKERS'],
+                mp_context=_pool_context()
+            )
+            _pool_pid = os.getpid()
+        return _pool
+
+
+def _reset_pool(broken):
+    global _pool
+    with _pool_lock:
+        # Another thread may already have replaced the broken pool
+        if _pool is not broken:
+            return
+        if _pool_pid == os.getpid():
+            _pool.shutdown(wait=False, cancel_futures=True)
+        _pool = None
+
+
+def render_variants(data):
+    """
+    Validate an upload and return its resized variants as encoded bytes.
+    The work happens in a process pool (IMAGE_WORKERS processes, 0 runs it inline)
+    so decoding a large image never holds the request worker's GIL.
+    """
+    config = current_app.config
+    if config['IMAGE_WORKERS'] <= 0:
+        return process_image(data, config['IMAGE_MAX_PIXELS'])
+
+    pool = _get_pool()
+    try:
+        future = pool.submit(process_image, data, config['IMAGE_MAX_PIXELS'])
+        return future.result(timeout=config['IMAGE_PROCESS_TIMEOUT'])
+    except BrokenProcessPool:
+        # A pool process died (e.g. it was OOM-killed), so the next upload gets a fresh pool
+        _reset_pool(pool)
+        raise
+    except TimeoutError:
+        future.cancel()
+        raise
+
+
+def save_variants(variants, storage):
+    """Store every variant in the storage backend by content hash and return their URLs."""
+    urls = {}
+    for name, variant in variants.items():
+        urls[name] = {'width': variant['width'], 'height': variant['height']}
+        for fmt, ext in FORMATS.items():
+            key = store_content(storage, variant[fmt], ext, CONTENT_TYPES[fmt])
+            urls[name][fmt] = storage.url(key)
+    return urls
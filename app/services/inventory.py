@@ -0,0 +1,52 @@
+# app/services/inventory.py
+
+from sqlalchemy import case, or_, select, update
+from ..models import db, Product
+
+
+# This will build the conditional decrement for one product: it only matches while
+# enough stock is left (or stock is not tracked), and keeps in_stock in step
+def _take_statement(product_id, quantity):
+    products = Product.__table__
+    stock = products.c.stock_quantity
+    return (
+        update(products)
+        .where(products.c.id == product_id, or_(stock.is_(None), stock >= quantity))
+        .values(
+            stock_quantity=stock - quantity,
+            in_stock=case((stock.is_(None), products.c.in_stock), else_=stock - quantity > 0)
+        )
+    )
+
+
+def reserve_stock(quantities):
+    """
+    Take the stock for an order's lines ({product_id: quantity}) in the caller's
+    transaction. Every product is one atomic UPDATE ... WHERE stock_quantity >= n,
+    so concurrent checkouts can never oversell, and each only locks the product
+    rows it touches; products without a stock count always succeed. Rows are
+    updated in id order so two orders for the same products cannot deadlock.
+    Returns (short, sold_out): short holds the first id without enough stock,
+    after which nothing more is taken and the caller must roll back, and
+    sold_out the ids whose last unit this order took.
+    """
+    products = Product.__table__
+    # RETURNING hands back the new count in the same statement where the database has it
+    returning = db.session.get_bind().dialect.full_returning
+    short, sold_out = [], []
+    for product_id in sorted(quantities):
+        statement = _take_statement(product_id, quantities[product_id])
+        if returning:
+            row = db.session.execute(statement.returning(products.c.stock_quantity)).first()
+            if row is None:
+                short.append(product_id)
+                break
+            remaining = row[0]
+        else:
+            if db.session.execute(statement).rowcount != 1:
+                short.append(product_id)
+                break
+            remaining = db.session.execute(select(products.c.stock_quantity).where(products.c.id == product_id)).scalar()
+        if remaining == 0:
+            sold_out.append(product_id)
+    return short, sold_out
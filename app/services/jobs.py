@@ -0,0 +1,239 @@
+# app/services/jobs.py
+
+import json
+import logging
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from datetime import datetime, timedelta
+from flask import current_app
+from sqlalchemy import and_, func, or_, select
+from ..models import db, Job
+
+# This is the logger job runs are reported to
+logger = logging.getLogger('storedash.jobs')
+
+# These are the statuses a job moves through
+STATUSES = ('queued', 'running', 'done', 'failed')
+
+# This is how much of a failure's traceback is kept on the job
+MAX_ERROR_LENGTH = 4000
+
+# These are the job handlers by name, registered with @job_handler
+HANDLERS = {}
+
+
+def job_handler(name):
+    """Register a function as the handler of the jobs called name; it is called with the job's payload as keyword arguments."""
+    def register(handler):
+        HANDLERS[name] = handler
+        return handler
+    return register
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """
+    Add a job to the caller's session, so it is committed or rolled back together
+    with the change that caused it. The payload must be JSON serializable.
+    Jobs run at least once: a handler may run again after a failure or a lost
+    worker, so it must be safe to repeat.
+    """
+    if name not in HANDLERS:
+        raise ValueError(f'No job handler named {name!r}.')
+    now = datetime.utcnow()
+    job = Job(
+        name=name,
+        payload=json.dumps(payload or {}),
+        status='queued',
+        attempts=0,
+        max_attempts=max_attempts or current_app.config['JOBS_MAX_ATTEMPTS'],
+        run_at=now + timedelta(seconds=delay),
+        created_at=now
+    )
+    db.session.add(job)
+    return job
+
+
+# This will work out how long a job waits before its next attempt: exponential backoff
+# with jitter, so jobs that failed together during an outage do not all retry together
+def retry_delay(attempts):
+    delay = min(current_app.config['JOBS_BACKOFF_MAX'], current_app.config['JOBS_BACKOFF_BASE'] * 2 ** (attempts - 1))
+    return delay / 2 + random.uniform(0, delay / 2)
+
+
+# This is the condition for a job a worker may take: queued and due, or still marked
+# running by a worker that stopped answering more than JOBS_LOCK_TIMEOUT ago
+def _claimable(now):
+    table = Job.__table__
+    stale = now - timedelta(seconds=current_app.config['JOBS_LOCK_TIMEOUT'])
+    return or_(
+        and_(table.c.status == 'queued', table.c.run_at <= now),
+        and_(table.c.status == 'running', table.c.locked_at < stale, table.c.attempts < table.c.max_attempts)
+    )
+
+
+def claim_jobs(worker, limit):
+    """
+    Mark up to limit due jobs as running for worker and return their ids. On
+    Postgres the candidates are picked with FOR UPDATE SKIP LOCKED, so workers
+    never wait on each other; every claim is also a conditional UPDATE, so a job
+    is only ever claimed once whatever the database.
+    """
+    table = Job.__table__
+    now = datetime.utcnow()
+    stale = now - timedelta(seconds=current_app.config['JOBS_LOCK_TIMEOUT'])
+
+    # A job whose worker was lost on its last attempt is not run again
+    db.session.execute(
+        table.update()
+        .where(table.c.status == 'running', table.c.locked_at < stale, table.c.attempts >= table.c.max_attempts)
+        .values(status='failed', finished_at=now, locked_by=None, locked_at=None,
+                last_error='The worker running the last attempt stopped before it finished.')
+    )
+
+    candidates = db.session.execute(
+        select(table.c.id).where(_claimable(now))
+        .order_by(table.c.run_at, table.c.id)
+        .limit(limit)
+        .with_for_update(skip_locked=True)
+    ).scalars().all()
+    claimed = []
+    for job_id in candidates:
+        result = db.session.execute(
+            table.update()
+            .where(table.c.id == job_id, _claimable(now))
+            .values(status='running', locked_by=worker, locked_at=now, attempts=table.c.attempts + 1)
+        )
+        if result.rowcount == 1:
+            claimed.append(job_id)
+    db.session.commit()
+    return claimed
+
+
+# This will hand claimed jobs that were never started back to the queue
+def release_jobs(worker, job_ids):
+    if not job_ids:
+        return
+    table = Job.__table__
+    db.session.execute(
+        table.update()
+        .where(table.c.id.in_(job_ids), table.c.status == 'running', table.c.locked_by == worker)
+        .values(status='queued', locked_by=None, locked_at=None, attempts=table.c.attempts - 1)
+    )
+    db.session.commit()
+
+
+def run_job(job_id):
+    """
+    Run one claimed job. The handler's own database changes commit together with
+    the job being marked done; when it raises, they are rolled back and the job is
+    queued again after retry_delay, or failed once it is out of attempts.
+    Returns whether the job succeeded.
+    """
+    job = db.session.get(Job, job_id)
+    handler = HANDLERS.get(job.name)
+    started = time.perf_counter()
+    try:
+        if handler is None:
+            raise LookupError(f'No job handler named {job.name!r}.')
+        handler(**json.loads(job.payload))
+        job.status = 'done'
+        job.finished_at = datetime.utcnow()
+        job.locked_by = job.locked_at = None
+        job.last_error = None
+        db.session.commit()
+        logger.info(json.dumps({'event': 'job_done', 'job': job_id, 'name': job.name, 'attempt': job.attempts,
+                                'duration_ms': round((time.perf_counter() - started) * 1000, 3)}))
+        return True
+    except Exception:
+        error = traceback.format_exc()[-MAX_ERROR_LENGTH:]
+        db.session.rollback()
+
+    job = db.session.get(Job, job_id)
+    now = datetime.utcnow()
+    if handler is None or job.attempts >= job.max_attempts:
+        job.status = 'failed'
+        job.finished_at = now
+    else:
+        job.status = 'queued'
+        job.run_at = now + timedelta(seconds=retry_delay(job.attempts))
+    job.locked_by = job.locked_at = None
+    job.last_error = error
+    db.session.commit()
+    logger.warning(json.dumps({'event': 'job_' + job.status, 'job': job_id, 'name': job.name, 'attempt': job.attempts,
+                               'run_at': job.run_at.isoformat(), 'error': error.strip().splitlines()[-1]}))
+    return False
+
+
+def work(stop=None, batch_size=10, poll_interval=None, once=False, worker=None):
+    """
+    Claim and run due jobs until stop (a threading.Event) is set, sleeping
+    poll_interval seconds whenever the queue is empty. With once, return as
+    soon as no job is due instead. Returns how many jobs were run.
+    """
+    stop = stop or threading.Event()
+    worker = worker or f'{socket.gethostname()}:{os.getpid()}'
+    if poll_interval is None:
+        poll_interval = current_app.config['JOBS_POLL_INTERVAL']
+    ran = 0
+    while not stop.is_set():
+        job_ids = claim_jobs(worker, batch_size)
+        if not job_ids:
+            if once:
+                break
+            stop.wait(poll_interval)
+            continue
+        for index, job_id in enumerate(job_ids):
+            # A stopping worker finishes its current job and gives the rest back
+            if stop.is_set():
+                release_jobs(worker, job_ids[index:])
+                break
+            run_job(job_id)
+            ran += 1
+    return ran
+
+
+def queue_stats():
+    """Count the jobs in each status, how many are due now, and how long the oldest due job has waited."""
+    now = datetime.utcnow()
+    counts = dict(db.session.query(Job.status, func.count()).group_by(Job.status).all())
+    due, oldest = db.session.query(func.count(), func.min(Job.run_at)).filter(Job.status == 'queued', Job.run_at <= now).one()
+    return {
+        'counts': {status: counts.get(status, 0) for status in STATUSES},
+        'due': due,
+        'oldest_due_seconds': round((now - oldest).total_seconds(), 3) if oldest else 0.0
+    }
+
+
+# This will list the most recent jobs, optionally only those in one status
+def list_jobs(status=None, limit=20):
+    query = Job.query
+    if status:
+        query = query.filter(Job.status == status)
+    return query.order_by(Job.id.desc()).limit(limit).all()
+
+
+def retry_jobs(job_ids=None):
+    """Queue failed jobs (all of them, or only job_ids) to run again now with fresh attempts. Returns how many."""
+    table = Job.__table__
+    condition = table.c.status == 'failed'
+    if job_ids:
+        condition = and_(condition, table.c.id.in_(job_ids))
+    result = db.session.execute(
+        table.update().where(condition)
+        .values(status='queued', attempts=0, run_at=datetime.utcnow(), finished_at=None)
+    )
+    db.session.commit()
+    return result.rowcount
+
+
+def purge_jobs(older_than):
+    """Delete done jobs that finished more than older_than seconds ago. Returns how many."""
+    table = Job.__table__
+    cutoff = datetime.utcnow() - timedelta(seconds=older_than)
+    result = db.session.execute(table.delete().where(table.c.status == 'done', table.c.finished_at < cutoff))
+    db.session.commit()
+    return result.rowcount
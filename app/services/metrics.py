@@ -0,0 +1,112 @@
+# app/services/metrics.py
+
+import os
+import time
+from contextlib import contextmanager
+from flask import Response, g, has_app_context, request
+from flask.json.provider import DefaultJSONProvider
+from prometheus_client import CONTENT_TYPE_LATEST, REGISTRY, CollectorRegistry, Counter, Histogram, generate_latest
+from prometheus_client import multiprocess
+from .query_log import query_timer, query_tally
+
+# These are the labels of every request metric
+LABELS = ('blueprint', 'endpoint', 'method')
+
+# These are the histogram buckets for request times (seconds) and query counts
+SECONDS_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+QUERY_BUCKETS = (0, 1, 2, 3, 5, 10, 20, 50, 100)
+
+# With PROMETHEUS_MULTIPROC_DIR set (gunicorn.conf.py sets it) every worker writes its
+# samples to files there and /metrics adds up all the workers; otherwise they stay in memory
+REQUESTS = Counter(
+    'storedash_requests', 'Requests served.', LABELS + ('status',)
+)
+REQUEST_SECONDS = Histogram(
+    'storedash_request_duration_seconds', 'Wall time from the first request hook to the finished response.',
+    LABELS, buckets=SECONDS_BUCKETS
+)
+DB_SECONDS = Histogram(
+    'storedash_request_db_seconds', 'Time spent executing SQL statements during a request.',
+    LABELS, buckets=SECONDS_BUCKETS
+)
+QUERIES = Histogram(
+    'storedash_request_queries', 'SQL statements executed during a request.',
+    LABELS, buckets=QUERY_BUCKETS
+)
+SERIALIZE_SECONDS = Histogram(
+    'storedash_request_serialize_seconds', 'Time spent turning models into dictionaries and JSON during a request.',
+    LABELS, buckets=SECONDS_BUCKETS
+)
+
+
+# This will add the time spent in its block to the request's serialization time
+@contextmanager
+def timed_serialization():
+    started = time.perf_counter()
+    try:
+        yield
+    finally:
+        if has_app_context():
+            g.serialize_ms = g.get('serialize_ms', 0.0) + (time.perf_counter() - started) * 1000
+
+
+# This is Flask's JSON provider with its encoding counted as serialization time
+class TimedJSONProvider(DefaultJSONProvider):
+    def dumps(self, obj, **kwargs):
+        with timed_serialization():
+            return super().dumps(obj, **kwargs)
+
+
+def _start_timer():
+    g.request_started = time.perf_counter()
+
+
+def _record_request(app):
+    def record(response):
+        started = g.get('request_started')
+        if started is None:
+            return response
+        total_ms = (time.perf_counter() - started) * 1000
+        tally = query_tally() or {'queries': 0, 'db_ms': 0.0}
+        serialize_ms = g.get('serialize_ms', 0.0)
+
+        labels = (request.blueprint or '', request.endpoint or 'unmatched', request.method)
+        REQUESTS.labels(*labels, str(response.status_code)).inc()
+        REQUEST_SECONDS.labels(*labels).observe(total_ms / 1000)
+        DB_SECONDS.labels(*labels).observe(tally['db_ms'] / 1000)
+        QUERIES.labels(*labels).observe(tally['queries'])
+        SERIALIZE_SECONDS.labels(*labels).observe(serialize_ms / 1000)
+
+        # Streamed bodies are produced after this point, so their time is not included
+        if app.config['SERVER_TIMING']:
+            response.headers['Server-Timing'] = (
+                f'app;dur={total_ms:.1f}, '
+                f'db;dur={tally["db_ms"]:.1f};desc="{tally["queries"]} queries", '
+                f'serialize;dur={serialize_ms:.1f}'
+            )
+        return response
+    return record
+
+
+def init_metrics(app):
+    """
+    Time every request: wall time, database time and query count, and serialization
+    time, recorded as Prometheus histograms and sent back in a Server-Timing header.
+    Call it before any other request hooks are registered, so the timer starts first.
+    """
+    if not app.config['METRICS']:
+        return
+    query_timer()
+    app.json = TimedJSONProvider(app)
+    app.before_request(_start_timer)
+    app.after_request(_record_request(app))
+
+
+def metrics_response():
+    """Render every metric in the Prometheus text format, summed over all workers."""
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), content_type=CONTENT_TYPE_LATEST)
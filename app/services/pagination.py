@@ -0,0 +1,144 @@
+# app/services/pagination.py
+
+import base64
+from flask import Response, current_app, request, stream_with_context
+from .metrics import timed_serialization
+
+# This is the largest page a client can ask for with ?limit=
+MAX_PAGE_SIZE = 200
+# This is how many rows are pulled from the server-side cursor at a time when streaming
+STREAM_BATCH_SIZE = 500
+
+
+# This is the error raised when the limit/after query parameters are invalid
+class PaginationError(ValueError):
+    pass
+
+
+# This will turn a primary key into an opaque cursor for next_cursor
+def encode_cursor(value):
+    return base64.urlsafe_b64encode(str(value).encode()).decode().rstrip('=')
+
+
+# This will turn an opaque cursor from ?after= back into a primary key
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        return int(base64.urlsafe_b64decode(padded.encode()).decode())
+    except (ValueError, UnicodeDecodeError):
+        raise PaginationError('Invalid cursor.')
+
+
+# This will read the limit, after and stream query parameters from the request
+def page_args():
+    limit = request.args.get('limit')
+    after = request.args.get('after')
+    stream = request.args.get('stream', '').lower() in ('1', 'true', 'yes')
+
+    if limit is not None:
+        try:
+            limit = int(limit)
+        except ValueError:
+            raise PaginationError('limit must be an integer.')
+        if limit < 1 or limit > MAX_PAGE_SIZE:
+            raise PaginationError(f'limit must be between 1 and {MAX_PAGE_SIZE}.')
+
+    return limit, decode_cursor(after) if after else None, stream
+
+
+# This will read the paging parameters and check they suit the query
+def page_params(ranked=False):
+    limit, after, stream = page_args()
+    if ranked and after is not None:
+        raise PaginationError('after is not supported for ranked search results.')
+    return limit, after, stream
+
+
+# This will narrow a query to one page
+def page_query(query, column, limit, after):
+    # This will seek past the cursor using the index on column instead of an OFFSET scan
+    if after is not None:
+        query = query.filter(column > after)
+    query = query.order_by(column)
+
+    # This will fetch one extra row so we know whether there is a next page
+    if limit is not None:
+        query = query.limit(limit + 1)
+    return query
+
+
+# This is the default way list items become dictionaries
+def _to_dict(item):
+    return item.to_dict()
+
+
+# This will build the response body from the rows of a page query
+def page_body(key, items, column, limit, after, extra=None, ranked=False, serialize=None):
+    serialize = serialize or _to_dict
+    next_cursor = None
+    if limit is not None and len(items) > limit:
+        items = items[:limit]
+        if not ranked:
+            next_cursor = encode_cursor(getattr(items[-1], column.key))
+
+    response = dict(extra or {})
+    with timed_serialization():
+        response[key] = [serialize(item) for item in items]
+    if limit is not None or after is not None:
+        response['next_cursor'] = next_cursor
+    return response
+
+
+# These are the opening and closing pieces of a streamed list response
+def stream_head(key, extra):
+    # This will open the object with any extra keys (like the store) first
+    head = current_app.json.dumps(extra)[:-1] if extra else '{'
+    return f'{head}{", " if extra else ""}"{key}": ['
+
+
+def stream_tail(next_cursor):
+    return f'], "next_cursor": {current_app.json.dumps(next_cursor)}}}'
+
+
+# This will stream a list response as JSON chunks from a server-side cursor
+def _stream_chunks(key, query, column, limit, extra, ranked, serialize):
+    dumps = current_app.json.dumps
+    yield stream_head(key, extra)
+
+    next_cursor = None
+    last = None
+    count = 0
+    # yield_per keeps only one batch of rows in memory at a time
+    for item in query.yield_per(STREAM_BATCH_SIZE):
+        if limit is not None and count == limit:
+            if not ranked:
+                next_cursor = encode_cursor(getattr(last, column.key))
+            break
+        yield (', ' if count else '') + dumps(serialize(item))
+        last = item
+        count += 1
+
+    yield stream_tail(next_cursor)
+
+
+def list_response(key, query, column, extra=None, ranked=False, serialize=None):
+    """
+    Build a list endpoint response with keyset pagination on column (?limit=&after=)
+    and an optional streaming mode (?stream=1). Without any of these parameters the
+    full list is returned like before. A ranked query keeps its own ordering, so it
+    can be limited but has no cursor. Items are turned into dictionaries with
+    serialize, which defaults to their to_dict().
+    """
+    serialize = serialize or _to_dict
+    try:
+        limit, after, stream = page_params(ranked)
+    except PaginationError as e:
+        return {'errors': {'message': str(e)}}, 400
+
+    query = page_query(query, column, limit, after)
+    if stream:
+        return Response(
+            stream_with_context(_stream_chunks(key, query, column, limit, extra, ranked, serialize)),
+            mimetype='application/json'
+        )
+    return page_body(key, query.all(), column, limit, after, extra, ranked, serialize)
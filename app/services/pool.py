@@ -0,0 +1,165 @@
+# app/services/pool.py
+
+import os
+import threading
+import time
+from sqlalchemy import event
+from sqlalchemy.engine import make_url
+from sqlalchemy.exc import TimeoutError as PoolTimeout
+from sqlalchemy.pool import AsyncAdaptedQueuePool, QueuePool
+
+# These are the upper bounds (seconds) of the checkout wait histogram buckets
+WAIT_BUCKETS = (0.001, 0.005, 0.01, 0.05, 0.1, 0.5, 1.0, 5.0)
+
+
+# This is the running tally of one connection pool
+# Every gunicorn worker has its own pools, so the numbers are per process
+class PoolStats:
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.checkouts = 0
+        self.overflow_checkouts = 0
+        self.timeouts = 0
+        self.connects = 0
+        self.invalidations = 0
+        self.wait_count = 0
+        self.wait_total = 0.0
+        self.wait_max = 0.0
+        self.wait_buckets = [0] * (len(WAIT_BUCKETS) + 1)
+
+    def record_checkout(self, waited, overflowed):
+        with self._lock:
+            self.checkouts += 1
+            if overflowed:
+                self.overflow_checkouts += 1
+            self._record_wait(waited)
+
+    def record_timeout(self, waited):
+        with self._lock:
+            self.timeouts += 1
+            self._record_wait(waited)
+
+    def _record_wait(self, waited):
+        self.wait_count += 1
+        self.wait_total += waited
+        self.wait_max = max(self.wait_max, waited)
+        for index, bound in enumerate(WAIT_BUCKETS):
+            if waited <= bound:
+                self.wait_buckets[index] += 1
+                break
+        else:
+            self.wait_buckets[-1] += 1
+
+    def record_connect(self):
+        with self._lock:
+            self.connects += 1
+
+    def record_invalidation(self):
+        with self._lock:
+            self.invalidations += 1
+
+    def to_dict(self):
+        with self._lock:
+            bounds = [str(bound) for bound in WAIT_BUCKETS] + ['+Inf']
+            return {
+                'checkouts': self.checkouts,
+                'overflow_checkouts': self.overflow_checkouts,
+                'timeouts': self.timeouts,
+                'connects': self.connects,
+                'invalidations': self.invalidations,
+                'wait': {
+                    'count': self.wait_count,
+                    'total_seconds': round(self.wait_total, 6),
+                    'max_seconds': round(self.wait_max, 6),
+                    'buckets': dict(zip(bounds, self.wait_buckets))
+                }
+            }
+
+
+# This adds the tally to a queue pool
+# _do_get is where a checkout blocks for a free connection (or opens an overflow one),
+# so timing it gives the wait; the stats carry over when the pool is recreated on dispose()
+class _InstrumentedPool:
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.stats = PoolStats()
+        # recreate() hands the listeners of the pool it replaces to the new one
+        if '_dispatch' not in kwargs:
+            event.listen(self, 'invalidate', lambda *args: self.stats.record_invalidation())
+            event.listen(self, 'connect', lambda *args: self.stats.record_connect())
+
+    def _do_get(self):
+        started = time.perf_counter()
+        try:
+            connection = super()._do_get()
+        except PoolTimeout:
+            self.stats.record_timeout(time.perf_counter() - started)
+            raise
+        self.stats.record_checkout(time.perf_counter() - started, self.checkedout() > self.size())
+        return connection
+
+    def recreate(self):
+        pool = super().recreate()
+        pool.stats = self.stats
+        return pool
+
+
+class InstrumentedQueuePool(_InstrumentedPool, QueuePool):
+    pass
+
+
+class InstrumentedAsyncQueuePool(_InstrumentedPool, AsyncAdaptedQueuePool):
+    pass
+
+
+def engine_options(config):
+    """
+    Build SQLALCHEMY_ENGINE_OPTIONS from the DB_POOL_* settings.
+    SQLite keeps SQLAlchemy's default pool, since it is only used in development.
+    """
+    url = make_url(config['SQLALCHEMY_DATABASE_URI'])
+    if url.get_backend_name() == 'sqlite':
+        return {}
+    return {
+        'poolclass': InstrumentedQueuePool,
+        'pool_size': config['DB_POOL_SIZE'],
+        'max_overflow': config['DB_MAX_OVERFLOW'],
+        'pool_timeout': config['DB_POOL_TIMEOUT'],
+        # Connections are replaced before the server or a proxy closes them as idle
+        'pool_recycle': config['DB_POOL_RECYCLE'],
+        # A connection dropped by a failover or restart is noticed before a query uses it
+        'pool_pre_ping': config['DB_POOL_PRE_PING']
+    }
+
+
+def init_pool(app):
+    """Set the engine options from the pool settings, unless the app sets its own."""
+    if 'SQLALCHEMY_ENGINE_OPTIONS' not in app.config:
+        app.config['SQLALCHEMY_ENGINE_OPTIONS'] = engine_options(app.config)
+
+
+# This will describe one engine's pool for the pool status endpoint
+def pool_status(engine):
+    pool = engine.pool
+    status = {'class': type(pool).__name__}
+    if isinstance(pool, QueuePool):
+        status.update(
+            size=pool.size(),
+            checked_out=pool.checkedout(),
+            checked_in=pool.checkedin(),
+            overflow=max(pool.overflow(), 0)
+        )
+    stats = getattr(pool, 'stats', None)
+    if stats is not None:
+        status.update(stats.to_dict())
+    return status
+
+
+def pool_report(app):
+    """Return the status of every pool this process holds."""
+    from ..models import db
+    report = {'pid': os.getpid(), 'pgbouncer': app.config['DB_PGBOUNCER'], 'sync': pool_status(db.engine)}
+    factory = app.extensions.get('async_db')
+    if factory is not None:
+        report['async'] = pool_status(factory.kw['bind'].sync_engine)
+    return report
@@ -0,0 +1,181 @@
+# app/services/query_log.py
+
+import hashlib
+import json
+import logging
+import random
+import re
+import threading
+import time
+from functools import lru_cache
+from flask import g, has_app_context, has_request_context, request
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+# This is the logger query events are written to, one JSON object per line
+logger = logging.getLogger('storedash.queries')
+
+# These turn a statement into its fingerprint: literals and bound parameters become ?,
+# IN lists of any length become one (?), and whitespace is collapsed
+_STRING = re.compile(r"'(?:[^']|'')*'")
+_NUMBER = re.compile(r'\b\d+(?:\.\d+)?\b')
+_PARAMETER = re.compile(r'%\(\w+\)s|%s|\$\d+|\?')
+_LIST = re.compile(r'\(\s*\?(?:\s*,\s*\?)+\s*\)')
+_SPACE = re.compile(r'\s+')
+
+
+@lru_cache(maxsize=2048)
+def fingerprint(statement):
+    """Return the normalized statement and a short hash identifying its shape."""
+    normalized = _STRING.sub('?', statement)
+    normalized = _PARAMETER.sub('?', normalized)
+    normalized = _NUMBER.sub('?', normalized)
+    normalized = _LIST.sub('(?)', normalized)
+    normalized = _SPACE.sub(' ', normalized).strip()
+    return normalized, hashlib.sha1(normalized.encode()).hexdigest()[:12]
+
+
+# This is the per-process tally of query fingerprints, for the hot query report
+# New fingerprints stop being added once max_entries are tracked
+class QueryStats:
+    def __init__(self, max_entries=500):
+        self._lock = threading.Lock()
+        self.max_entries = max_entries
+        self.entries = {}
+
+    def record(self, digest, statement, elapsed):
+        with self._lock:
+            entry = self.entries.get(digest)
+            if entry is None:
+                if len(self.entries) >= self.max_entries:
+                    return
+                entry = self.entries[digest] = {'fingerprint': digest, 'statement': statement, 'count': 0, 'total_ms': 0.0, 'max_ms': 0.0}
+            entry['count'] += 1
+            entry['total_ms'] += elapsed
+            entry['max_ms'] = max(entry['max_ms'], elapsed)
+
+    def top(self, limit=20):
+        with self._lock:
+            entries = sorted(self.entries.values(), key=lambda entry: entry['total_ms'], reverse=True)[:limit]
+            return [dict(entry, total_ms=round(entry['total_ms'], 3), max_ms=round(entry['max_ms'], 3)) for entry in entries]
+
+
+# This times every statement and adds it to the query tally of the current request,
+# which the query log and the request metrics both read; observers get every timing
+# The listeners sit on the Engine class, so the async engine is covered too
+class QueryTimer:
+    def __init__(self):
+        self.observers = []
+
+    def before_execute(self, conn, cursor, statement, parameters, context, executemany):
+        conn.info.setdefault('query_started', []).append(time.perf_counter())
+
+    def after_execute(self, conn, cursor, statement, parameters, context, executemany):
+        elapsed = (time.perf_counter() - conn.info['query_started'].pop()) * 1000
+        # The tally lives on g, so it only exists while the app context does
+        if has_app_context():
+            tally = g.setdefault('query_tally', {'queries': 0, 'db_ms': 0.0, 'slow_queries': 0})
+            tally['queries'] += 1
+            tally['db_ms'] += elapsed
+        for observer in self.observers:
+            observer(statement, elapsed, executemany)
+
+    def handle_error(self, exception_context):
+        # A failed statement never reaches after_cursor_execute
+        connection = exception_context.connection
+        if connection is not None and connection.info.get('query_started'):
+            connection.info['query_started'].pop()
+
+
+_timer = None
+
+
+def query_timer():
+    """Return the process-wide statement timer, installing its listeners on first use."""
+    global _timer
+    if _timer is None:
+        _timer = QueryTimer()
+        event.listen(Engine, 'before_cursor_execute', _timer.before_execute)
+        event.listen(Engine, 'after_cursor_execute', _timer.after_execute)
+        event.listen(Engine, 'handle_error', _timer.handle_error)
+    return _timer
+
+
+# This will get the query count and database time of the current request so far
+def query_tally():
+    if not has_app_context():
+        return None
+    return g.get('query_tally')
+
+
+# This is the query logging of one app: queries slower than slow_ms are always
+# logged, and the rest are logged at sample_rate
+class QueryLog:
+    def __init__(self, sample_rate=0.0, slow_ms=0, max_fingerprints=500):
+        self.sample_rate = sample_rate
+        self.slow_ms = slow_ms
+        self.stats = QueryStats(max_fingerprints)
+
+    def record(self, statement, elapsed, executemany=False):
+        normalized, digest = fingerprint(statement)
+        self.stats.record(digest, normalized, elapsed)
+
+        slow = bool(self.slow_ms) and elapsed >= self.slow_ms
+        if slow:
+            tally = query_tally()
+            if tally is not None:
+                tally['slow_queries'] += 1
+
+        if slow or (self.sample_rate and random.random() < self.sample_rate):
+            entry = {
+                'event': 'slow_query' if slow else 'query',
+                'fingerprint': digest,
+                'duration_ms': round(elapsed, 3),
+                'statement': normalized,
+                'executemany': executemany
+            }
+            if has_request_context():
+                entry['method'] = request.method
+                entry['path'] = request.path
+            logger.log(logging.WARNING if slow else logging.INFO, json.dumps(entry))
+
+    def log_request(self, response):
+        tally = query_tally()
+        if tally:
+            logger.info(json.dumps({
+                'event': 'request',
+                'method': request.method,
+                'path': request.path,
+                'status': response.status_code,
+                'queries': tally['queries'],
+                'db_ms': round(tally['db_ms'], 3),
+                'slow_queries': tally['slow_queries']
+            }))
+        return response
+
+
+def init_query_log(app):
+    """
+    Log sampled and slow queries, and per-request query counts, when QUERY_LOG is on.
+    """
+    if not app.config.get('QUERY_LOG'):
+        return None
+
+    query_log = QueryLog(
+        sample_rate=app.config['QUERY_LOG_SAMPLE_RATE'],
+        slow_ms=app.config['QUERY_LOG_SLOW_MS'],
+        max_fingerprints=app.config['QUERY_LOG_MAX_FINGERPRINTS']
+    )
+    query_timer().observers.append(query_log.record)
+    app.after_request(query_log.log_request)
+
+    # Query events are JSON lines of their own, whatever the app's log setup is
+    if not logger.handlers:
+        handler = logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        logger.addHandler(handler)
+        logger.setLevel(logging.INFO)
+        logger.propagate = False
+
+    app.extensions['query_log'] = query_log
+    return query_log
@@ -0,0 +1,71 @@
+# app/services/ratings.py
+
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.sql import text
+from ..models import db, ProductRating
+from ..models.db import add_prefix_for_prod
+
+# This is the table the review aggregates live in
+RATINGS_TABLE = add_prefix_for_prod('product_ratings')
+# This is the table the aggregates are computed from
+REVIEWS_TABLE = add_prefix_for_prod('reviews')
+
+
+# This will create the aggregate row for a product if it does not exist yet,
+# without failing when another request creates it first
+def _ensure_row(product_id):
+    row = {'product_id': product_id}
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(postgresql.insert(ProductRating.__table__).on_conflict_do_nothing(index_elements=['product_id']), row)
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(ProductRating.__table__).on_conflict_do_nothing(index_elements=['product_id']), row)
+    elif not db.session.get(ProductRating, product_id):
+        db.session.execute(ProductRating.__table__.insert(), row)
+
+
+def apply_rating_change(product_id, old=None, new=None):
+    """
+    Fold one review write into the product's aggregate row.
+    Pass new for a created review, old for a deleted one and both for an edit.
+    The counters are bumped with UPDATE ... SET col = col + delta in the caller's
+    transaction, so concurrent reviews never overwrite each other's counts.
+    """
+    if old == new:
+        return
+
+    table = ProductRating.__table__
+    values = {
+        'review_count': table.c.review_count + (new is not None) - (old is not None),
+        'rating_sum': table.c.rating_sum + (new or 0) - (old or 0)
+    }
+    if old is not None:
+        values[f'stars_{old}'] = table.c[f'stars_{old}'] - 1
+    if new is not None:
+        values[f'stars_{new}'] = table.c[f'stars_{new}'] + 1
+
+    _ensure_row(product_id)
+    db.session.execute(table.update().where(table.c.product_id == product_id).values(**values))
+    # The counters were written with Core, so a loaded summary is out of date
+    rating = db.session.identity_map.get(db.session.identity_key(ProductRating, product_id))
+    if rating is not None:
+        db.session.expire(rating)
+
+
+def rating_summary(product_id):
+    """Return the rating summary for a product, empty when it has no reviews yet."""
+    rating = db.session.get(ProductRating, product_id)
+    return rating.to_dict() if rating else ProductRating.empty_dict()
+
+
+def rebuild_ratings():
+    """Recompute every product's aggregate row from the reviews table in one pass."""
+    stars = ', '.join(f'SUM(CASE WHEN rating = {star} THEN 1 ELSE 0 END)' for star in range(1, 6))
+    db.session.execute(text(f'DELETE FROM {RATINGS_TABLE}'))
+    db.session.execute(text(
+        f'INSERT INTO {RATINGS_TABLE} '
+        f'(product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5) '
+        f'SELECT product_id, COUNT(*), SUM(rating), {stars} '
+        f'FROM {REVIEWS_TABLE} GROUP BY product_id'
+    ))
+    db.session.expire_all()
@@ -0,0 +1,172 @@
+# app/services/search.py
+
+import re
+from sqlalchemy import Float, Integer, desc, false, or_, text
+from ..models.db import db, add_prefix_for_prod
+from ..models import Product
+
+# This is the table that holds the full-text index for products
+# In Postgres it is a regular table with a tsvector column and a GIN index,
+# in SQLite it is an FTS5 virtual table whose rowid is the product id
+SEARCH_TABLE = add_prefix_for_prod('product_search')
+# This is the Postgres text search configuration used for stemming
+SEARCH_CONFIG = 'english'
+# This caps how many words of a search are used, so a huge ?q= cannot build a huge query
+MAX_TERMS = 8
+
+# Title matches rank above tag matches, which rank above description matches
+_PG_DOCUMENT = (
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(:title, '')), 'A') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(:tags, '')), 'B') || "
+    f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(:description, '')), 'C')"
+)
+
+
+# This will get the name of the database we are talking to
+def _dialect():
+    return db.session.get_bind().dialect.name
+
+
+# This will split a search string into lowercase words
+def search_terms(q):
+    return re.findall(r'\w+', (q or '').lower())[:MAX_TERMS]
+
+
+def index_products(products):
+    """Write (or rewrite) the search index rows for the given products in the current transaction."""
+    index_rows([{
+        'id': product.id,
+        'store_id': product.store_id,
+        'title': product.title,
+        'description': product.description,
+        'tags': ' '.join(tag.name for tag in product.tags),
+    } for product in products])
+
+
+def index_rows(rows):
+    """Write search index rows given as dictionaries (id, store_id, title, description, tags)."""
+    if not rows:
+        return
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, store_id, document) "
+            f"VALUES (:id, :store_id, {_PG_DOCUMENT}) "
+            "ON CONFLICT (product_id) DO UPDATE "
+            "SET store_id = EXCLUDED.store_id, document = EXCLUDED.document"
+        ), rows)
+    elif dialect == 'sqlite':
+        # FTS5 has no upsert, so the old row is removed first
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), rows)
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, store_id, title, description, tags) "
+            "VALUES (:id, :store_id, :title, :description, :tags)"
+        ), rows)
+
+
+# This will write the search index row for one product
+# Pass tag_names when they are already known to skip loading product.tags
+def index_product(product, tag_names=None):
+    if tag_names is None:
+        index_products([product])
+        return
+    index_rows([{
+        'id': product.id,
+        'store_id': product.store_id,
+        'title': product.title,
+        'description': product.description,
+        'tags': ' '.join(tag_names),
+    }])
+
+
+def remove_products(product_ids):
+    """Remove the search index rows for the given product ids in the current transaction."""
+    rows = [{'id': product_id} for product_id in product_ids]
+    if not rows:
+        return
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE product_id = :id"), rows)
+    elif dialect == 'sqlite':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE} WHERE rowid = :id"), rows)
+
+
+# This will remove the search index row for one product
+def remove_product(product_id):
+    remove_products([product_id])
+
+
+def rebuild_index():
+    """Rebuild the whole search index from the products and tags tables with one INSERT ... SELECT."""
+    products = add_prefix_for_prod('products')
+    product_tags = add_prefix_for_prod('product_tags')
+    tags = add_prefix_for_prod('tags')
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (product_id, store_id, document) "
+            "SELECT p.id, p.store_id, "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p.title, '')), 'A') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(string_agg(t.name, ' '), '')), 'B') || "
+            f"setweight(to_tsvector('{SEARCH_CONFIG}', coalesce(p.description, '')), 'C') "
+            f"FROM {products} p "
+            f"LEFT JOIN {product_tags} pt ON pt.product_id = p.id "
+            f"LEFT JOIN {tags} t ON t.id = pt.tag_id "
+            "GROUP BY p.id"
+        ))
+    elif dialect == 'sqlite':
+        db.session.execute(text(f"DELETE FROM {SEARCH_TABLE}"))
+        db.session.execute(text(
+            f"INSERT INTO {SEARCH_TABLE} (rowid, store_id, title, description, tags) "
+            "SELECT p.id, p.store_id, p.title, p.description, coalesce(group_concat(t.name, ' '), '') "
+            f"FROM {products} p "
+            f"LEFT JOIN {product_tags} pt ON pt.product_id = p.id "
+            f"LEFT JOIN {tags} t ON t.id = pt.tag_id "
+            "GROUP BY p.id"
+        ))
+
+
+def search_products(query, store_id, q):
+    """
+    Narrow a product query to the ranked full-text matches for q in one store.
+    Every word is prefix matched against the title, tags and description, and the
+    results come back best match first. Returns the query and whether it is ranked.
+    A blank q leaves the query alone; one with no searchable words matches nothing.
+    """
+    if not (q or '').strip():
+        return query, False
+    terms = search_terms(q)
+    if not terms:
+        return query.filter(false()), False
+
+    dialect = _dialect()
+    if dialect == 'postgresql':
+        tsquery = ' & '.join(f'{term}:*' for term in terms)
+        matches = text(
+            f"SELECT product_id, ts_rank(document, to_tsquery('{SEARCH_CONFIG}', :tsquery)) AS rank "
+            f"FROM {SEARCH_TABLE} "
+            f"WHERE store_id = :store_id AND document @@ to_tsquery('{SEARCH_CONFIG}', :tsquery)"
+        ).bindparams(tsquery=tsquery, store_id=store_id)
+    elif dialect == 'sqlite':
+        match = ' '.join(f'"{term}"*' for term in terms)
+        # bm25 is lower for better matches; the weights follow the column order
+        matches = text(
+            "SELECT rowid AS product_id, "
+            f"-bm25({SEARCH_TABLE}, 0.0, 10.0, 1.0, 5.0) AS rank "
+            f"FROM {SEARCH_TABLE} "
+            f"WHERE {SEARCH_TABLE} MATCH :match AND store_id = :store_id"
+        ).bindparams(match=match, store_id=store_id)
+    else:
+        # Other databases fall back to an unranked substring scan
+        for term in terms:
+            pattern = f'%{term}%'
+            query = query.filter(or_(Product.title.ilike(pattern), Product.description.ilike(pattern)))
+        return query, False
+
+    matches = matches.columns(product_id=Integer, rank=Float).subquery()
+    query = query.join(matches, matches.c.product_id == Product.id).order_by(desc(matches.c.rank))
+    return query, True
@@ -0,0 +1,39 @@
+# app/services/serializers.py
+
+from sqlalchemy.orm import selectinload
+from ..models import Order, Product
+from .metrics import timed_serialization
+
+# These are the loader options for the product response graph
+# A product is serialized together with its tags and rating summary, so they are
+# loaded for every product in batched SELECT ... WHERE product_id IN (...) queries
+def product_graph():
+    return (selectinload(Product.tags), selectinload(Product.rating))
+
+# These are the loader options for the order response graph
+# An order is serialized from its lines alone (they hold the product snapshots),
+# so a page of orders costs one more batched SELECT ... WHERE order_id IN (...)
+def order_graph():
+    return (selectinload(Order.lines),)
+
+# This will add the product response graph to a product query
+def with_product_graph(query):
+    return query.options(*product_graph())
+
+# This will add the order response graph to an order query
+def with_order_graph(query):
+    return query.options(*order_graph())
+
+# This will serialize a product query with its tags eager loaded
+def serialize_products(query):
+    """Run a product query with its response graph eager loaded and return a list of product dictionaries."""
+    products = with_product_graph(query).all()
+    with timed_serialization():
+        return [product.to_dict() for product in products]
+
+# This will serialize an order query with its lines eager loaded
+def serialize_orders(query):
+    """Run an order query with its response graph eager loaded and return a list of order dictionaries."""
+    orders = with_order_graph(query).all()
+    with timed_serialization():
+        return [order.to_dict() for order in orders]
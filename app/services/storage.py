@@ -0,0 +1,171 @@
+# app/services/storage.py
+
+import os
+import tempfile
+from flask import abort, current_app, redirect, send_from_directory
+from .uploads import IMMUTABLE_MAX_AGE, content_etag
+
+
+# This is the local-filesystem storage backend
+# Files live under UPLOAD_FOLDER and are served by the uploaded_file route,
+# so every replica needs the same disk (a shared volume) to see every upload
+class LocalStorage:
+    def __init__(self, root):
+        self.root = root
+
+    def exists(self, key):
+        return os.path.exists(os.path.join(self.root, key))
+
+    def put(self, key, data, content_type=None):
+        # This writes to a temporary name and renames it into place,
+        # so a reader never sees a half-written file
+        target = os.path.join(self.root, key)
+        directory = os.path.dirname(target)
+        os.makedirs(directory, exist_ok=True)
+        fd, temp = tempfile.mkstemp(dir=directory, prefix='.upload-')
+        try:
+            with os.fdopen(fd, 'wb') as out:
+                out.write(data)
+            os.chmod(temp, 0o644)
+            os.replace(temp, target)
+        except BaseException:
+            os.unlink(temp)
+            raise
+
+    def get(self, key):
+        with open(os.path.join(self.root, key), 'rb') as source:
+            return source.read()
+
+    def delete(self, key):
+        try:
+            os.unlink(os.path.join(self.root, key))
+        except FileNotFoundError:
+            pass
+
+    def url(self, key):
+        return f'/uploads/{key}'
+
+    # Local files cannot be written to directly by a browser
+    def presign_upload(self, key, content_type, max_bytes, expires):
+        return None
+
+    def serve(self, key):
+        # A content-addressed file never changes, so its hash is a strong ETag
+        # and clients may cache it for a year without revalidating
+        etag = content_etag(key)
+        if etag:
+            response = send_from_directory(self.root, key, etag=etag, max_age=IMMUTABLE_MAX_AGE)
+            response.cache_control.public = True
+            response.cache_control.immutable = True
+            return response
+        # Older timestamp-named uploads keep the default revalidated caching
+        return send_from_directory(self.root, key)
+
+
+# This is the S3-compatible storage backend (AWS S3, MinIO, R2, ...)
+# Every replica reads and writes the same bucket, browsers upload to it with
+# presigned POSTs and reads are redirected to it, so file bytes skip Flask
+class S3Storage:
+    def __init__(self, client, bucket, prefix='', public_url=None, presign_expiry=3600):
+        self.client = client
+        self.bucket = bucket
+        self.prefix = prefix
+        self.public_url = public_url.rstrip('/') if public_url else None
+        self.presign_expiry = presign_expiry
+
+    @classmethod
+    def from_config(cls, config):
+        # boto3 is only needed when this backend is configured
+        import boto3
+        client = boto3.client(
+            's3',
+            endpoint_url=config.get('STORAGE_S3_ENDPOINT_URL'),
+            region_name=config.get('STORAGE_S3_REGION'),
+            aws_access_key_id=config.get('STORAGE_S3_ACCESS_KEY'),
+            aws_secret_access_key=config.get('STORAGE_S3_SECRET_KEY')
+        )
+        return cls(client, config['STORAGE_S3_BUCKET'], prefix=config.get('STORAGE_S3_PREFIX', ''),
+                   public_url=config.get('STORAGE_PUBLIC_URL'),
+                   presign_expiry=config.get('STORAGE_PRESIGN_EXPIRY', 3600))
+
+    # This will create the bucket if it does not exist yet, e.g. on a fresh local MinIO
+    def create_bucket(self):
+        from botocore.exceptions import ClientError
+        region = self.client.meta.region_name
+        options = {'CreateBucketConfiguration': {'LocationConstraint': region}} if region and region != 'us-east-1' else {}
+        try:
+            self.client.create_bucket(Bucket=self.bucket, **options)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') not in ('BucketAlreadyOwnedByYou', 'BucketAlreadyExists'):
+                raise
+
+    def exists(self, key):
+        from botocore.exceptions import ClientError
+        try:
+            self.client.head_object(Bucket=self.bucket, Key=self.prefix + key)
+        except ClientError as error:
+            if error.response.get('Error', {}).get('Code') in ('404', 'NoSuchKey', 'NotFound'):
+                return False
+            raise
+        return True
+
+    def put(self, key, data, content_type=None):
+        extra = {'ContentType': content_type} if content_type else {}
+        if content_etag(key):
+            extra['CacheControl'] = f'public, max-age={IMMUTABLE_MAX_AGE}, immutable'
+        self.client.put_object(Bucket=self.bucket, Key=self.prefix + key, Body=data, **extra)
+
+    def get(self, key):
+        return self.client.get_object(Bucket=self.bucket, Key=self.prefix + key)['Body'].read()
+
+    def delete(self, key):
+        self.client.delete_object(Bucket=self.bucket, Key=self.prefix + key)
+
+    def url(self, key):
+        # With a public bucket or CDN in front, clients fetch files without touching Flask at all
+        if self.public_url:
+            return f'{self.public_url}/{self.prefix}{key}'
+        return f'/uploads/{key}'
+
+    def presign_upload(self, key, content_type, max_bytes, expires):
+        return self.client.generate_presigned_post(
+            Bucket=self.bucket,
+            Key=self.prefix + key,
+            Fields={'Content-Type': content_type},
+            Conditions=[{'Content-Type': content_type}, ['content-length-range', 1, max_bytes]],
+            ExpiresIn=expires
+        )
+
+    def serve(self, key):
+        # Originals waiting to be processed are never handed out
+        if key.startswith('incoming/'):
+            abort(404)
+        url = self.client.generate_presigned_url(
+            'get_object', Params={'Bucket': self.bucket, 'Key': self.prefix + key}, ExpiresIn=self.presign_expiry
+        )
+        response = redirect(url)
+        # The redirect for a content-addressed file can be reused while its signature is valid
+        if content_etag(key):
+            response.cache_control.private = True
+            response.cache_control.max_age = self.presign_expiry // 2
+        return response
+
+
+def init_storage(app):
+    """Create the storage backend named by STORAGE_BACKEND and attach it to the app."""
+    backend = app.config.get('STORAGE_BACKEND', 'local')
+
+    if backend == 's3':
+        storage = S3Storage.from_config(app.config)
+    elif backend == 'local':
+        storage = LocalStorage(app.config['UPLOAD_FOLDER'])
+    else:
+        raise ValueError(f'Unknown STORAGE_BACKEND {backend!r}.')
+
+    app.extensions['storage'] = storage
+    return storage
+
+
+# This will get the storage backend for the current app
+def get_storage():
+    return current_app.extensions['storage']
@@ -0,0 +1,119 @@
+# app/services/tags.py
+
+from sqlalchemy import event
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+from ..models import db, Tag
+from ..models.product import product_tags
+from .cache import MemoryCache
+
+# This is the longest tag name the tags table accepts
+MAX_TAG_LENGTH = 50
+
+# This is the process-local tag name -> id cache
+# Tags are never renamed, so an id stays right for as long as the tag exists;
+# the TTL only bounds how long a tag deleted by `flask seed undo` can linger
+_tag_ids = MemoryCache(max_entries=10000, default_timeout=3600)
+
+
+# Ids of tags created in a transaction are only cached once it commits,
+# so a rollback can never leave an id in the cache that does not exist
+@event.listens_for(Session, 'after_commit')
+def _cache_committed_tags(session):
+    for name, tag_id in session.info.pop('new_tag_ids', {}).items():
+        _tag_ids.set(name, tag_id)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _forget_rolled_back_tags(session, previous_transaction):
+    session.info.pop('new_tag_ids', None)
+
+
+# This will split a comma-separated tags string into clean tag names, keeping order
+def parse_tags(tags):
+    if isinstance(tags, (list, tuple)):
+        names = [str(tag).strip() for tag in tags]
+    else:
+        names = [tag.strip() for tag in (tags or '').split(',')]
+    return list(dict.fromkeys(name for name in names if name))
+
+
+# This will build an insert that skips names another request created first
+def _insert_missing(names):
+    rows = [{'name': name} for name in names]
+    dialect = db.session.get_bind().dialect.name
+    if dialect == 'postgresql':
+        db.session.execute(postgresql.insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name']), rows)
+    elif dialect == 'sqlite':
+        db.session.execute(sqlite.insert(Tag.__table__).on_conflict_do_nothing(index_elements=['name']), rows)
+    else:
+        db.session.execute(Tag.__table__.insert(), rows)
+
+
+def resolve_tags(names):
+    """
+    Return a {name: id} map for the given tag names, creating the missing ones.
+    Names in the process cache cost nothing; the rest cost one SELECT ... IN,
+    plus one INSERT and one SELECT when some are new.
+    """
+    names = set(names)
+    if not names:
+        return {}
+
+    ids = {}
+    for name in names:
+        tag_id = _tag_ids.get(name)
+        if tag_id is not None:
+            ids[name] = tag_id
+    unknown = names - ids.keys()
+    if not unknown:
+        return ids
+
+    found = dict(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(unknown)))
+    for name, tag_id in found.items():
+        _tag_ids.set(name, tag_id)
+    ids.update(found)
+
+    missing = unknown - found.keys()
+    if missing:
+        _insert_missing(sorted(missing))
+        created = dict(db.session.query(Tag.name, Tag.id).filter(Tag.name.in_(missing)))
+        db.session.info.setdefault('new_tag_ids', {}).update(created)
+        ids.update(created)
+    return ids
+
+
+def set_product_tags(product, names, current_ids=None):
+    """
+    Make a product's tags exactly names, writing only the difference to product_tags.
+    Pass current_ids=() for a product that has no tags yet to skip reading them.
+    Returns the tag names that were set.
+    """
+    names = parse_tags(names)
+    wanted = set(resolve_tags(names).values())
+
+    if current_ids is None:
+        current_ids = db.session.query(product_tags.c.tag_id).filter(product_tags.c.product_id == product.id)
+        current_ids = {row.tag_id for row in current_ids}
+    current_ids = set(current_ids)
+
+    removed = current_ids - wanted
+    if removed:
+        db.session.execute(product_tags.delete().where(
+            product_tags.c.product_id == product.id,
+            product_tags.c.tag_id.in_(removed)
+        ))
+    added = wanted - current_ids
+    if added:
+        db.session.execute(product_tags.insert(), [
+            {'product_id': product.id, 'tag_id': tag_id} for tag_id in sorted(added)
+        ])
+
+    # The links were written with Core, so the loaded collection is out of date
+    db.session.expire(product, ['tags'])
+    return names
+
+
+# This will forget every cached tag id (after tags are deleted in bulk)
+def clear_tag_cache():
+    _tag_ids.clear()
@@ -0,0 +1,209 @@
+# app/services/uploads.py
+
+import fcntl
+import hashlib
+import json
+import os
+import re
+import tempfile
+import time
+import uuid
+from flask import Request, current_app
+
+# This is how long browsers and CDNs may keep a content-addressed file (one year)
+IMMUTABLE_MAX_AGE = 365 * 24 * 60 * 60
+# This matches a content-addressed upload path: ab/cd/<sha256>.<ext>
+CONTENT_PATH = re.compile(r'^([0-9a-f]{2})/([0-9a-f]{2})/(\1\2[0-9a-f]{60})\.[a-z0-9]+$')
+
+
+# This will build the fan-out path for some bytes, so no directory grows past 65536 entries
+def content_path(data, ext):
+    digest = hashlib.sha256(data).hexdigest()
+    return f'{digest[:2]}/{digest[2:4]}/{digest}.{ext}'
+
+
+def store_content(storage, data, ext, content_type=None):
+    """
+    Write data to the storage backend at its content address and return the key.
+    A file that is already there is the same bytes, so it is reused as is;
+    concurrent writers of the same key write identical bytes, so they cannot clash.
+    """
+    path = content_path(data, ext)
+    if not storage.exists(path):
+        storage.put(path, data, content_type)
+    return path
+
+
+# This will return the content hash of a content-addressed path, or None for legacy names
+def content_etag(path):
+    match = CONTENT_PATH.match(path)
+    return match.group(3) if match else None
+
+
+# Resumable uploads
+# A client opens an upload with its total size, sends the bytes in chunks that
+# each say which offset they start at, and finishes it once every byte arrived.
+# Chunks are streamed to a partial file in bounded reads, so neither a large
+# image nor a slow client ever holds more than READ_SIZE bytes in memory.
+
+# This is how much of a request body is read at a time
+READ_SIZE = 64 * 1024
+# This matches an upload id (uuid4 hex)
+UPLOAD_ID = re.compile(r'^[0-9a-f]{32}$')
+
+
+class UploadError(ValueError):
+    """Raised when a resumable upload request cannot be applied; status is the HTTP code."""
+
+    def __init__(self, message, status=400):
+        super().__init__(message)
+        self.status = status
+
+
+def _partial_paths(folder, upload_id):
+    return os.path.join(folder, f'{upload_id}.part'), os.path.join(folder, f'{upload_id}.json')
+
+
+def start_upload(folder, user_id, filename, size, max_bytes):
+    """Open a resumable upload of size bytes and return its state."""
+    if not isinstance(size, int) or isinstance(size, bool) or size <= 0:
+        raise UploadError('size must be a positive number of bytes.')
+    if size > max_bytes:
+        raise UploadError(f'Uploads are limited to {max_bytes} bytes.', 413)
+
+    os.makedirs(folder, exist_ok=True)
+    upload_id = uuid.uuid4().hex
+    part, meta = _partial_paths(folder, upload_id)
+    open(part, 'xb').close()
+    state = {'upload_id': upload_id, 'user_id': user_id, 'filename': filename, 'size': size}
+    fd, temp = tempfile.mkstemp(dir=folder, prefix='.upload-')
+    with os.fdopen(fd, 'w') as out:
+        json.dump(state, out)
+    os.replace(temp, meta)
+    return dict(state, offset=0)
+
+
+def load_upload(folder, upload_id, user_id):
+    """Return the state of an open upload, which only its owner can see."""
+    if not UPLOAD_ID.match(upload_id):
+        raise UploadError('Upload not found.', 404)
+    part, meta = _partial_paths(folder, upload_id)
+    try:
+        with open(meta) as source:
+            state = json.load(source)
+        state['offset'] = os.path.getsize(part)
+    except FileNotFoundError:
+        raise UploadError('Upload not found.', 404)
+    if state['user_id'] != user_id:
+        raise UploadError('Upload not found.', 404)
+    return state
+
+
+def append_chunk(folder, state, offset, stream, length, max_chunk):
+    """
+    Append one chunk read from stream and return the new offset.
+    The chunk must start where the partial file ends, so a retried chunk is
+    rejected instead of written twice. A client that disconnects mid-chunk
+    keeps whatever arrived and resumes from the offset GET reports.
+    """
+    if length is None:
+        raise UploadError('Content-Length is required.', 411)
+    if length > max_chunk:
+        raise UploadError(f'Chunks are limited to {max_chunk} bytes.', 413)
+    if offset + length > state['size']:
+        raise UploadError('Chunk goes past the declared upload size.', 413)
+
+    part, _ = _partial_paths(folder, state['upload_id'])
+    try:
+        out = open(part, 'ab')
+    except FileNotFoundError:
+        raise UploadError('Upload not found.', 404)
+    with out:
+        # Only one request may write an upload at a time
+        try:
+            fcntl.flock(out, fcntl.LOCK_EX | fcntl.LOCK_NB)
+        except BlockingIOError:
+            raise UploadError('Another chunk of this upload is being written.', 409)
+        current = out.seek(0, os.SEEK_END)
+        if offset != current:
+            raise UploadError(f'Expected the chunk at offset {current}.', 409)
+
+        remaining = length
+        while remaining:
+            data = stream.read(min(READ_SIZE, remaining))
+            if not data:
+                break
+            out.write(data)
+            remaining -= len(data)
+        return out.tell()
+
+
+def finish_upload(folder, state):
+    """
+    Claim a complete upload and return its bytes, removing the partial files.
+    The partial file is renamed before it is read, so when two requests race to
+    finish the same upload exactly one of them gets the bytes.
+    """
+    if state['offset'] != state['size']:
+        raise UploadError(f"Upload is incomplete ({state['offset']} of {state['size']} bytes).", 409)
+
+    part, meta = _partial_paths(folder, state['upload_id'])
+    claimed = f'{part}.{uuid.uuid4().hex}'
+    try:
+        os.rename(part, claimed)
+    except FileNotFoundError:
+        raise UploadError('Upload not found.', 404)
+    try:
+        with open(claimed, 'rb') as source:
+            return source.read()
+    finally:
+        os.unlink(claimed)
+        _unlink_quietly(meta)
+
+
+def abort_upload(folder, state):
+    """Throw away an open upload."""
+    for path in _partial_paths(folder, state['upload_id']):
+        _unlink_quietly(path)
+
+
+def sweep_uploads(folder, max_age):
+    """Remove partial files nobody touched for max_age seconds and return how many went."""
+    cutoff = time.time() - max_age
+    removed = 0
+    try:
+        entries = list(os.scandir(folder))
+    except FileNotFoundError:
+        return 0
+    for entry in entries:
+        try:
+            if entry.is_file() and entry.stat().st_mtime < cutoff:
+                os.unlink(entry.path)
+                removed += 1
+        except FileNotFoundError:
+            pass
+    return removed
+
+
+def _unlink_quietly(path):
+    try:
+        os.unlink(path)
+    except FileNotFoundError:
+        pass
+
+
+# This is the app's request class: bodies are limited to MAX_CONTENT_LENGTH,
+# or on views marked with @body_limit to the config key they name
+class LimitedRequest(Request):
+    @property
+    def max_content_length(self):
+        view = current_app.view_functions.get(self.endpoint) if self.endpoint else None
+        return current_app.config[getattr(view, 'body_limit', 'MAX_CONTENT_LENGTH')]
+
+
+def body_limit(config_key):
+    """Give a view a request body limit of its own, read from config_key; put it right below the route decorator."""
+    def mark(view):
+        view.body_limit = config_key
+        return view
+    return mark
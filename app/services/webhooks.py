@@ -0,0 +1,55 @@
+# app/services/webhooks.py
+
+import hashlib
+import hmac
+import json
+import urllib.request
+import uuid
+from datetime import datetime
+from flask import current_app
+from .jobs import enqueue, job_handler
+
+
+def notify_order(event, order):
+    """
+    Queue a webhook notification for an order event ('order.placed',
+    'order.status_changed', 'order.deleted') with the order as it is now
+    (an Order or its to_dict()), when ORDER_WEBHOOK_URL is set. It is sent by `flask jobs work` after the
+    caller commits, so the request never waits on the receiving server.
+    """
+    if not current_app.config.get('ORDER_WEBHOOK_URL'):
+        return None
+    return enqueue('order.webhook', {
+        'event': event,
+        'id': uuid.uuid4().hex,
+        'occurred_at': datetime.utcnow().isoformat(),
+        'order': order if isinstance(order, dict) else order.to_dict()
+    })
+
+
+# This will sign a webhook body, so receivers can check it came from us
+def webhook_signature(body, secret):
+    return 'sha256=' + hmac.new(secret.encode(), body, hashlib.sha256).hexdigest()
+
+
+# This is the job that POSTs one order event; any error or non-2xx answer raises,
+# so the job is retried with backoff. The event id is sent as X-StoreDash-Delivery
+# and stays the same across retries, so receivers can drop repeats
+@job_handler('order.webhook')
+def deliver_order_webhook(event, id, occurred_at, order):
+    url = current_app.config.get('ORDER_WEBHOOK_URL')
+    if not url:
+        return
+    body = json.dumps({'event': event, 'id': id, 'occurred_at': occurred_at, 'order': order}).encode()
+    headers = {
+        'Content-Type': 'application/json',
+        'User-Agent': 'StoreDash-Webhooks',
+        'X-StoreDash-Event': event,
+        'X-StoreDash-Delivery': id
+    }
+    secret = current_app.config.get('ORDER_WEBHOOK_SECRET')
+    if secret:
+        headers['X-StoreDash-Signature'] = webhook_signature(body, secret)
+    request = urllib.request.Request(url, data=body, headers=headers, method='POST')
+    with urllib.request.urlopen(request, timeout=current_app.config['ORDER_WEBHOOK_TIMEOUT']):
+        pass
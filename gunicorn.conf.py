@@ -0,0 +1,168 @@
+# gunicorn.conf.py
+#
+# Gunicorn reads this file from the working directory, so `gunicorn` with no
+# arguments serves the app with these settings. Every value can be overridden
+# with an environment variable; run `python gunicorn.conf.py` to print what
+# would be chosen on this machine.
+
+import math
+import os
+import random
+import shutil
+
+
+# This will read an integer setting from the environment
+def env_int(name, default):
+    value = os.environ.get(name)
+    return int(value) if value not in (None, '') else default
+
+
+# This will read a yes/no setting from the environment
+def env_bool(name, default):
+    value = os.environ.get(name)
+    if value in (None, ''):
+        return default
+    return value.lower() in ('1', 'true', 'yes', 'on')
+
+
+# This will count the CPUs this container may actually use
+# os.cpu_count() reports the host's cores, so the affinity mask and the
+# cgroup CPU quota (docker --cpus, Kubernetes limits) are applied on top
+def available_cpus():
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cpus = os.cpu_count() or 1
+
+    quota = None
+    try:
+        # cgroup v2: "<quota> <period>" or "max <period>"
+        with open('/sys/fs/cgroup/cpu.max') as source:
+            limit, period = source.read().split()
+        if limit != 'max':
+            quota = int(limit) / int(period)
+    except (OSError, ValueError):
+        try:
+            # cgroup v1: quota is -1 when unlimited
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_quota_us') as source:
+                limit = int(source.read())
+            with open('/sys/fs/cgroup/cpu/cpu.cfs_period_us') as source:
+                period = int(source.read())
+            if limit > 0:
+                quota = limit / period
+        except (OSError, ValueError):
+            pass
+
+    if quota:
+        cpus = min(cpus, max(1, math.ceil(quota)))
+    return cpus
+
+
+CPUS = available_cpus()
+
+# This is the serving mode: 'wsgi' (threaded Flask workers) or 'asgi' (uvicorn workers, see app/asgi.py)
+SERVER_MODE = os.environ.get('SERVER_MODE', 'wsgi').lower()
+
+if SERVER_MODE == 'asgi':
+    wsgi_app = 'app.asgi:application'
+    worker_class = 'uvicorn.workers.UvicornWorker'
+    # An event loop keeps one core busy on its own, so one worker per core
+    workers = env_int('WEB_CONCURRENCY', CPUS)
+    threads = 1
+else:
+    wsgi_app = 'app:app'
+    worker_class = os.environ.get('GUNICORN_WORKER_CLASS', 'gthread')
+    # Requests mostly wait on the database, so each core gets two workers plus one spare,
+    # and each worker serves a few requests at once on its threads
+    workers = env_int('WEB_CONCURRENCY', CPUS * 2 + 1)
+    threads = env_int('GUNICORN_THREADS', 4 if worker_class == 'gthread' else 1)
+
+# This caps the worker count on large hosts, since each worker holds its own database pool
+workers = max(1, min(workers, env_int('GUNICORN_MAX_WORKERS', 16)))
+
+bind = os.environ.get('GUNICORN_BIND', f"0.0.0.0:{os.environ.get('PORT', '8000')}")
+
+# Loading the app once in the master lets workers share its memory pages and
+# makes a broken deploy fail before any worker starts
+preload_app = env_bool('GUNICORN_PRELOAD', True)
+
+# Each worker is replaced after about this many requests, which bounds slow memory growth;
+# the jitter keeps the workers from all restarting at the same moment
+max_requests = env_int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env_int('GUNICORN_MAX_REQUESTS_JITTER', max_requests // 10)
+
+timeout = env_int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env_int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env_int('GUNICORN_KEEPALIVE', 5)
+
+# Worker heartbeats go to tmpfs instead of the container's overlay filesystem
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+
+accesslog = os.environ.get('GUNICORN_ACCESS_LOG', '-')
+errorlog = '-'
+loglevel = os.environ.get('GUNICORN_LOG_LEVEL', 'info')
+# Forwarded headers are trusted from the platform router in front of the container
+forwarded_allow_ips = os.environ.get('FORWARDED_ALLOW_IPS', '*')
+
+# Workers write their request metrics here, so /metrics can add up every worker's samples
+# (app/services/metrics.py); it has to be set before the app is loaded
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR', '/tmp/storedash-metrics')
+
+
+# This is the summary of the chosen settings, logged on startup
+def settings():
+    return {
+        'mode': SERVER_MODE,
+        'cpus': CPUS,
+        'worker_class': worker_class,
+        'workers': workers,
+        'threads': threads,
+        'bind': bind,
+        'preload_app': preload_app,
+        'max_requests': max_requests,
+        'max_requests_jitter': max_requests_jitter,
+        'timeout': timeout,
+    }
+
+
+def on_starting(server):
+    # Samples left over from an earlier run would be added to this one's
+    metrics_dir = os.environ['PROMETHEUS_MULTIPROC_DIR']
+    shutil.rmtree(metrics_dir, ignore_errors=True)
+    os.makedirs(metrics_dir, exist_ok=True)
+
+
+def when_ready(server):
+    server.log.info('StoreDash gunicorn settings: %s', settings())
+    # Every worker has its own memory cache, so invalidations do not reach the others
+    cache_backend = os.environ.get('CACHE_BACKEND', 'redis' if os.environ.get('CACHE_REDIS_URL') else 'memory')
+    if workers > 1 and cache_backend == 'memory':
+        server.log.warning('CACHE_BACKEND is memory with %s workers: cached storefront pages may be stale '
+                           'for up to CACHE_DEFAULT_TIMEOUT seconds after a change; set CACHE_REDIS_URL to share one cache', workers)
+
+
+def post_fork(server, worker):
+    # With preload_app the master may have opened database connections while
+    # importing the app; sockets must never be shared across processes, so the
+    # worker drops its copy of the pool without closing the master's connections
+    if not preload_app:
+        return
+    from app import app
+    from app.models import db
+    with app.app_context():
+        db.engine.dispose(close=False)
+    # The async engine is created per worker on startup
+    app.extensions.pop('async_db', None)
+    # Each worker gets its own random state instead of the master's
+    random.seed()
+
+
+def child_exit(server, worker):
+    # A replaced worker's counts are kept, but its live gauges are dropped
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+if __name__ == '__main__':
+    for name, value in settings().items():
+        print(f'{name} = {value}')
@@ -49,6 +49,15 @@ target_db = current_app.extensions['migrate'].db
 # ... etc.
 
 
+# These tables are not in the models: the product search index and its FTS5 shadow
+# tables are created with raw SQL (c41e803900ce), and sqlite_stat1 by SQLite's ANALYZE,
+# so autogenerate must not emit drops for them
+def include_object(object, name, type_, reflected, compare_to):
+    if type_ == 'table' and reflected and compare_to is None:
+        return not name.startswith(('product_search', 'sqlite_stat'))
+    return True
+
+
 def get_metadata():
     if hasattr(target_db, 'metadatas'):
         return target_db.metadatas[None]
@@ -76,6 +85,7 @@ def run_migrations_offline():
         url=url,
         target_metadata=get_metadata(),
         literal_binds=True,
+        include_object=include_object,
         version_table_schema=_schema,
         include_schemas=True if _schema else False,
     )
@@ -105,6 +115,8 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
@@ -0,0 +1,38 @@
+"""Lookup indexes
+
+Revision ID: 0102dad28893
+Revises: c41e803900ce
+Create Date: 2026-10-18 20:41:37.102554
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '0102dad28893'
+down_revision = 'c41e803900ce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_index('ix_stores_user_id', 'stores', ['user_id'], unique=False)
+    op.create_index('ix_stores_name', 'stores', ['name'], unique=True)
+    op.create_index('ix_orders_store_id_id', 'orders', ['store_id', 'id'], unique=False)
+    op.create_index('ix_orders_store_id_created_at', 'orders', ['store_id', 'created_at'], unique=False)
+    op.create_index('ix_products_store_id_id', 'products', ['store_id', 'id'], unique=False)
+    op.create_index('ix_reviews_product_id_id', 'reviews', ['product_id', 'id'], unique=False)
+    op.create_index('ix_order_products_product_id', 'order_products', ['product_id'], unique=False)
+    op.create_index('ix_product_tags_tag_id', 'product_tags', ['tag_id'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_product_tags_tag_id', table_name='product_tags')
+    op.drop_index('ix_order_products_product_id', table_name='order_products')
+    op.drop_index('ix_reviews_product_id_id', table_name='reviews')
+    op.drop_index('ix_products_store_id_id', table_name='products')
+    op.drop_index('ix_orders_store_id_created_at', table_name='orders')
+    op.drop_index('ix_orders_store_id_id', table_name='orders')
+    op.drop_index('ix_stores_name', table_name='stores')
+    op.drop_index('ix_stores_user_id', table_name='stores')
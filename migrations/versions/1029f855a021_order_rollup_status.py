@@ -0,0 +1,27 @@
+"""Order rollup status
+
+Revision ID: 1029f855a021
+Revises: ea793ec6fe48
+Create Date: 2026-10-18 20:46:58.934067
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '1029f855a021'
+down_revision = 'ea793ec6fe48'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('orders', sa.Column('rollup_status', sa.String(length=32), nullable=True))
+    # Existing orders were counted in the rollups when they were written, under their current status
+    op.execute('UPDATE orders SET rollup_status = status')
+
+
+def downgrade():
+    with op.batch_alter_table('orders', schema=None) as batch_op:
+        batch_op.drop_column('rollup_status')
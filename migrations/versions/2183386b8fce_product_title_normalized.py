@@ -0,0 +1,40 @@
+"""Product title_normalized
+
+Revision ID: 2183386b8fce
+Revises: 0102dad28893
+Create Date: 2026-10-18 21:12:48.663104
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2183386b8fce'
+down_revision = '0102dad28893'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.add_column('products', sa.Column('title_normalized', sa.String(length=255), nullable=True))
+
+    # Backfill with the same normalization the app uses (strip + lower)
+    bind = op.get_bind()
+    products = sa.table('products', sa.column('id', sa.Integer), sa.column('title', sa.String),
+                        sa.column('title_normalized', sa.String))
+    rows = bind.execute(sa.select(products.c.id, products.c.title)).all()
+    if rows:
+        bind.execute(
+            products.update().where(products.c.id == sa.bindparam('_id'))
+            .values(title_normalized=sa.bindparam('_title_normalized')),
+            [{'_id': row.id, '_title_normalized': (row.title or '').strip().lower()} for row in rows]
+        )
+
+    op.create_index('ix_products_store_id_title_normalized', 'products', ['store_id', 'title_normalized'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_products_store_id_title_normalized', table_name='products')
+    with op.batch_alter_table('products') as batch_op:
+        batch_op.drop_column('title_normalized')
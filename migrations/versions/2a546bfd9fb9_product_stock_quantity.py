@@ -0,0 +1,26 @@
+"""Product stock quantity
+
+Revision ID: 2a546bfd9fb9
+Revises: 3dcbaa17f762
+Create Date: 2026-10-18 20:24:55.131560
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2a546bfd9fb9'
+down_revision = '3dcbaa17f762'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Existing products keep an untracked (NULL) stock count, so their in_stock flag is unchanged
+    op.add_column('products', sa.Column('stock_quantity', sa.Integer(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('products', schema=None) as batch_op:
+        batch_op.drop_column('stock_quantity')
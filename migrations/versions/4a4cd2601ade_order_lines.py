@@ -0,0 +1,79 @@
+"""Order lines
+
+Revision ID: 4a4cd2601ade
+Revises: fa24b7ceac22
+Create Date: 2026-10-18 20:19:27.406038
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '4a4cd2601ade'
+down_revision = 'fa24b7ceac22'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('order_lines',
+    sa.Column('id', sa.Integer(), nullable=False),
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=True),
+    sa.Column('quantity', sa.Integer(), nullable=False),
+    sa.Column('unit_price', sa.Float(), nullable=False),
+    sa.Column('title', sa.String(length=255), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ondelete='SET NULL'),
+    sa.PrimaryKeyConstraint('id')
+    )
+    op.create_index('ix_order_lines_order_id_product_id', 'order_lines', ['order_id', 'product_id'], unique=True)
+    op.create_index('ix_order_lines_product_id', 'order_lines', ['product_id'], unique=False)
+
+    # Existing orders only recorded which products they held, so each becomes a line
+    # of quantity 1 with the product's current price and title as the snapshot
+    op.execute(
+        'INSERT INTO order_lines (order_id, product_id, quantity, unit_price, title) '
+        'SELECT order_products.order_id, order_products.product_id, 1, products.price, products.title '
+        'FROM order_products JOIN products ON products.id = order_products.product_id '
+        'ORDER BY order_products.order_id, order_products.product_id'
+    )
+    op.drop_index('ix_order_products_product_id', table_name='order_products')
+    op.drop_table('order_products')
+
+    # Product rollups now also carry units and revenue, recomputed from the lines
+    # (same query as `flask analytics rebuild`)
+    op.add_column('product_sales_rollups', sa.Column('units', sa.Integer(), nullable=False, server_default='0'))
+    op.add_column('product_sales_rollups', sa.Column('revenue', sa.Float(), nullable=False, server_default='0'))
+    op.execute('DELETE FROM product_sales_rollups')
+    op.execute(
+        'INSERT INTO product_sales_rollups (store_id, day, product_id, order_count, units, revenue) '
+        'SELECT orders.store_id, date(orders.created_at), order_lines.product_id, COUNT(*), '
+        'SUM(order_lines.quantity), SUM(order_lines.quantity * order_lines.unit_price) '
+        'FROM order_lines JOIN orders ON orders.id = order_lines.order_id '
+        'WHERE order_lines.product_id IS NOT NULL '
+        'GROUP BY orders.store_id, date(orders.created_at), order_lines.product_id'
+    )
+
+
+def downgrade():
+    with op.batch_alter_table('product_sales_rollups', schema=None) as batch_op:
+        batch_op.drop_column('revenue')
+        batch_op.drop_column('units')
+
+    op.create_table('order_products',
+    sa.Column('order_id', sa.Integer(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['order_id'], ['orders.id'], ),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('order_id', 'product_id')
+    )
+    op.create_index('ix_order_products_product_id', 'order_products', ['product_id'], unique=False)
+    op.execute(
+        'INSERT INTO order_products (order_id, product_id) '
+        'SELECT order_id, product_id FROM order_lines WHERE product_id IS NOT NULL'
+    )
+    op.drop_index('ix_order_lines_product_id', table_name='order_lines')
+    op.drop_index('ix_order_lines_order_id_product_id', table_name='order_lines')
+    op.drop_table('order_lines')
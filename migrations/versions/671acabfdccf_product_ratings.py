@@ -0,0 +1,44 @@
+"""Product ratings
+
+Revision ID: 671acabfdccf
+Revises: 2183386b8fce
+Create Date: 2026-10-18 21:43:05.318842
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '671acabfdccf'
+down_revision = '2183386b8fce'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('product_ratings',
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('review_count', sa.Integer(), nullable=False),
+    sa.Column('rating_sum', sa.Integer(), nullable=False),
+    sa.Column('stars_1', sa.Integer(), nullable=False),
+    sa.Column('stars_2', sa.Integer(), nullable=False),
+    sa.Column('stars_3', sa.Integer(), nullable=False),
+    sa.Column('stars_4', sa.Integer(), nullable=False),
+    sa.Column('stars_5', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['product_id'], ['products.id'], ),
+    sa.PrimaryKeyConstraint('product_id')
+    )
+
+    # Backfill from the existing reviews (same query as `flask reviews backfill`)
+    stars = ', '.join(f'SUM(CASE WHEN rating = {star} THEN 1 ELSE 0 END)' for star in range(1, 6))
+    op.execute(
+        'INSERT INTO product_ratings '
+        '(product_id, review_count, rating_sum, stars_1, stars_2, stars_3, stars_4, stars_5) '
+        f'SELECT product_id, COUNT(*), SUM(rating), {stars} '
+        'FROM reviews GROUP BY product_id'
+    )
+
+
+def downgrade():
+    op.drop_table('product_ratings')
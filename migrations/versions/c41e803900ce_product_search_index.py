@@ -0,0 +1,61 @@
+"""Product search index
+
+Revision ID: c41e803900ce
+Revises: 9f116f78b262
+Create Date: 2026-10-18 20:05:12.418233
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'c41e803900ce'
+down_revision = '9f116f78b262'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect == 'postgresql':
+        # tsvector document per product, weighted title > tags > description
+        op.execute(
+            "CREATE TABLE product_search ("
+            "product_id INTEGER PRIMARY KEY REFERENCES products (id) ON DELETE CASCADE, "
+            "store_id INTEGER NOT NULL, "
+            "document TSVECTOR NOT NULL)"
+        )
+        op.execute("CREATE INDEX ix_product_search_document ON product_search USING GIN (document)")
+        op.execute(
+            "INSERT INTO product_search (product_id, store_id, document) "
+            "SELECT p.id, p.store_id, "
+            "setweight(to_tsvector('english', coalesce(p.title, '')), 'A') || "
+            "setweight(to_tsvector('english', coalesce(string_agg(t.name, ' '), '')), 'B') || "
+            "setweight(to_tsvector('english', coalesce(p.description, '')), 'C') "
+            "FROM products p "
+            "LEFT JOIN product_tags pt ON pt.product_id = p.id "
+            "LEFT JOIN tags t ON t.id = pt.tag_id "
+            "GROUP BY p.id"
+        )
+    elif dialect == 'sqlite':
+        # FTS5 virtual table, rowid is the product id
+        op.execute(
+            "CREATE VIRTUAL TABLE product_search USING fts5("
+            "store_id UNINDEXED, title, description, tags, "
+            "tokenize = 'porter unicode61')"
+        )
+        op.execute(
+            "INSERT INTO product_search (rowid, store_id, title, description, tags) "
+            "SELECT p.id, p.store_id, p.title, p.description, coalesce(group_concat(t.name, ' '), '') "
+            "FROM products p "
+            "LEFT JOIN product_tags pt ON pt.product_id = p.id "
+            "LEFT JOIN tags t ON t.id = pt.tag_id "
+            "GROUP BY p.id"
+        )
+
+
+def downgrade():
+    dialect = op.get_bind().dialect.name
+    if dialect in ('postgresql', 'sqlite'):
+        op.execute("DROP TABLE IF EXISTS product_search")
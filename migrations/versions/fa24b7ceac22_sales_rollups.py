@@ -0,0 +1,58 @@
+"""Sales rollups
+
+Revision ID: fa24b7ceac22
+Revises: 671acabfdccf
+Create Date: 2026-10-18 20:16:40.082182
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'fa24b7ceac22'
+down_revision = '671acabfdccf'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('sales_rollups',
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.Column('revenue', sa.Float(), nullable=False),
+    sa.Column('pending_count', sa.Integer(), nullable=False),
+    sa.Column('fulfilled_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('store_id', 'day')
+    )
+    op.create_table('product_sales_rollups',
+    sa.Column('store_id', sa.Integer(), nullable=False),
+    sa.Column('day', sa.Date(), nullable=False),
+    sa.Column('product_id', sa.Integer(), nullable=False),
+    sa.Column('order_count', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['store_id'], ['stores.id'], ),
+    sa.PrimaryKeyConstraint('store_id', 'day', 'product_id')
+    )
+
+    # Backfill from the existing orders (same queries as `flask analytics rebuild`)
+    op.execute(
+        'INSERT INTO sales_rollups '
+        '(store_id, day, order_count, revenue, pending_count, fulfilled_count) '
+        'SELECT store_id, date(created_at), COUNT(*), SUM(total_price), '
+        "SUM(CASE WHEN status = 'pending' THEN 1 ELSE 0 END), "
+        "SUM(CASE WHEN status = 'fulfilled' THEN 1 ELSE 0 END) "
+        'FROM orders GROUP BY store_id, date(created_at)'
+    )
+    op.execute(
+        'INSERT INTO product_sales_rollups (store_id, day, product_id, order_count) '
+        'SELECT orders.store_id, date(orders.created_at), order_products.product_id, COUNT(*) '
+        'FROM order_products JOIN orders ON orders.id = order_products.order_id '
+        'GROUP BY orders.store_id, date(orders.created_at), order_products.product_id'
+    )
+
+
+def downgrade():
+    op.drop_table('product_sales_rollups')
+    op.drop_table('sales_rollups')